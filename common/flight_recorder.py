@@ -0,0 +1,143 @@
+"""
+ flight_recorder.py
+
+ Always-on "black box" for the motion pipeline.
+
+ The last N minutes of per-frame data are held in preallocated NumPy ring buffers.
+ record() is called once per frame from the control loop and only copies values into
+ the next row, it never allocates, locks or touches the disk.
+ dump() snapshots the rings and writes the snapshot to an .npz file from a background
+ thread, so dumps can be requested from the control loop (state change, error) or from
+ the UI without stalling motion.
+
+ Usage:
+    recorder = FlightRecorder(minutes=5, frame_rate=20)
+    ...
+    recorder.record(frame_interval=..., processing=..., state=..., raw=..., ...)   # every frame
+    ...
+    recorder.dump("flight_logs", "deactivated")
+
+ Run this module with the name of a dump file to print a summary of it.
+"""
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# name and number of columns of each recorded field
+FIELDS = (
+    ("time", 1),              # perf_counter at end of frame processing
+    ("frame_interval", 1),    # seconds since previous frame started
+    ("processing", 1),        # seconds spent processing this frame
+    ("state", 1),             # index into PLATFORM_STATES
+    ("raw", 6),               # transform from sim before washout
+    ("washed", 6),            # transform after washout
+    ("request", 6),           # regulated request passed to kinematics (real world units)
+    ("muscle_lengths", 6),    # mm
+    ("cmd_pressures", 6),     # millibar sent to Festo
+    ("meas_pressures", 6),    # millibar reported by Festo
+    ("e2e_latency", 1),       # seconds from sim sampling to pressure command, NaN if unknown
+)
+
+PLATFORM_STATES = ("initialized", "deactivated", "enabled", "running", "paused")
+
+
+class FlightRecorder(object):
+    def __init__(self, minutes=5, frame_rate=20):
+        self.capacity = max(1, int(minutes * 60 * frame_rate))
+        self.rings = {}
+        for name, width in FIELDS:
+            shape = (self.capacity,) if width == 1 else (self.capacity, width)
+            self.rings[name] = np.zeros(shape, dtype=np.float64)
+        self.count = 0   # total frames recorded, only written by the control loop
+        self._dump_thread = None
+        log.info("Flight recorder holding %d frames (%.1f minutes)", self.capacity, minutes)
+
+    def record(self, **values):
+        """Store one frame; keyword names are taken from FIELDS, values of None are stored as NaN."""
+        idx = self.count % self.capacity
+        rings = self.rings
+        for name, value in values.items():
+            rings[name][idx] = np.nan if value is None else value
+        self.count += 1   # publish the row only after it is complete
+
+    def snapshot(self):
+        """
+        Returns a dict of field arrays in chronological order.
+        Safe to call from any thread: rows overwritten while copying are discarded.
+        """
+        start_count = self.count
+        copies = {name: ring.copy() for name, ring in self.rings.items()}
+        end_count = self.count
+        # rows overwritten during the copy, and the row being written now, are not consistent
+        first = max(start_count - self.capacity, end_count + 1 - self.capacity, 0)
+        order = np.arange(first, start_count) % self.capacity
+        return {name: data[order] for name, data in copies.items()}
+
+    def dump(self, directory, reason=""):
+        """
+        Snapshot the rings and write them to <directory>/flight_<timestamp>_<reason>.npz
+        in a background thread. Returns the file path, or None if a dump is still in progress.
+        """
+        if self._dump_thread and self._dump_thread.is_alive():
+            log.warning("Flight recorder dump already in progress, '%s' dump skipped", reason)
+            return None
+        data = self.snapshot()
+        data["state_names"] = np.array(PLATFORM_STATES)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = f"_{reason}" if reason else ""
+        path = os.path.join(directory, f"flight_{stamp}{suffix}.npz")
+        self._dump_thread = threading.Thread(target=self._write, args=(path, data), daemon=True)
+        self._dump_thread.start()
+        return path
+
+    def wait(self, timeout=None):
+        """Block until a dump in progress has been written, used before exit."""
+        if self._dump_thread:
+            self._dump_thread.join(timeout)
+
+    def _write(self, path, data):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            start = time.perf_counter()
+            np.savez(path, **data)
+            log.info("Flight recorder wrote %d frames to %s in %.0f ms",
+                     len(data["time"]), path, (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            log.error("Flight recorder unable to write %s: %s", path, e)
+
+
+def load_flight_log(path):
+    """Returns a dict of field arrays from a file written by FlightRecorder.dump."""
+    with np.load(path) as f:
+        return {name: f[name] for name in f.files}
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("usage: python -m common.flight_recorder <flight_log.npz>")
+        sys.exit(1)
+    data = load_flight_log(sys.argv[1])
+    n = len(data["time"])
+    print(f"{n} frames, {data['time'][-1] - data['time'][0]:.1f} seconds" if n else "empty log")
+    if n > 1:
+        interval = data["frame_interval"][1:] * 1000
+        print(f"frame interval ms: mean {interval.mean():.1f}  max {interval.max():.1f}")
+        print(f"processing ms:     mean {data['processing'].mean() * 1000:.2f}  max {data['processing'].max() * 1000:.2f}")
+        steps = np.abs(np.diff(data["muscle_lengths"], axis=0))
+        worst = int(np.argmax(steps.max(axis=1)))
+        print(f"largest muscle length step {steps.max():.0f} mm at frame {worst + 1}, "
+              f"{data['time'][-1] - data['time'][worst + 1]:.1f} s before end of log")
+        print(f"largest commanded pressure step {np.abs(np.diff(data['cmd_pressures'], axis=0)).max():.0f} mb")
+    latency = data["e2e_latency"] * 1000 if "e2e_latency" in data else np.array([])
+    latency = latency[~np.isnan(latency)]
+    if len(latency):
+        print(f"end-to-end latency ms: mean {latency.mean():.1f}  p99 {np.percentile(latency, 99):.1f}  "
+              f"max {latency.max():.1f} ({len(latency)} frames)")
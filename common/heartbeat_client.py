@@ -2,9 +2,22 @@
 
 import time
 import logging
+from collections import deque
 from common.udp_tx_rx import UdpReceive
 
 class HeartbeatClient:
+    """
+    Pings the heartbeat server on the sim PC and reports whether the server and the
+    target application are alive.
+
+    Pings carry the local send time ("ping,<t0>"); servers that echo it back along with
+    their own receive and send times ("<status>,<t0>,<t1>,<t2>") also give an NTP style
+    estimate of the sim PC clock relative to this one. The offset is taken from the
+    exchange with the smallest round trip in the last CLOCK_SAMPLES replies, as queueing
+    delays make the longer exchanges asymmetric.
+    """
+    CLOCK_SAMPLES = 8
+
     def __init__(self, heartbeat_addr, target_app, interval=1.0):
         self.heartbeat_addr = heartbeat_addr
         self.target_app = target_app
@@ -13,24 +26,48 @@ class HeartbeatClient:
         self.last_recv_time = None
         self._ok = False
         self._running = False
+        self.clock_samples = deque(maxlen=self.CLOCK_SAMPLES)  # (round trip, offset)
+        self.clock_offset = None   # sim PC clock minus local clock, seconds
+        self.round_trip = None     # round trip of the exchange the offset was taken from
         rx_port = heartbeat_addr[1] + 1
-        self.sock = UdpReceive(rx_port)
+        self.sock = UdpReceive(rx_port, timestamp=True)
 
     def send_ping(self):
         try:
-            self.sock.send("ping", self.heartbeat_addr)
-            self.last_ping_time = time.time()
+            t0 = time.time()
+            self.sock.send(f"ping,{t0:.6f}", self.heartbeat_addr)
+            self.last_ping_time = t0
         except Exception as e:
             logging.warning(f"[HeartbeatClient] Ping failed: {e}")
 
+    def update_clock_offset(self, message, t3):
+        fields = message.split(',')
+        if len(fields) < 4:
+            return  # server does not echo timestamps
+        try:
+            t0, t1, t2 = (float(f) for f in fields[-3:])
+        except ValueError:
+            return
+        round_trip = (t3 - t0) - (t2 - t1)
+        offset = ((t1 - t0) + (t2 - t3)) / 2
+        self.clock_samples.append((round_trip, offset))
+        self.round_trip, self.clock_offset = min(self.clock_samples)
+
+    def to_local_time(self, remote_time):
+        """Convert a time.time() value from the sim PC to this PC's clock, None if the offset is unknown."""
+        if self.clock_offset is None:
+            return None
+        return remote_time - self.clock_offset
+
     def query_status(self, now):
         try:
             # Check for new messages
             while self.sock.available():
-                addr, message = self.sock.get()
+                addr, message, arrival = self.sock.get()
                 self._ok = True
                 self._running = self.target_app in message
                 self.last_recv_time = now
+                self.update_clock_offset(message, arrival)
 
             # Send ping if needed
             if now - self.last_ping_time > self.interval:
@@ -47,3 +84,6 @@ class HeartbeatClient:
             self._running = False
 
         return self._ok, self._running
+
+    def close(self):
+        self.sock.close_socket()
@@ -0,0 +1,202 @@
+"""
+ shared_state.py
+
+ Shared memory exchange between the control process (motion pipeline) and the UI process.
+
+ One multiprocessing.shared_memory segment holds:
+   - the state block, a fixed layout NumPy record written every frame by the control
+     process and read by the UI. A sequence counter (seqlock) lets the reader detect
+     and retry a read that overlapped a write, so neither side ever blocks the other.
+   - the UI heartbeat, a time.time() written only by the UI so the control process
+     can tell if the UI has gone away.
+   - a command ring (UI -> control) and an event ring (control -> UI), single producer
+     single consumer rings of short JSON messages. A full ring drops the new message.
+
+ Usage (control process):
+    shared = SharedState.create()
+    shared.write(transform=..., muscle_lengths=..., ...)   # every frame
+    cmd = shared.commands.get()                            # None if empty
+    shared.events.put(["platformStateChanged", "enabled"])
+
+ Usage (UI process):
+    shared = SharedState.attach()
+    state = shared.read()
+    shared.commands.put(["update_state", "enabled"])
+"""
+
+import json
+import time
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+SHARED_STATE_NAME = "simopconsole"
+STATUS_CODES = ("ok", "warning", "nogo")   # connection, data and aircraft status
+MAX_STAGES = 32                              # stage timing rows in the state block, pipeline, sender and per rig
+
+STATE_DTYPE = np.dtype([
+    ("seq", "<u4"),                  # odd while the control process is writing
+    ("frame", "<u4"),                # incremented every write
+    ("write_time", "<f8"),           # time.time() of the last write, control process liveness
+    ("transform", "<f8", (6,)),
+    ("muscle_lengths", "<f8", (6,)),
+    ("cmd_pressures", "<f8", (6,)),
+    ("meas_pressures", "<f8", (6,)),
+    ("platform_state", "<i4"),       # index into flight_recorder.PLATFORM_STATES
+    ("conn_status", "<i4"),          # indices into STATUS_CODES
+    ("data_status", "<i4"),
+    ("aircraft_status", "<i4"),
+    ("aircraft_name", "S40"),
+    ("temperature", "<f8"),          # NaN if not available
+    ("processing_percent", "<i4"),
+    ("jitter_percent", "<i4"),
+    ("activation_percent", "<i4"),
+    ("e2e_latency", "<f8"),          # seconds, NaN if unknown
+    ("nbr_stages", "<i4"),
+    ("stage_names", "S32", (MAX_STAGES,)),   # written with timing, the stages change while running
+    ("timing", "<f8", (MAX_STAGES, 5)),   # count, min, mean, p99, max (ms) per stage, updated about once a second
+    ("local_ip", "S40"),
+    ("sim_ip", "S40"),
+    ("festo_ip", "S40"),
+], align=True)
+
+
+class MessageRing(object):
+    """Single producer, single consumer ring of messages up to slot_size-2 bytes, JSON encoded."""
+
+    def __init__(self, buf, offset, nbr_slots, slot_size):
+        self.nbr_slots = nbr_slots
+        self.slot_size = slot_size
+        # head (producer) and tail (consumer) on separate cache lines
+        self.head = np.ndarray((1,), "<u4", buf, offset)
+        self.tail = np.ndarray((1,), "<u4", buf, offset + 64)
+        self.slots = np.ndarray((nbr_slots, slot_size), np.uint8, buf, offset + 128)
+
+    @staticmethod
+    def size(nbr_slots, slot_size):
+        return 128 + nbr_slots * slot_size
+
+    def put(self, message):
+        """Returns False if the ring is full or the message too long."""
+        data = json.dumps(message, separators=(",", ":")).encode()
+        head = int(self.head[0])
+        if len(data) > self.slot_size - 2 or (head - int(self.tail[0])) & 0xFFFFFFFF >= self.nbr_slots:
+            return False
+        slot = self.slots[head % self.nbr_slots]
+        slot[:2] = np.frombuffer(len(data).to_bytes(2, "little"), np.uint8)
+        slot[2:2 + len(data)] = np.frombuffer(data, np.uint8)
+        self.head[0] = (head + 1) & 0xFFFFFFFF   # publish after the slot is written
+        return True
+
+    def get(self):
+        """Returns the oldest message, or None if the ring is empty."""
+        tail = int(self.tail[0])
+        if tail == int(self.head[0]):
+            return None
+        slot = self.slots[tail % self.nbr_slots]
+        length = int(slot[0]) | (int(slot[1]) << 8)
+        message = json.loads(slot[2:2 + length].tobytes())
+        self.tail[0] = (tail + 1) & 0xFFFFFFFF
+        return message
+
+    def discard(self):
+        """Consumer side: drop everything queued, used when a new consumer attaches."""
+        self.tail[0] = self.head[0]
+
+
+class SharedState(object):
+    CMD_SLOTS, CMD_SLOT_SIZE = 64, 128
+    EVT_SLOTS, EVT_SLOT_SIZE = 256, 256
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        buf = shm.buf
+        self.state = np.ndarray((), STATE_DTYPE, buf, 0)
+        offset = _align(STATE_DTYPE.itemsize)
+        self.ui_heartbeat = np.ndarray((1,), "<f8", buf, offset)
+        offset += 64
+        self.commands = MessageRing(buf, offset, self.CMD_SLOTS, self.CMD_SLOT_SIZE)
+        offset += _align(MessageRing.size(self.CMD_SLOTS, self.CMD_SLOT_SIZE))
+        self.events = MessageRing(buf, offset, self.EVT_SLOTS, self.EVT_SLOT_SIZE)
+
+    @classmethod
+    def total_size(cls):
+        return (_align(STATE_DTYPE.itemsize) + 64
+                + _align(MessageRing.size(cls.CMD_SLOTS, cls.CMD_SLOT_SIZE))
+                + MessageRing.size(cls.EVT_SLOTS, cls.EVT_SLOT_SIZE))
+
+    @classmethod
+    def create(cls, name=SHARED_STATE_NAME):
+        """
+        Create the segment (control process), replacing a stale one left by a process that exited.
+        Raises FileExistsError if a live control process is writing to the segment.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=cls.total_size())
+        except FileExistsError:
+            existing = cls(shared_memory.SharedMemory(name=name), owner=False)
+            alive = existing.control_alive()
+            existing.close()
+            if alive:
+                # not ours, stop this process's resource tracker unlinking it on exit
+                resource_tracker.unregister(existing.shm._name, "shared_memory")
+                raise FileExistsError(f"Shared state '{name}' is in use by a running control process")
+            existing.shm.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=cls.total_size())
+        shm.buf[:cls.total_size()] = bytes(cls.total_size())
+        shared = cls(shm, owner=True)
+        shared.state["write_time"] = time.time()   # live from now on, a second start is refused during setup
+        return shared
+
+    @classmethod
+    def attach(cls, name=SHARED_STATE_NAME):
+        """Attach to an existing segment (UI process), raises FileNotFoundError if there is none."""
+        shm = shared_memory.SharedMemory(name=name)
+        # the creator owns the segment, stop this process's resource tracker unlinking it on exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def write(self, **values):
+        """Control process: update the given fields as one consistent frame."""
+        state = self.state
+        state["seq"] += 1          # odd, write in progress
+        for name, value in values.items():
+            state[name] = value
+        state["frame"] += 1
+        state["write_time"] = time.time()
+        state["seq"] += 1          # even, consistent
+
+    def read(self, retries=100):
+        """UI process: returns a consistent copy of the state block as a record, or None if the writer never settled."""
+        state = self.state
+        for _ in range(retries):
+            seq = int(state["seq"])
+            if seq & 1:
+                time.sleep(0)
+                continue
+            copy = state.copy()
+            if int(state["seq"]) == seq:
+                return copy[()]
+        return None
+
+    def get(self, name):
+        """Read a single field that is only written once (names, addresses)."""
+        return self.state[name][()]
+
+    def control_alive(self, timeout=1.0):
+        return time.time() - float(self.state["write_time"]) < timeout
+
+    def close(self):
+        # drop numpy views before closing the mapping
+        self.state = self.ui_heartbeat = self.commands = self.events = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _align(size, alignment=64):
+    return (size + alignment - 1) // alignment * alignment
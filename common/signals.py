@@ -0,0 +1,43 @@
+"""
+ signals.py
+
+ Minimal Qt-free replacement for pyqtSignal so the core can run without a QApplication.
+
+ Slots are called synchronously, in the order they were connected, in the thread
+ that calls emit (the same behaviour as a Qt direct connection).
+ An exception in one slot is logged and does not stop the other slots or the caller,
+ so a front end bug can not stall the motion loop.
+
+ Usage:
+    status_changed = Signal(str)
+    status_changed.connect(label.setText)
+    status_changed.emit("Connected")
+"""
+
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Signal(object):
+    def __init__(self, *types):
+        # types document the emitted arguments, as with pyqtSignal, but are not checked
+        self.types = types
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        """ Disconnect the given slot, or all slots if none is given. """
+        if slot is None:
+            self._slots = []
+        else:
+            self._slots = [s for s in self._slots if s != slot]
+
+    def emit(self, *args):
+        for slot in tuple(self._slots):
+            try:
+                slot(*args)
+            except Exception:
+                log.exception("Error in slot %s", getattr(slot, "__qualname__", slot))
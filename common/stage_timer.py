@@ -0,0 +1,166 @@
+"""
+ stage_timer.py
+
+ Lightweight always-on timing of the stages of the motion pipeline.
+
+ Each stage keeps a fixed-size histogram of durations with logarithmic bins
+ (1 us to 1 s, 20 bins per decade) plus exact min, max and sum.
+ Two histograms are kept per stage and rotated every `window_frames` frames, so
+ reported statistics cover the most recent one to two windows.
+
+ Recording a sample costs a perf_counter call, a log10 and a few list updates
+ (around a microsecond), the numpy work is only done when a summary is requested.
+
+ Usage:
+    timers = StageTimers(("read", "process", "send"))
+    timers.start_frame()
+    ...
+    timers.mark("read")       # time since start_frame (or previous mark) is charged to "read"
+    ...
+    timers.mark("process")
+    ...
+    timers.add("send", 0.002) # explicit duration in seconds
+    print(timers.format_summary())
+"""
+
+import math
+import time
+
+import numpy as np
+
+_MIN_EXPONENT = -6            # 1 us
+_BINS_PER_DECADE = 20
+_NBR_BINS = 6 * _BINS_PER_DECADE  # up to 1 s
+# upper edge of each bin in seconds
+BIN_EDGES = 10.0 ** (_MIN_EXPONENT + (np.arange(_NBR_BINS) + 1) / _BINS_PER_DECADE)
+
+
+class RollingStats(object):
+    """Histogram based rolling min/mean/p99/max of one measured quantity (seconds)."""
+
+    def __init__(self):
+        self.current = self._new_window()
+        self.previous = self._new_window()
+
+    @staticmethod
+    def _new_window():
+        # [counts, number of samples, sum, min, max]
+        return [[0] * _NBR_BINS, 0, 0.0, math.inf, 0.0]
+
+    def add(self, value):
+        w = self.current
+        if value > 0:
+            b = int((math.log10(value) - _MIN_EXPONENT) * _BINS_PER_DECADE)
+            b = 0 if b < 0 else (_NBR_BINS - 1 if b >= _NBR_BINS else b)
+        else:
+            b = 0
+        w[0][b] += 1
+        w[1] += 1
+        w[2] += value
+        if value < w[3]:
+            w[3] = value
+        if value > w[4]:
+            w[4] = value
+
+    def rotate(self):
+        self.previous = self.current
+        self.current = self._new_window()
+
+    def percentile(self, percent):
+        counts = np.add(self.current[0], self.previous[0])
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        idx = int(np.searchsorted(np.cumsum(counts), total * percent / 100.0))
+        return float(BIN_EDGES[min(idx, _NBR_BINS - 1)])
+
+    def summary(self):
+        """Returns (count, min, mean, p99, max) in seconds over the current and previous windows."""
+        n = self.current[1] + self.previous[1]
+        if n == 0:
+            return 0, 0.0, 0.0, 0.0, 0.0
+        lo = min(self.current[3], self.previous[3])
+        hi = max(self.current[4], self.previous[4])
+        mean = (self.current[2] + self.previous[2]) / n
+        # the histogram bin edge can overshoot the true maximum
+        return n, lo, mean, min(self.percentile(99), hi), hi
+
+
+class StageTimers(object):
+    def __init__(self, stages, window_frames=200):
+        self.stages = tuple(stages)
+        self.stats = {name: RollingStats() for name in self.stages}
+        self.window_frames = window_frames
+        self.frames = 0
+        self._last = time.perf_counter()
+
+    def start_frame(self):
+        self.frames += 1
+        if self.frames % self.window_frames == 0:
+            for s in self.stats.values():
+                s.rotate()
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        """Charge the time since the previous mark (or start_frame) to the given stage."""
+        now = time.perf_counter()
+        self.stats[stage].add(now - self._last)
+        self._last = now
+
+    def add(self, stage, seconds):
+        """Record an explicitly measured duration, does not move the mark."""
+        self.stats[stage].add(seconds)
+
+    def exclude(self, stage, seconds):
+        """Record a duration measured inside the current mark interval, the next mark does not include it."""
+        self.stats[stage].add(seconds)
+        self._last += seconds
+
+    def restart(self):
+        """Restart the mark clock without charging the elapsed time to any stage."""
+        self._last = time.perf_counter()
+
+    def summary(self):
+        """Returns {stage: (count, min, mean, p99, max)} with times in milliseconds."""
+        result = {}
+        for name in self.stages:
+            n, lo, mean, p99, hi = self.stats[name].summary()
+            result[name] = (n, lo * 1000, mean * 1000, p99 * 1000, hi * 1000)
+        return result
+
+    def format_summary(self):
+        """One line per call suitable for logging: stage mean/p99/max in ms."""
+        parts = []
+        for name, (n, lo, mean, p99, hi) in self.summary().items():
+            if n:
+                parts.append(f"{name} {mean:.2f}/{p99:.2f}/{hi:.2f}")
+        return "stage ms mean/p99/max: " + ", ".join(parts)
+
+    def format_table(self):
+        """Multi line table of all statistics, used for tool tips and console output."""
+        return format_table(self.summary())
+
+
+def format_table(summary):
+    """Table of a StageTimers.summary() dict, also used for summaries passed between processes."""
+    width = max([12] + [len(name) + 1 for name in summary])
+    lines = [f"{'stage':<{width}}{'count':>7}{'min':>8}{'mean':>8}{'p99':>8}{'max':>8}"]
+    for name, (n, lo, mean, p99, hi) in summary.items():
+        lines.append(f"{name:<{width}}{int(n):>7}{lo:>8.3f}{mean:>8.3f}{p99:>8.3f}{hi:>8.3f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # measure the overhead of the timers themselves
+    stages = ("a", "b", "c", "d", "e", "f", "g", "h")
+    timers = StageTimers(stages)
+    frames = 20000
+    start = time.perf_counter()
+    for _ in range(frames):
+        timers.start_frame()
+        for s in stages:
+            timers.mark(s)
+    per_frame = (time.perf_counter() - start) / frames
+    print(f"{len(stages)} stages: {per_frame * 1e6:.1f} us per frame, "
+          f"{per_frame / 0.05 * 100:.3f}% of a 50 ms frame")
+    print(timers.format_table())
@@ -0,0 +1,264 @@
+"""
+ telemetry_hub.py
+
+ Fans out the telemetry received by one process (normally the core, on the X-Plane
+ telemetry port) to any number of local subscribers: the recorder, plotting or test tools,
+ so they no longer compete for packets on the same port.
+
+ The receiving process publishes every packet into a shared memory ring of fixed size slots
+ (multiprocessing.shared_memory, as shared_state.py). Publishing happens on the UDP listener
+ thread after the packet is queued for the control loop, so it adds no latency to control.
+ Subscribers only read the segment; each keeps its own position, so the publisher never
+ waits for a subscriber and subscribers can come and go while the platform runs.
+
+ Each slot holds the packet bytes, its arrival time.time(), the sender address and a stamp
+ (the packet's index). The stamp is cleared while the slot is rewritten and checked before
+ and after a read, so a subscriber that has been lapped sees it rather than torn data.
+
+ Drop policies, per subscriber:
+   "latest"    get() returns the newest packet not seen yet, older ones are skipped
+               (plotting, displays)
+   "lossless"  get() returns every packet in order. The ring holds HUB_SLOTS packets
+               (20 s at 50 Hz); a subscriber that falls further behind than that loses the
+               oldest ones, counted in dropped (recording)
+
+ The publisher refreshes the header write_time with every packet and with touch() from its
+ control loop, so create() only replaces a segment left by a process that has stopped; a
+ second console finds the hub in use and leaves the first one's subscribers attached.
+
+ usage (publisher, same arguments as the UdpReceive on_receive callback):
+    hub = TelemetryHub.create()       # FileExistsError if another running process publishes
+    hub.publish(payload_bytes, addr, arrival)
+    hub.touch()                       # every frame, keeps the hub alive when no packets arrive
+
+ usage (subscriber, any local process):
+    sub = TelemetrySubscriber.attach(policy="lossless")
+    msg = sub.get()          # (addr, payload bytes, arrival) or None
+
+    python -m common.telemetry_hub watch [--policy latest]   # rate and drops of the live stream
+    python -m common.telemetry_hub bench                     # publish cost and subscriber latency
+"""
+
+import time
+import socket
+import struct
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+log = logging.getLogger(__name__)
+
+TELEMETRY_HUB_NAME = "simopconsole_telemetry"
+HUB_SLOTS = 1024
+HUB_SLOT_SIZE = 512        # UdpReceive reads datagrams up to 512 bytes
+POLICIES = ("latest", "lossless")
+INVALID_STAMP = 0xFFFFFFFFFFFFFFFF
+
+HEADER = struct.Struct("<QdII")        # head (packets published, next slot to write), write_time, nbr_slots, slot_size
+WRITE_TIME = struct.Struct("<d")       # write_time alone, at offset 8, refreshed by touch()
+HUB_ALIVE_TIMEOUT = 1.0                # seconds, a hub written to more recently belongs to a running process
+HEADER_SIZE = 64
+STAMP = struct.Struct("<Q")            # index of the packet in a slot, INVALID_STAMP while it is written
+SLOT_INFO = struct.Struct("<d4BHH")    # arrival time.time(), sender ip, port, payload length
+SLOT_HEADER_SIZE = STAMP.size + SLOT_INFO.size
+
+
+class _HubSegment(object):
+    def __init__(self, shm, owner, nbr_slots, slot_size):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        self.nbr_slots = nbr_slots
+        self.slot_size = slot_size
+        self.stride = SLOT_HEADER_SIZE + slot_size
+
+    @staticmethod
+    def size(nbr_slots, slot_size):
+        return HEADER_SIZE + nbr_slots * (SLOT_HEADER_SIZE + slot_size)
+
+    def head(self):
+        return HEADER.unpack_from(self.buf, 0)[0]
+
+    def close(self):
+        self.buf = None   # release the memoryview before closing the mapping
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class TelemetryHub(_HubSegment):
+    """ Publisher side, one per segment. """
+    nbr_too_long = 0   # packets dropped for not fitting a slot
+
+    @classmethod
+    def create(cls, name=TELEMETRY_HUB_NAME, nbr_slots=HUB_SLOTS, slot_size=HUB_SLOT_SIZE):
+        """
+        Create the segment, replacing a stale one left by a crashed process.
+        Raises FileExistsError if the existing segment is still written to by a running process.
+        """
+        size = cls.size(nbr_slots, slot_size)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(name=name)
+            write_time = WRITE_TIME.unpack_from(existing.buf, 8)[0] if existing.size >= HEADER.size else 0.0
+            existing.close()
+            if time.time() - write_time < HUB_ALIVE_TIMEOUT:
+                # not ours, stop this process's resource tracker unlinking it on exit
+                resource_tracker.unregister(existing._name, "shared_memory")
+                raise FileExistsError(f"Telemetry hub '{name}' is in use by a running process")
+            existing.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        hub = cls(shm, True, nbr_slots, slot_size)
+        for slot in range(nbr_slots):
+            STAMP.pack_into(hub.buf, HEADER_SIZE + slot * hub.stride, INVALID_STAMP)
+        HEADER.pack_into(hub.buf, 0, 0, time.time(), nbr_slots, slot_size)
+        hub.index = 0
+        log.info("Telemetry hub %s: %d slots of %d bytes", name, nbr_slots, slot_size)
+        return hub
+
+    def publish(self, payload, addr=None, arrival=None):
+        """ Add a packet (bytes), called from the receiving thread. Packets longer than a slot are dropped. """
+        arrival = time.time() if arrival is None else arrival
+        length = len(payload)
+        if length > self.slot_size:
+            self.nbr_too_long += 1
+            return False
+        index = self.index
+        offset = HEADER_SIZE + (index % self.nbr_slots) * self.stride
+        ip = socket.inet_aton(addr[0]) if addr else bytes(4)
+        STAMP.pack_into(self.buf, offset, INVALID_STAMP)
+        SLOT_INFO.pack_into(self.buf, offset + STAMP.size, arrival, *ip, addr[1] if addr else 0, length)
+        self.buf[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + length] = payload
+        STAMP.pack_into(self.buf, offset, index)                     # slot complete
+        self.index = index + 1
+        HEADER.pack_into(self.buf, 0, self.index, time.time(), self.nbr_slots, self.slot_size)  # then visible
+        return True
+
+    def touch(self):
+        """ Refresh write_time without publishing, so an idle hub is not taken for a stale one. """
+        WRITE_TIME.pack_into(self.buf, 8, time.time())
+
+
+class TelemetrySubscriber(_HubSegment):
+    """ Read only view of the ring with its own position and drop policy. """
+
+    @classmethod
+    def attach(cls, name=TELEMETRY_HUB_NAME, policy="latest"):
+        """ Attach to a running hub, raises FileNotFoundError if no process is publishing. """
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        shm = shared_memory.SharedMemory(name=name)
+        # the publisher owns the segment, stop this process's resource tracker unlinking it on exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        _, _, nbr_slots, slot_size = HEADER.unpack_from(shm.buf, 0)
+        sub = cls(shm, False, nbr_slots, slot_size)
+        sub.policy = policy
+        sub.next_index = sub.head()   # only packets published from now on
+        sub.dropped = 0
+        return sub
+
+    def _read(self, index):
+        """ (addr, payload, arrival) of packet index, or None if its slot has been reused. """
+        offset = HEADER_SIZE + (index % self.nbr_slots) * self.stride
+        if STAMP.unpack_from(self.buf, offset)[0] != index:
+            return None
+        arrival, a, b, c, d, port, length = SLOT_INFO.unpack_from(self.buf, offset + STAMP.size)
+        payload = bytes(self.buf[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + length])
+        if STAMP.unpack_from(self.buf, offset)[0] != index:
+            return None
+        return (f"{a}.{b}.{c}.{d}", port), payload, arrival
+
+    def get(self):
+        """ The next packet according to the policy as (addr, payload bytes, arrival), or None. """
+        while True:
+            head = self.head()
+            if self.next_index >= head:
+                return None
+            if self.policy == "latest":
+                index = head - 1
+            else:
+                index = max(self.next_index, head - self.nbr_slots + 1)   # keep a slot's margin from the writer
+            self.dropped += index - self.next_index
+            self.next_index = index + 1
+            msg = self._read(index)
+            if msg is not None:
+                return msg
+            self.dropped += 1   # overwritten while reading, try the next one
+
+    def available(self):
+        return max(0, self.head() - self.next_index)
+
+    def publisher_alive(self, timeout=1.0):
+        return time.time() - HEADER.unpack_from(self.buf, 0)[1] < timeout
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Telemetry fan-out hub tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    watch = sub.add_parser("watch", help="subscribe to the running hub and print rate and drops")
+    watch.add_argument("--policy", choices=POLICIES, default="lossless")
+    bench = sub.add_parser("bench", help="publish at a high rate to subscribers in other processes")
+    bench.add_argument("--rate", type=float, default=1000, help="packets per second")
+    bench.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    if args.command == "watch":
+        subscriber = TelemetrySubscriber.attach(policy=args.policy)
+        count, start = 0, time.time()
+        while True:
+            msg = subscriber.get()
+            if msg is None:
+                time.sleep(0.005)
+            else:
+                count += 1
+            if time.time() - start >= 1:
+                print(f"{count} packets/s, dropped {subscriber.dropped}, publisher alive {subscriber.publisher_alive()}")
+                count, start = 0, time.time()
+
+    def consume(name, policy, poll, seconds, results):
+        subscriber = TelemetrySubscriber.attach(name, policy)
+        received, latencies = 0, []
+        end = time.time() + seconds
+        while time.time() < end:
+            msg = subscriber.get()
+            if msg is None:
+                time.sleep(poll)
+                continue
+            received += 1
+            latencies.append(time.time() - msg[2])
+        results.put((policy, poll, received, subscriber.dropped, float(np.mean(latencies) * 1000) if latencies else 0))
+        subscriber.close()
+
+    name = TELEMETRY_HUB_NAME + "_bench"
+    hub = TelemetryHub.create(name)
+    results = multiprocessing.Queue()
+    consumers = [multiprocessing.Process(target=consume, args=(name, policy, poll, args.seconds + 1, results))
+                 for policy, poll in (("lossless", 0.001), ("lossless", 0.02), ("latest", 0.02))]
+    for p in consumers:
+        p.start()
+    time.sleep(0.5)
+    payload = b'{"g_axil":0.01,"g_side":0.02,"g_nrml":1.0,"phi":1.5,"theta":2.5,"Rrad":0.01,"icao":"C172"}'
+    n = int(args.rate * args.seconds)
+    cost = []
+    start = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter()
+        hub.publish(payload, ("127.0.0.1", 49000))
+        cost.append(time.perf_counter() - t)
+        time.sleep(max(0.0, start + (i + 1) / args.rate - time.perf_counter()))
+    for p in consumers:
+        p.join()
+    # forked subscribers share this process's resource tracker, their attach unregistered the segment
+    resource_tracker.register(hub.shm._name, "shared_memory")
+    print(f"published {n} packets at {args.rate:.0f}/s, publish {np.mean(cost) * 1e6:.1f} us mean, "
+          f"{np.percentile(cost, 99) * 1e6:.1f} us p99")
+    while not results.empty():
+        policy, poll, received, dropped, latency = results.get()
+        print(f"{policy:>8} subscriber polling every {poll * 1000:4.0f} ms: received {received}, "
+              f"dropped {dropped}, mean delay {latency:.2f} ms")
+    hub.close()
@@ -29,6 +29,7 @@ class UdpSend(object):
 import socket
 import struct
 import threading
+import time
 import os
 from queue import Queue
 import logging
@@ -36,9 +37,13 @@ import logging
 log = logging.getLogger(__name__)
     
 class UdpReceive:
-    def __init__(self, port, encoding='utf-8', multicast_group=None,):
+    def __init__(self, port, encoding='utf-8', multicast_group=None, timestamp=False, on_receive=None):
+        # with timestamp=True queued messages are (addr, msg, arrival time.time())
+        # on_receive(raw bytes, addr, arrival) is called on the listener thread after each message is queued
         self.in_q = Queue()
+        self.on_receive = on_receive
         self.encodeing = encoding
+        self.timestamp = timestamp
         self.sender_addr = None  # populated upon receiving messages
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -88,11 +93,18 @@ class UdpReceive:
         MAX_MSG_LEN = 512
         while True:
             try:
-                msg, addr = sock.recvfrom(MAX_MSG_LEN)
-                if self.encodeing:
-                    msg = msg.decode(self.encodeing).rstrip()
-                self.in_q.put((addr, msg))
+                raw, addr = sock.recvfrom(MAX_MSG_LEN)
+                arrival = time.time()
+                msg = raw.decode(self.encodeing).rstrip() if self.encodeing else raw
+                if self.timestamp:
+                    self.in_q.put((addr, msg, arrival))
+                else:
+                    self.in_q.put((addr, msg))
+                if self.on_receive:
+                    self.on_receive(raw, addr, arrival)
             except Exception as e:
+                if sock.fileno() == -1:
+                    break   # closed by close_socket
                 # log.error("UDP listen error: %s", e)
                 print(e)
                 pass
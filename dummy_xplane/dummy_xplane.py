@@ -1,5 +1,6 @@
 import sys
 import json
+import time
 from PyQt5.QtWidgets import QApplication, QWidget, QMainWindow
 from PyQt5 import uic
 from PyQt5.QtCore import Qt, QTimer
@@ -72,6 +73,8 @@ class DummyXPlaneApp(QMainWindow):
 
     def update_slider(self, slider_value):
         self.frame_count = int((slider_value / self.sld_record.maximum()) * self.player.record_count)
+        if self.is_playing:
+            self.player.seek(self.frame_count)
         self.show_curr_rec(self.frame_count)
         
     def playback_started(self):
@@ -105,6 +108,9 @@ class DummyXPlaneApp(QMainWindow):
     def send_telemetry(self):
         if self.is_playing and not self.is_paused :
             rec = self.player.playback_service()
+            if rec is None:
+                self.playback_started()  # end of recording, reset play button
+                return
             if self.frame_count < self.player.record_count:
                 self.frame_count += 1
             self.show_curr_rec(self.frame_count)
@@ -126,7 +132,8 @@ class DummyXPlaneApp(QMainWindow):
                     "Rrad": -self.transform_values[5] / norm_factors[5],
                     "phi": 0,
                     "theta": 0,
-                    "icao": self.icao_code
+                    "icao": self.icao_code,
+                    "ts": time.time()
                 }
                 telemetry_json = json.dumps(telemetry_dict)
                 #print("TELEMETRY TICK")
@@ -141,11 +148,15 @@ class DummyXPlaneApp(QMainWindow):
         if self.heartbeat_udp.available():
             while self.heartbeat_udp.available() > 0:
                 addr, payload = self.heartbeat_udp.get()
+            t1 = time.time()
             timestamp = datetime.now().strftime("%H:%M:%S")
             if self.xplane_running:
                 reply = f"xplane_running at {timestamp}"
             else:
                 reply = f"X-Plane not detected at {timestamp}"
+            fields = payload.split(',')
+            if len(fields) > 1:  # echo ping time with receive and send times for clock offset estimate
+                reply += f",{fields[1]},{t1:.6f},{time.time():.6f}"
             self.heartbeat_udp.send(reply, addr)
             print(f"[HEARTBEAT] {reply} -> {addr}")
 
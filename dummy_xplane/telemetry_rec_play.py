@@ -1,34 +1,114 @@
 ##############################################################################
 # telemetry_rec_play.py  –  for recording & playback of telemetry data
 ##############################################################################
-import pathlib, io, itertools, typing
+"""
+Recordings are stored in a compact binary format:
+
+    header (64 bytes, little endian)
+        magic         4s   b"MDXT"
+        version       u16
+        nbr_dof       u16  always 6
+        interval_ms   u32
+        record_count  u64  patched in place (O(1)) as the file grows
+        vehicle       40s  utf-8, NUL padded
+        value_bytes   u8   4 (float32) or 8 (float64), 0 in version 1 files means 4
+        flags         u8   FLAG_SYNTHETIC_TIME: t was made from interval_ms (csv without t)
+        reserved      2 bytes
+    frames (record_count x 32 or 56 bytes)
+        t             f8   seconds since the start of recording
+        dof           6 x f4 or f8   x, y, z, roll, pitch, yaw
+
+Live recordings use float32, the precision X-Plane datarefs have; csv imports
+keep float64 so csv -> binary -> csv gives back the same values and layout.
+
+The player memory-maps the frame array so start-up cost does not depend on the
+length of the recording, and supports random seek, looping and variable speed.
+The older text CSV recordings can still be played directly and can be converted
+with csv_to_binary() / binary_to_csv().
+"""
+import pathlib, io, typing, struct, time
+import numpy as np
 
 # ───────────────────────────── COMMON PARTS ─────────────────────────────── #
 class TelemetryError(Exception):
     """Wraps all I/O-level issues so callers can `except TelemetryError` once."""
 
-_HEADER_TEMPLATE = (
+_MAGIC = b"MDXT"
+_VERSION = 2
+_NBR_DOF = 6
+_HEADER = struct.Struct("<4sHHIQ40sBB2x")                # 64 bytes
+_RECORD_COUNT_OFFSET = 12                                # byte offset of record_count
+_RECORD_COUNT = struct.Struct("<Q")
+FLAG_SYNTHETIC_TIME = 1
+
+
+def frame_dtype(value_bytes=4):
+    return np.dtype([("t", "<f8"), ("dof", f"<f{value_bytes}", (_NBR_DOF,))])
+
+
+FRAME_DTYPE = frame_dtype(4)
+
+_CSV_HEADER_TEMPLATE = (
     "# interval_ms: {interval_ms}\n"
     "# vehicle: {vehicle}\n"
     "# record_count: {rec_count}\n"
-    "x,y,z,roll,pitch,yaw\n"
+    "t,x,y,z,roll,pitch,yaw\n"
 )
 
+
+def _pack_header(interval_ms, vehicle, rec_count, value_bytes=4, flags=0):
+    return _HEADER.pack(_MAGIC, _VERSION, _NBR_DOF, int(interval_ms), rec_count,
+                        vehicle.encode("utf-8")[:40], value_bytes, flags)
+
+
+def _read_header(f):
+    """Returns (interval_ms, vehicle, record_count, value_bytes, flags) or raises TelemetryError."""
+    raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise TelemetryError("File too short for a telemetry header")
+    magic, version, nbr_dof, interval_ms, rec_count, vehicle, value_bytes, flags = _HEADER.unpack(raw)
+    if magic != _MAGIC:
+        raise TelemetryError("Not a binary telemetry recording")
+    if version not in (1, _VERSION) or nbr_dof != _NBR_DOF:
+        raise TelemetryError(f"Unsupported recording version {version} ({nbr_dof} dof)")
+    if version == 1:
+        value_bytes, flags = 4, 0     # reserved bytes, always zero
+    if value_bytes not in (4, 8):
+        raise TelemetryError(f"Unsupported value size {value_bytes} bytes")
+    return interval_ms, vehicle.rstrip(b"\x00").decode("utf-8", "replace"), rec_count, value_bytes, flags
+
+
+def is_binary_recording(file_name: str) -> bool:
+    try:
+        with open(file_name, "rb") as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    except OSError:
+        return False
+
 # ───────────────────────────── RECORDING ────────────────────────────────── #
 class TelemetryRecorder:
     """
     rec = TelemetryRecorder()
-    rec.record_begin("log.csv", 16, "F-18")
+    rec.record_begin("log.tlm", 16, "F-18")
     ...
-    rec.update([x, y, z, roll, pitch, yaw])
+    rec.update([x, y, z, roll, pitch, yaw])      # timestamp taken from perf_counter
     ...
     rec.close()   # or rec.abort()
+
+    Frames are collected in a preallocated block and appended to the file a
+    block at a time; record_count in the header is patched after every block so
+    a recording interrupted by a crash is still readable. value_bytes is 4
+    (float32) or 8 (float64).
     """
 
-    def __init__(self):
-        self._f: io.TextIOBase | None = None
+    def __init__(self, block_frames: int = 256, value_bytes: int = 4):
+        self._f: io.BufferedWriter | None = None
         self._path: pathlib.Path | None = None
+        self._value_bytes = value_bytes
+        self._block = np.zeros(block_frames, dtype=frame_dtype(value_bytes))
+        self._block_len = 0
         self._record_counter = 0
+        self._start_time = 0.0
         self._open = False
 
     # ── API ─────────────────────────────────────────────────────────────── #
@@ -37,35 +117,36 @@ class TelemetryRecorder:
             raise TelemetryError("Recorder already active; call close() first")
         self._path = pathlib.Path(file_name)
         try:
-            self._f = self._path.open("w", newline="\n", encoding="utf-8")
+            self._f = self._path.open("wb")
         except OSError as e:
             raise TelemetryError(f"Cannot open '{file_name}' for writing: {e}") from e
-        self._f.write(_HEADER_TEMPLATE.format(
-            interval_ms=interval_ms, vehicle=vehicle, rec_count=0
-        ))
+        self._f.write(_pack_header(interval_ms, vehicle, 0, self._value_bytes))
+        self._start_time = time.perf_counter()
         self._open = True
 
-    def update(self, dof6: typing.Sequence[float]):
+    def update(self, dof6: typing.Sequence[float], timestamp: float | None = None):
+        """Append one frame; timestamp is seconds since record_begin (measured if None)."""
         if not self._open:
             raise TelemetryError("Recorder not started – call record_begin()")
-        if len(dof6) != 6:
+        if len(dof6) != _NBR_DOF:
             raise TelemetryError("update() expects exactly 6 DOF values")
-        self._f.write(",".join(map(str, dof6)) + "\n")
+        row = self._block[self._block_len]
+        row["t"] = time.perf_counter() - self._start_time if timestamp is None else timestamp
+        row["dof"] = dof6
+        self._block_len += 1
         self._record_counter += 1
+        if self._block_len == len(self._block):
+            self._flush_block()
 
     def close(self):
-        """Patch record_count in header, then fully close file."""
+        """Write any buffered frames, patch record_count in header, then close file."""
         if not self._open:
             return
-        self._f.flush(); self._f.close()
-
-        # rewrite 3rd line with correct record_count
-        with self._path.open("r+", encoding="utf-8") as f:
-            lines = f.readlines()
-            lines[2] = f"# record_count: {self._record_counter}\n"
-            f.seek(0); f.writelines(lines); f.truncate()
-
-        self._reset()
+        try:
+            self._flush_block()
+        finally:
+            self._f.close()
+            self._reset()
 
     def abort(self):
         """Throw away file in progress (if any) and release handle."""
@@ -74,10 +155,28 @@ class TelemetryRecorder:
             finally: self._path.unlink(missing_ok=True)   # delete partial file
         self._reset()
 
+    @property
+    def record_count(self):
+        return self._record_counter
+
     # ── helpers ──────────────────────────────────────────────────────────── #
+    def _flush_block(self):
+        if self._block_len:
+            try:
+                self._f.write(self._block[:self._block_len].tobytes())
+                end = self._f.tell()
+                self._f.seek(_RECORD_COUNT_OFFSET)
+                self._f.write(_RECORD_COUNT.pack(self._record_counter))
+                self._f.seek(end)
+                self._f.flush()
+            except OSError as e:
+                raise TelemetryError(f"Error writing '{self._path}': {e}") from e
+            self._block_len = 0
+
     def _reset(self):
         self._f = None
         self._path = None
+        self._block_len = 0
         self._record_counter = 0
         self._open = False
 
@@ -86,48 +185,41 @@ class TelemetryRecorder:
 class TelemetryPlayer:
     """
     player = TelemetryPlayer()
-    player.start_playback("log.csv")
+    player.start_playback("log.tlm")    # binary or legacy csv
+    player.set_speed(0.5)               # optional, 1.0 is recorded speed
+    player.set_loop(True)               # optional
     while True:
         rec = player.playback_service()
         if rec is None: break           # finished or aborted
         use(rec)
     player.stop_playback()              # optional explicit cleanup
+
+    Each call to playback_service advances the play position by `speed` frames,
+    frames between recorded samples are linearly interpolated.
     """
 
     def __init__(self):
-        self._f: io.TextIOBase | None = None
-        self._data_iter: typing.Iterator[list[float]] | None = None
+        self._frames: np.ndarray | None = None
         self.interval_ms: int | None = None
         self.vehicle: str | None = None
         self.record_count: int | None = None
+        self.synthetic_time = False     # timestamps were made from interval_ms
+        self.speed = 1.0
+        self.loop = False
+        self._position = 0.0
         self._open = False
 
     # ── API ─────────────────────────────────────────────────────────────── #
     def start_playback(self, file_name: str):
         if self._open:
             raise TelemetryError("Playback already active; call stop_playback()")
-        try:
-            self._f = open(file_name, encoding="utf-8")
-        except OSError as e:
-            raise TelemetryError(f"Cannot open '{file_name}' for playback: {e}") from e
-
-        # ---- parse header block ----
-        headers = []
-        while True:
-            pos = self._f.tell()
-            line = self._f.readline()
-            if not line.startswith("#"):
-                self._f.seek(pos)        # rewind to first data row
-                break
-            headers.append(line.strip())
-
-        kv = dict(h[1:].split(":", 1) for h in headers)
-        self.interval_ms = int(kv[" interval_ms"])
-        self.vehicle      = kv[" vehicle"].strip()
-        self.record_count = int(kv[" record_count"])
-
-        # ---- generator over remaining rows ----
-        self._data_iter = self._iter_rows()
+        if is_binary_recording(file_name):
+            self._frames, self.interval_ms, self.vehicle, flags = _map_binary(file_name)
+        else:
+            self._frames, self.interval_ms, self.vehicle, flags = _load_csv(file_name)
+        self.synthetic_time = bool(flags & FLAG_SYNTHETIC_TIME)
+        self.record_count = len(self._frames)
+        self._position = 0.0
         self._open = True
 
     def playback_service(self):# -> list[float] | None:
@@ -136,49 +228,184 @@ class TelemetryPlayer:
         """
         if not self._open:
             raise TelemetryError("Playback not started – call start_playback()")
-        try:
-            return next(self._data_iter)
-        except StopIteration:
-            self.stop_playback()
-            return None
+        if self._position > self.record_count - 1:
+            if self.loop and self.record_count > 0:
+                self._position %= self.record_count
+            else:
+                self.stop_playback()
+                return None
+        rec = self._interpolate(self._position)
+        self._position += self.speed
+        return rec
+
+    def seek(self, index: int):
+        """Move the play position to the given record index (clamped to the recording)."""
+        if not self._open:
+            raise TelemetryError("Playback not started – call start_playback()")
+        self._position = float(min(max(index, 0), max(self.record_count - 1, 0)))
+
+    def seek_time(self, seconds: float):
+        """Move the play position to the first record at or after the given timestamp."""
+        if not self._open:
+            raise TelemetryError("Playback not started – call start_playback()")
+        self.seek(int(np.searchsorted(self._frames["t"], seconds)))
+
+    def set_speed(self, speed: float):
+        if speed <= 0:
+            raise TelemetryError("Playback speed must be greater than zero")
+        self.speed = speed
+
+    def set_loop(self, state: bool):
+        self.loop = state
+
+    @property
+    def position(self) -> int:
+        return int(self._position)
+
+    def frames(self) -> np.ndarray:
+        """Read-only view of all frames (fields 't' and 'dof')."""
+        return self._frames
 
     def stop_playback(self):
-        """Close file handle and invalidate iterator; safe to call multiple times."""
-        if self._open and self._f:
-            self._f.close()
-        self._f = None
-        self._data_iter = None
+        """Release the file mapping; safe to call multiple times."""
+        self._frames = None
         self._open = False
 
     # ── helpers ──────────────────────────────────────────────────────────── #
-    def _iter_rows(self):
-        """Internal generator reading one CSV row at a time."""
-        for row in self._f:
-            row = row.strip()
-            if not row or row[0].isalpha():   # skip blank line or column header
-                continue
-            try:
-                yield [float(tok) for tok in row.split(",")]
-            except ValueError as e:
-                raise TelemetryError(f"Malformed data row: '{row}'") from e
+    def _interpolate(self, position):
+        idx = int(position)
+        frac = position - idx
+        dof = self._frames["dof"]
+        if frac == 0 or idx + 1 >= self.record_count:
+            return dof[idx].tolist()
+        return ((1.0 - frac) * dof[idx] + frac * dof[idx + 1]).tolist()
+
+
+def _map_binary(file_name):
+    try:
+        with open(file_name, "rb") as f:
+            interval_ms, vehicle, rec_count, value_bytes, flags = _read_header(f)
+        size = pathlib.Path(file_name).stat().st_size
+    except OSError as e:
+        raise TelemetryError(f"Cannot open '{file_name}' for playback: {e}") from e
+    dtype = frame_dtype(value_bytes)
+    # record_count is patched per block, the file size is authoritative if the recorder died
+    on_disk = (size - _HEADER.size) // dtype.itemsize
+    if rec_count != on_disk:
+        rec_count = on_disk
+    if rec_count == 0:
+        return np.zeros(0, dtype=dtype), interval_ms, vehicle, flags
+    frames = np.memmap(file_name, dtype=dtype, mode="r",
+                       offset=_HEADER.size, shape=(rec_count,))
+    return frames, interval_ms, vehicle, flags
+
+
+def _load_csv(file_name):
+    """Parse a legacy (or exported) csv recording into an in-memory float64 frame array."""
+    try:
+        with open(file_name, encoding="utf-8") as f:
+            headers = []
+            columns = None
+            for line in f:
+                if line.startswith("#"):
+                    headers.append(line.strip())
+                else:
+                    columns = line.strip().split(",")
+                    break
+            rows = np.loadtxt(f, delimiter=",", ndmin=2) if columns else np.zeros((0, 6))
+    except OSError as e:
+        raise TelemetryError(f"Cannot open '{file_name}' for playback: {e}") from e
+    except ValueError as e:
+        raise TelemetryError(f"Malformed data row in '{file_name}': {e}") from e
+
+    kv = dict(h[1:].split(":", 1) for h in headers)
+    try:
+        interval_ms = int(kv[" interval_ms"])
+        vehicle = kv[" vehicle"].strip()
+    except KeyError as e:
+        raise TelemetryError(f"Missing header field {e} in '{file_name}'") from e
+
+    if columns and not columns[0][:1].isalpha():
+        # no column header line, the first line read was data
+        rows = np.vstack([np.asarray(columns, dtype=float), rows])
+    frames = np.zeros(len(rows), dtype=frame_dtype(8))
+    if columns and columns[0] == "t":
+        frames["t"] = rows[:, 0]
+        frames["dof"] = rows[:, 1:7]
+        flags = 0
+    else:
+        frames["t"] = np.arange(len(rows)) * (interval_ms / 1000.0)
+        frames["dof"] = rows[:, :6]
+        flags = FLAG_SYNTHETIC_TIME
+    return frames, interval_ms, vehicle, flags
+
+# ───────────────────────────── CONVERSION ───────────────────────────────── #
+def csv_to_binary(csv_name: str, bin_name: str) -> int:
+    """
+    Convert a csv recording to the binary format, returns the number of frames.
+    Values are stored as float64 so nothing is lost, csv files without a t column
+    are flagged so binary_to_csv writes them back without one.
+    """
+    frames, interval_ms, vehicle, flags = _load_csv(csv_name)
+    try:
+        with open(bin_name, "wb") as f:
+            f.write(_pack_header(interval_ms, vehicle, len(frames), 8, flags))
+            f.write(frames.tobytes())
+    except OSError as e:
+        raise TelemetryError(f"Cannot write '{bin_name}': {e}") from e
+    return len(frames)
+
+
+def binary_to_csv(bin_name: str, csv_name: str) -> int:
+    """
+    Export a binary recording to csv, returns the number of frames.
+    Values are written with enough digits to read back bit-exact; recordings
+    imported from csv without a t column are written without one.
+    """
+    frames, interval_ms, vehicle, flags = _map_binary(bin_name)
+    dof = frames["dof"].astype(np.float64)
+    value_fmt = ["%.17g" if frames.dtype["dof"].base.itemsize == 8 else "%.9g"] * _NBR_DOF
+    header = _CSV_HEADER_TEMPLATE.format(interval_ms=interval_ms, vehicle=vehicle, rec_count=len(frames))
+    if flags & FLAG_SYNTHETIC_TIME:
+        table, fmt = dof, value_fmt
+        header = header.replace("t,x", "x")
+    else:
+        table, fmt = np.column_stack([frames["t"], dof]), ["%.17g"] + value_fmt
+    try:
+        with open(csv_name, "w", newline="\n", encoding="utf-8") as f:
+            f.write(header)
+            np.savetxt(f, table, delimiter=",", fmt=fmt)
+    except OSError as e:
+        raise TelemetryError(f"Cannot write '{csv_name}': {e}") from e
+    return len(frames)
 
 
 # ──────────────────────── basic capture harness ─────────────────────────── #
 if __name__ == '__main__':
     """
-    Run this file as a script to capture one CSV log of X-Plane motion data.
+    Run this file as a script to capture one binary log of X-Plane motion data.
     
-    • The CSV is named "<ICAO>_<YYYYMMDD_HHMMSS>.csv" in the current folder.
+    • The log is named "<ICAO>_<YYYYMMDD_HHMMSS>.tlm" in the current folder.
     • Recording starts automatically on the first valid telemetry frame.
+    • If the sim interface is running, frames are taken from its telemetry hub
+      (common/telemetry_hub.py), so recording and flying share one stream.
     • Press any key (in the console) to stop and finalise the file.
+
+    Existing recordings can be converted with:
+        telemetry_rec_play.py import <in.csv> <out.tlm>
+        telemetry_rec_play.py export <in.tlm> <out.csv>
     """
     import time, datetime, sys, os, select
+    if len(sys.argv) == 4 and sys.argv[1] in ("import", "export"):
+        convert = csv_to_binary if sys.argv[1] == "import" else binary_to_csv
+        print(f"{convert(sys.argv[2], sys.argv[3])} records written to {sys.argv[3]}")
+        sys.exit()
     if os.name == 'nt':               # Win32: non-blocking key detection
         import msvcrt
 
     # --------- external dependency ------------------------------------------------
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    from xplane_telemetry import XplaneTelemetry
+    from sims.xplane_telemetry import XplaneTelemetry
 
     # --------- user-editable section ----------------------------------------------
     TELEMETRY_EVT_PORT = 10022
@@ -187,14 +414,21 @@ if __name__ == '__main__':
     DEFAULT_INTERVAL_MS = 25                        # fallback if we cannot measure
 
     # --------- initialise objects --------------------------------------------------
-    telemetry = XplaneTelemetry((SIM_IP, TELEMETRY_EVT_PORT), NORM_FACTORS)
+    try:
+        # the core is running: record what it receives through its telemetry hub
+        telemetry = XplaneTelemetry((SIM_IP, TELEMETRY_EVT_PORT), NORM_FACTORS, subscribe=True)
+        print("Recording from the telemetry hub of the running sim interface")
+    except FileNotFoundError:
+        telemetry = XplaneTelemetry((SIM_IP, TELEMETRY_EVT_PORT), NORM_FACTORS)
     recorder  = TelemetryRecorder()
 
     recording_started = False
-    first_timestamp   = None
+    first_arrival     = None
+    last_arrival      = None
 
-    input("press enter key when xplane is ready")
-    telemetry.send('InitComs') 
+    if not telemetry.subscribed:
+        input("press enter key when xplane is ready")
+        telemetry.send('InitComs') 
      
     print("Ready – waiting for first telemetry frame "
           "(press any key at any time to stop)…")
@@ -214,16 +448,18 @@ if __name__ == '__main__':
 
             # ---- grab latest sim data --------------------------------------------
             transform = telemetry.get_telemetry()       # list[6] or None
-            if transform is None:
-                continue                                # no data this poll
+            if transform is None or telemetry.last_arrival == last_arrival:
+                time.sleep(0.001)                       # no new packet this poll
+                continue
+            last_arrival = telemetry.last_arrival
 
             icao = telemetry.get_icao() or "UNKNOWN"
 
             # ---- auto-start recording on very first frame ------------------------
             if not recording_started:
                 ts                = datetime.datetime.now()
-                file_name         = f"{icao}_{ts:%Y%m%d_%H%M%S}.csv"
-                first_timestamp   = time.perf_counter()
+                file_name         = f"{icao}_{ts:%Y%m%d_%H%M%S}.tlm"
+                first_arrival     = last_arrival
                 try:
                     recorder.record_begin(file_name, DEFAULT_INTERVAL_MS, icao)
                 except TelemetryError as e:
@@ -232,17 +468,8 @@ if __name__ == '__main__':
                 recording_started = True
                 print(f"Recording ➜ {file_name}")
 
-            # ---- write the sample ------------------------------------------------
-            recorder.update(transform)
-
-            # ---- (optional) compute actual sample interval for debug -------------
-            # You can remove this block if you don't care about runtime rate.
-            now = time.perf_counter()
-            if first_timestamp:
-                actual_ms = (now - first_timestamp) * 1000
-                first_timestamp = now
-                # uncomment for verbose output
-                # print(f"Δt ≈ {actual_ms:6.1f} ms   {transform}")
+            # ---- write the sample, one per packet, timed by its arrival ----------
+            recorder.update(transform, last_arrival - first_arrival)
 
     finally:
         # ensure everything is flushed even on Ctrl-C or unexpected error
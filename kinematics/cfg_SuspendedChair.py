@@ -13,6 +13,22 @@ class PlatformConfig(object):
     PLATFORM_CLEARANCE_OFFSET = 0   # Minimum clearance in mm between platform and base when active
     PLATFORM_LOWEST_Z = -1085       # Z offset of platform when muscles are at full extension (max length)
 
+    # closed loop pressure control: PI correction of the d_to_p pressures using the measured pressures
+    PRESSURE_CONTROL = False
+    PRESSURE_KP = 0.3               # correction per mbar of error
+    PRESSURE_KI = 2.0               # integral gain, per second
+    PRESSURE_MAX_CORRECTION = 600   # mbar
+    PRESSURE_MAX_RATE = 20000       # mbar per second
+
+    # continuous payload estimation from measured pressures (the load level buttons only set the starting value).
+    # Off until validated on the rig: the PtoD sweeps only cover 40 and 80 kg, estimates outside that are
+    # extrapolated. To opt in set True; this polls the Festo pressures and the estimate replaces the
+    # operator's load level while running
+    PAYLOAD_ESTIMATION = False
+    PAYLOAD_PTOD_FILES = ("output/PtoD_40.csv", "output/PtoD_80.csv")   # pressure sweeps at known payloads
+    PAYLOAD_ESTIMATE_INTERVAL = 1.0         # seconds between estimates
+    PAYLOAD_ESTIMATE_TIME_CONSTANT = 10.0   # seconds, smoothing of the estimate
+
 
     def __init__(self):
        
@@ -0,0 +1,83 @@
+"""
+ conditioning.py
+
+ Converts the normalized transform from the sim into the real world request passed to
+ kinematics, with all the static linear stages compiled into one 6x6 matrix.
+
+ The stages, in order, were applied separately every frame:
+   1. UI gains:        axis gain * master gain * intensity percent / 100
+   2. inversion:       invert_axis from the platform config (+1 or -1 per axis)
+   3. dynamics gains:  Dynamics.gains * Dynamics.master_gain (shape.cfg)
+   4. clip:            each axis limited to -1..1
+   5. range:           normalized values scaled to mm and radians (LIMITS_1DOF_TRANFORM)
+   6. roll/pitch swap: x<->y and roll<->pitch if SWAP_ROLL_PITCH is set
+
+ Stages 1-3 multiply each axis by a constant g, so clipping g*x to -1..1 is the same as
+ clipping x to -1/|g|..1/|g| before the multiply. The whole chain then becomes
+     request = M @ clip(transform, -limit, limit)
+ with M = swap @ diag(range * g) and limit = 1/|g|, rebuilt only when a gain, the
+ intensity or the config changes. apply() works in preallocated buffers.
+
+ Running this module checks the fused result against the separate stages.
+"""
+
+import numpy as np
+
+
+class TransformConditioner(object):
+    def __init__(self):
+        self.matrix = np.eye(6)
+        self.limit = np.full(6, np.inf)
+        self.clipped = np.zeros(6)   # working buffers, apply() allocates nothing
+        self.request = np.zeros(6)
+
+    def build(self, gains, master_gain, intensity_percent, invert_axis,
+              dynamics_gains, dynamics_master_gain, ranges, swap_roll_pitch):
+        """ Recompile the matrix and clip limits from the current settings (stage order in the module docstring). """
+        g = (np.asarray(gains, dtype=float) * master_gain * intensity_percent / 100.0
+             * np.asarray(invert_axis, dtype=float)
+             * np.asarray(dynamics_gains, dtype=float) * dynamics_master_gain)
+        with np.errstate(divide="ignore"):
+            self.limit = np.where(g != 0, 1.0 / np.abs(g), np.inf)
+        swap = np.eye(6)
+        if swap_roll_pitch:
+            swap = swap[[1, 0, 2, 4, 3, 5]]
+        self.matrix = swap @ np.diag(np.asarray(ranges, dtype=float) * g)
+
+    def apply(self, transform):
+        """ Returns the request for a normalized transform; the array is reused by the next call. """
+        np.clip(transform, -self.limit, self.limit, out=self.clipped)
+        np.dot(self.matrix, self.clipped, out=self.request)
+        return self.request
+
+
+if __name__ == "__main__":
+    # the fused matrix must match the stages applied one at a time
+    rng = np.random.default_rng(1)
+    conditioner = TransformConditioner()
+    worst = 0.0
+    for trial in range(1000):
+        gains = rng.uniform(0, 1.5, 6)
+        gains[rng.integers(6)] = 0 if trial % 10 == 0 else gains[0]
+        master, intensity = rng.uniform(0, 1.5), rng.integers(0, 151)
+        invert = rng.choice([-1, 1], 6)
+        dyn_gains, dyn_master = rng.uniform(0, 1.5, 6), rng.uniform(0, 1.5)
+        ranges = rng.uniform(10, 200, 6)
+        swap = bool(trial % 2)
+        transform = rng.uniform(-2, 2, 6)
+
+        t = transform * gains * master * intensity / 100.0
+        t = t * invert
+        r = np.clip(t * dyn_gains * dyn_master, -1, 1) * ranges
+        if swap:
+            r[0], r[1], r[3], r[4] = r[1], r[0], r[4], r[3]
+
+        conditioner.build(gains, master, intensity, invert, dyn_gains, dyn_master, ranges, swap)
+        worst = max(worst, np.abs(conditioner.apply(transform) - r).max())
+    print(f"1000 random settings: largest difference from separate stages {worst:.2e}")
+
+    import timeit
+    conditioner.build(np.ones(6), 1, 100, np.ones(6), np.ones(6), 1, np.ones(6) * 100, True)
+    transform = rng.uniform(-1, 1, 6)
+    fused = timeit.timeit(lambda: conditioner.apply(transform), number=20000) / 20000
+    print(f"apply: {fused * 1e6:.1f} us per frame")
@@ -2,14 +2,17 @@
 
 import traceback
 import numpy as np
-from PyQt5 import QtCore, QtGui, QtWidgets, uic
 
-ui, base = uic.loadUiType("kinematics/dynamics_gui.ui")
+def load_frame_gui():
+    """ The optional tuning gui needs Qt, imported only when used so dynamics runs without Qt. """
+    from PyQt5 import QtWidgets, uic
+    ui, base = uic.loadUiType("kinematics/dynamics_gui.ui")
 
-class frame_gui(QtWidgets.QFrame, ui):
-    def __init__(self, parent=None):
-        super(frame_gui, self).__init__(parent)
-        self.setupUi(self)
+    class frame_gui(QtWidgets.QFrame, ui):
+        def __init__(self, parent=None):
+            super(frame_gui, self).__init__(parent)
+            self.setupUi(self)
+    return frame_gui
 
 import logging
 log = logging.getLogger(__name__)
@@ -23,7 +26,7 @@ class Dynamics(object):
     def init_gui(self, frame):
         # self.ui = Ui_Frame()        
         #self.ui.setupUi(frame)
-        self.ui = frame_gui(frame)
+        self.ui = load_frame_gui()(frame)
         self.use_gui = True
         self.intensity_sliders = [self.ui.sld_x_0, self.ui.sld_y_1,self.ui.sld_z_2,self.ui.sld_roll_3,
                                   self.ui.sld_pitch_4,self.ui.sld_yaw_5,self.ui.sld_master_6]
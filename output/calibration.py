@@ -0,0 +1,305 @@
+"""
+ calibration.py
+
+ Builds distance to pressure tables (the *_DtoP.csv files read by d_to_p.DistanceToPressure)
+ from scripted pressure sweeps instead of by hand.
+
+ For each load the platform is swept from 0 to max_pressure and back at a constant rate,
+ all muscles together, for a number of cycles. PressureSweep steps the sweep once per control
+ frame, so the core runs it through its frame loop like any other move, with nothing else sent
+ to the Festo meanwhile. While sweeping, commanded pressure, measured pressure (polled from the
+ Festo) and muscle lengths (from length_source, e.g. encoders) are logged every step. The fit
+ then, for all samples at once:
+   - bins the measured pressures by compression (max_length - length) rounded to 1 mm,
+     per branch (rising pressure = up, falling = down) and muscle, with np.bincount
+   - fills columns with no samples by interpolation
+   - makes each curve non-decreasing (mean of the running max from the left and the
+     running min from the right, which keeps the noise centred)
+   - takes the median of the six muscles as the table row, the spread is reported
+ Column 0 is always 0 mbar so the deactivated platform is unpressurized.
+
+ Table format (as load_data expects): a '# weights,<load>,...' line padded to the number of
+ columns, then one row of pressures per load for the up branch, then the same for the down
+ branch. Loads are in kg per muscle, as passed to DistanceToPressure.set_load.
+
+ usage (core running, platform deactivated, once per load):
+    core.start_calibration(length_source, load)      # stepped by data_update
+    core.write_calibration("output/calibrated_DtoP.csv")   # after the last load
+
+ usage (standalone, blocking):
+    up, down = calibrate(festo, length_source, loads=(13, 24, 33), max_length=1000,
+                         nbr_columns=251, csv_path="output/calibrated_DtoP.csv")
+
+    python -m output.calibration [--out table.csv]   # end to end against the headless Festo emulator
+                                                     # (MuscleModel), written to a temporary file by default
+"""
+
+import os
+import math
+import time
+import logging
+
+import numpy as np
+
+from output.motion_profile import MotionProfileExecutor
+
+log = logging.getLogger(__name__)
+
+UNMEASURED_PRESSURE = 500   # mbar, commanded pressures above this should read back nonzero
+
+
+class PressureSweep(object):
+    """
+    One load's sweep, stepped once per period (a control frame, or 1/sample_rate in run_sweep):
+    settle seconds at 0 mbar, then cycles of 0 -> max_pressure -> 0 at rate mbar/s, the ramps
+    planned by mover (the platform's MotionProfileExecutor, linear moves if None) over the
+    ramp time, so they are constant rate apart from the profile's rounding at the ends.
+    A sample is logged every step.
+    """
+    def __init__(self, festo, length_source, max_length, period, max_pressure=6000, rate=200, cycles=2,
+                 settle=1.0, mover=None):
+        self.festo = festo
+        self.length_source = length_source
+        self.max_length = max_length
+        self.ramp_time = max_pressure / rate
+        self.ramps = [(0, max_pressure, 0), (max_pressure, 0, 1)] * cycles   # (start, end, branch)
+        self.mover = mover or MotionProfileExecutor(period, "linear")
+        self.branch = 0
+        self.settle_steps = int(round(settle / period))
+        self.nbr_steps = int(math.ceil(len(self.ramps) * self.ramp_time / period)) + len(self.ramps)
+        self.sweep = dict(time=np.empty(self.nbr_steps), commanded=np.empty(self.nbr_steps),
+                          pressure=np.empty((self.nbr_steps, 6)), compression=np.empty((self.nbr_steps, 6)),
+                          branch=np.empty(self.nbr_steps, dtype=int))
+        self.count = 0
+        self.unmeasured = 0
+        self.start_time = None
+        self.done = False
+        self.pressures = [0] * 6   # last sent
+        festo.send_pressures(self.pressures)
+
+    def step(self):
+        """ Send the next pressure and log a sample, returns False once the sweep is complete. """
+        if self.done:
+            return False
+        if self.settle_steps > 0:
+            self.settle_steps -= 1
+            return True
+        pressures = self.mover.step()
+        while pressures is None:
+            if not self.ramps:
+                return self.finish()
+            start, end, self.branch = self.ramps.pop(0)
+            self.mover.start([start] * 6, [end] * 6, duration=self.ramp_time)
+            pressures = self.mover.step()
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        commanded = float(pressures[0])
+        self.pressures = [int(round(commanded))] * 6
+        self.festo.send_pressures(self.pressures)
+        measured = self.festo.get_pressure()
+        if not any(measured):   # not polled, or still 0 at the start of a ramp
+            self.unmeasured += commanded > UNMEASURED_PRESSURE
+            measured = [commanded] * 6
+        i = self.count
+        sweep = self.sweep
+        sweep["time"][i] = time.perf_counter() - self.start_time
+        sweep["commanded"][i] = commanded
+        sweep["pressure"][i] = measured
+        sweep["compression"][i] = self.max_length - np.asarray(self.length_source(), dtype=float)
+        sweep["branch"][i] = self.branch
+        self.count += 1
+        return True
+
+    def finish(self):
+        self.pressures = [0] * 6
+        self.festo.send_pressures(self.pressures)
+        self.done = True
+        if self.unmeasured:
+            log.warning("Calibration: %d of %d samples had no measured pressure, commanded pressure used",
+                        self.unmeasured, self.count)
+        return False
+
+    @property
+    def progress(self):
+        """ Percent of the sweep completed. """
+        return 100.0 * self.count / self.nbr_steps
+
+    def result(self):
+        """ The logged samples: time, commanded (n,), pressure (n, 6), compression (n, 6) and branch (n,). """
+        return {name: values[:self.count] for name, values in self.sweep.items()}
+
+
+def run_sweep(festo, length_source, max_length, max_pressure=6000, rate=200, sample_rate=100, cycles=2,
+              settle=1.0, sleep_func=time.sleep, progress_callback=None):
+    """
+    Run a PressureSweep to completion, stepped every 1/sample_rate s (blocks, for use without the core).
+    Returns a dict of arrays: time, commanded (n,), pressure (n, 6), compression (n, 6) and
+    branch (n,), 0 while the pressure rises and 1 while it falls.
+    """
+    sweep = PressureSweep(festo, length_source, max_length, 1.0 / sample_rate, max_pressure, rate, cycles, settle)
+    start = time.perf_counter()
+    i = 0
+    while sweep.step():
+        i += 1
+        if progress_callback and i % sample_rate == 0:
+            progress_callback(sweep.progress)
+        sleep_func(max(0.0, start + i / sample_rate - time.perf_counter()))
+    return sweep.result()
+
+
+def fit_branches(sweep, nbr_columns):
+    """
+    Returns (rows, spread): rows (2, nbr_columns) are the up and down pressures for each mm of
+    compression, spread (2,) the mean difference in mbar between the highest and lowest muscle.
+    """
+    compression = np.clip(np.rint(sweep["compression"]), 0, nbr_columns - 1).astype(int)
+    curves = 2 * 6   # branch x muscle
+    keys = ((sweep["branch"][:, None] * 6 + np.arange(6)[None, :]) * nbr_columns + compression).ravel()
+    sums = np.bincount(keys, weights=sweep["pressure"].ravel(), minlength=curves * nbr_columns)
+    counts = np.bincount(keys, minlength=curves * nbr_columns)
+    sums, counts = sums.reshape(curves, nbr_columns), counts.reshape(curves, nbr_columns)
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    columns = np.arange(nbr_columns)
+    for curve in range(curves):   # fill the columns the muscle never stopped in
+        seen = counts[curve] > 0
+        if seen.any():
+            means[curve] = np.interp(columns, columns[seen], means[curve][seen])
+    monotonic = (np.maximum.accumulate(means, axis=1) + np.minimum.accumulate(means[:, ::-1], axis=1)[:, ::-1]) / 2
+    monotonic = monotonic.reshape(2, 6, nbr_columns)
+    rows = np.median(monotonic, axis=1)
+    rows[:, 0] = 0
+    spread = (monotonic.max(axis=1) - monotonic.min(axis=1)).mean(axis=1)
+    return np.rint(rows).astype(int), spread
+
+
+def write_d_to_p(csv_path, loads, up_rows, down_rows):
+    """ Write a table in the format read by DistanceToPressure.load_data. """
+    loads = [int(round(load)) for load in loads]
+    if not all(b > a for a, b in zip(loads, loads[1:])):
+        raise ValueError("loads must be in strictly ascending order")
+    nbr_columns = len(up_rows[0])
+    header = ["# weights"] + [str(load) for load in loads]
+    header += [""] * (nbr_columns - len(header))
+    with open(csv_path, "w") as file:
+        file.write(",".join(header) + "\n")
+        for row in list(up_rows) + list(down_rows):
+            file.write(",".join(str(int(p)) for p in row) + "\n")
+    log.info("Calibration: wrote %s, loads %s", csv_path, loads)
+
+
+def prompt_load(load):
+    input(f"Load the platform with {load} kg per muscle and press Enter to start the sweep ")
+
+
+def write_table(sweeps, nbr_columns, csv_path):
+    """ Fit the sweeps ({load: sweep}) and write the table to csv_path. Returns the up and down rows, one per load. """
+    loads = sorted(sweeps)
+    up_rows, down_rows = [], []
+    for load in loads:
+        sweep = sweeps[load]
+        (up, down), spread = fit_branches(sweep, nbr_columns)
+        log.info("Calibration: load %s kg, %d samples, muscle spread up %.0f mbar, down %.0f mbar",
+                 load, len(sweep["time"]), spread[0], spread[1])
+        up_rows.append(up)
+        down_rows.append(down)
+    write_d_to_p(csv_path, loads, up_rows, down_rows)
+    return up_rows, down_rows
+
+
+def calibrate(festo, length_source, loads, max_length, nbr_columns, csv_path, change_load=prompt_load, **sweep_args):
+    """
+    Sweep each load in turn (change_load(load) is called first to set it up) and write the
+    fitted table to csv_path. Returns the up and down rows, one per load. Blocks, for use
+    without the core; with the core running use SimInterfaceCore.start_calibration.
+    """
+    sweeps = {}
+    for load in sorted(loads):
+        if change_load:
+            change_load(load)
+        log.info("Calibration: sweeping load %s kg", load)
+        sweeps[load] = run_sweep(festo, length_source, max_length, **sweep_args)
+    return write_table(sweeps, nbr_columns, csv_path)
+
+
+class MuscleModel(object):
+    """
+    Simulated muscles for calibrating against the Festo emulator: lengths for the emulator's
+    actual pressures from the PtoD sweeps (compression linear in payload, play hysteresis
+    between the up and down branches), with a gain spread between muscles and sensor noise.
+    """
+    def __init__(self, emulator, ptod_files=("output/PtoD_40.csv", "output/PtoD_80.csv"), max_length=1000, seed=5):
+        from output.payload_estimator import load_ptod
+        (self.w0, self.pressures, self.c0), (self.w1, _, self.c1) = [load_ptod(f) for f in ptod_files]
+        self.emulator = emulator
+        self.max_length = max_length
+        self.rng = np.random.default_rng(seed)
+        self.muscle_gain = self.rng.uniform(0.97, 1.03, 6)
+        self.payload = self.w0
+        self.compression = np.zeros(6)
+
+    def set_load(self, load):
+        """ load in kg per muscle, the payload is load * 6 - 25 kg (platform weight). """
+        self.payload = load * 6 - 25
+
+    def branches(self, payload):
+        curves = self.c0 + (payload - self.w0) / (self.w1 - self.w0) * (self.c1 - self.c0)
+        return np.minimum(curves[0], curves[1]), np.maximum(curves[0], curves[1])
+
+    def lengths(self):
+        p = np.asarray(self.emulator.actual)
+        low, high = self.branches(self.payload)
+        # compression only moves when pushed by one of the branches
+        self.compression = np.clip(self.compression, np.interp(p, self.pressures, low), np.interp(p, self.pressures, high))
+        return self.max_length - (self.compression * self.muscle_gain + self.rng.normal(0, 0.5, 6))
+
+
+def table_errors(csv_path, model, loads, columns=np.arange(20, 190)):
+    """
+    Per load, the (up, down) errors in mm between the compression the model reaches at the
+    table's pressure and the table column, over columns.
+    """
+    from output.d_to_p import DistanceToPressure
+    d2p = DistanceToPressure(251, model.max_length)
+    d2p.load_data(csv_path)
+    errors = []
+    for load in loads:
+        d2p.set_load(load)
+        low, high = model.branches(load * 6 - 25)
+        errors.append([np.interp(d2p.d_to_p[branch, columns], model.pressures, curve) * model.muscle_gain.mean() - columns
+                       for branch, curve in ((0, low), (1, high))])
+    return errors
+
+
+if __name__ == "__main__":
+    # end to end against the headless Festo emulator with MuscleModel muscles
+    import argparse
+    import tempfile
+    from output.festo_itf import Festo
+    from output.festo_emulator import FestoEmulator
+
+    parser = argparse.ArgumentParser(description="Calibrate a d_to_p table against the Festo emulator")
+    parser.add_argument("--out", default=None, help="table to write (default a temporary file)")
+    parser.add_argument("--rate", type=float, default=1500, help="sweep rate in mbar/s")
+    parser.add_argument("--cycles", type=int, default=2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S')
+    if args.out is None:
+        fd, args.out = tempfile.mkstemp(prefix="calibrated_", suffix="_DtoP.csv")
+        os.close(fd)
+
+    emulator = FestoEmulator(port=0, host="127.0.0.1", time_constant=0.05).start()
+    festo = Festo("127.0.0.1", emulator.port)
+    festo.enable_poll_pressure(True)
+    model = MuscleModel(emulator)
+    loads = (13, 18, 24)   # kg per muscle
+
+    start = time.perf_counter()
+    calibrate(festo, model.lengths, loads, model.max_length, 251, args.out, model.set_load,
+              rate=args.rate, cycles=args.cycles)
+    print(f"calibrated {len(loads)} loads in {time.perf_counter() - start:.1f} s, table in {args.out}")
+    emulator.stop()
+
+    for load, branches in zip(loads, table_errors(args.out, model, loads)):
+        for name, err in zip(("up  ", "down"), branches):
+            print(f"load {load} kg {name}: compression error mean {err.mean():5.1f} mm, max {np.abs(err).max():4.1f} mm")
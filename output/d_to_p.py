@@ -5,6 +5,8 @@ import logging
 log = logging.getLogger(__name__)
 
 class DistanceToPressure:
+    LOAD_RESOLUTION = 0.5  # kg, loads are rounded to this so nearby estimates share a cached table
+
     def __init__(self, nbr_columns, max_length):
         self.nbr_columns = nbr_columns
         self.loads = None    # tuple of loads
@@ -17,6 +19,7 @@ class DistanceToPressure:
         self.d_to_p_down = None  # numpy rows of interpolated down values
         self.d_to_p = None # self.d_to_p[0] → up table, self.d_to_p[1] → down table
         self.threshold = 5
+        self.load_cache = {}  # load -> [2, N] table, so repeated loads (payload estimates) cost a lookup
 
     def _get_loads(self, csv_path):
         # returns first data row, loads tuple (or none if invalid data)
@@ -73,6 +76,7 @@ class DistanceToPressure:
                 if self.all_d_to_p_up.shape[0] != self.all_d_to_p_down.shape[0]:
                     raise ValueError("Up and down DtoP rows don't match")
                 self.rows = self.all_d_to_p_up.shape[0]
+                self.load_cache = {}
                 if self.nbr_columns != self.all_d_to_p_up.shape[1]:
                     print(f"number of columns {self.all_d_to_p_up.shape[1]}, expected {self.nbr_columns} " )
                 print(f"number of columns {self.all_d_to_p_up.shape[1]}")
@@ -83,10 +87,15 @@ class DistanceToPressure:
             raise
             
     def set_load(self, load):
-        """Set load and calculate interpolation parameters."""
-        self.d_to_p_up = self._interpolate_load(self.all_d_to_p_up, load)
-        self.d_to_p_down = self._interpolate_load(self.all_d_to_p_down, load)
-        self.d_to_p = np.stack([self.d_to_p_up, self.d_to_p_down], axis=0)
+        """Set load, the interpolated tables are cached so setting a load seen before is a lookup."""
+        load = round(load / self.LOAD_RESOLUTION) * self.LOAD_RESOLUTION
+        d_to_p = self.load_cache.get(load)
+        if d_to_p is None:
+            d_to_p = np.stack([self._interpolate_load(self.all_d_to_p_up, load),
+                               self._interpolate_load(self.all_d_to_p_down, load)], axis=0)
+            self.load_cache[load] = d_to_p
+        self.d_to_p_up, self.d_to_p_down = d_to_p
+        self.d_to_p = d_to_p  # single assignment, the output thread sees the old or the new table
        #  print(f"in set_load, d_to_p stack is: {self.d_to_p}")
 
     def muscle_length_to_pressure(self, muscle_lengths):
@@ -131,6 +140,12 @@ class DistanceToPressure:
                                      row 1 = down / decreasing-pressure branch)
         self.threshold : int  ≥ 1   (hysteresis band, same for all muscles)
 
+        Each muscle remembers the furthest compression reached in its current direction
+        (the anchor) and changes branch once it reverses more than threshold mm from it.
+        Because the band is measured from the anchor rather than from the previous call,
+        switching does not depend on the call rate, so the same movement selects the same
+        branch whether it arrives in a few large steps or many small ones (upsampled output).
+
         Returns
         -------
         pressures : np.ndarray  shape (6,)  – one pressure per muscle
@@ -140,22 +155,25 @@ class DistanceToPressure:
         indices      = np.clip(compressions, 0, self.d_to_p.shape[1] - 1)
 
         # First call – initialise state & use the up row (row 0)
-        if not hasattr(self, "prev_compressions"):
-            self.prev_compressions = compressions.copy()
+        if not hasattr(self, "anchors"):
+            self.anchors = compressions.copy()
             self.active_row = np.zeros_like(compressions, dtype=int)   # all start on row 0
             return self.d_to_p[0, indices]
 
-        # Subsequent calls – compute delta & apply symmetric hysteresis switching
-        delta      = compressions - self.prev_compressions
-        up_mask    = delta >= self.threshold      # switch to row 0
-        down_mask  = delta <= -self.threshold     # switch to row 1
+        # anchors follow the extreme in the current direction of each muscle
+        rising = self.active_row == 0
+        self.anchors = np.where(rising, np.maximum(self.anchors, compressions),
+                                np.minimum(self.anchors, compressions))
+        reversal   = compressions - self.anchors
+        up_mask    = ~rising & (reversal >= self.threshold)    # switch to row 0
+        down_mask  = rising & (reversal <= -self.threshold)    # switch to row 1
         self.active_row[up_mask]   = 0
         self.active_row[down_mask] = 1
+        switched = up_mask | down_mask
+        self.anchors[switched] = compressions[switched]
 
-        # Lookup pressures and update history
+        # Lookup pressures
         pressures = self.d_to_p[self.active_row, indices]
-        self.prev_compressions = compressions
-        # print(f"compressions: {compressions}\ndelta: {delta}\nactive ros: {self.active_row}\npressures: {pressures}")   
         return pressures
 
 # ---------------------------------------------------------
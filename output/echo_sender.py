@@ -0,0 +1,211 @@
+"""
+ echo_sender.py
+
+ Sends the platform state to the Unity digital twin (and any other visualizer) from a
+ background thread, so the control loop only copies three arrays per frame.
+
+ The control loop calls publish() every frame; the sender thread sends the newest state at
+ rate_hz to every address in destinations. "<broadcast>" (the default in sim_config, as the
+ original echo) reaches every visualizer on the LAN. A multicast group address (224.0.0.0/4)
+ is sent to with the configured TTL and the visualizers join the group; other addresses are
+ individual subscribers.
+
+ Formats:
+   "binary" (version 1), little endian, 124 bytes:
+       magic   2s   b"PE"
+       version B    1
+       flags   B    0
+       seq     I    incremented per packet sent, gaps show lost packets
+       time    d    time.time() the frame was published
+       request 6f   x, y, z (mm, z inverted), roll, pitch, yaw (degrees), as the text format
+       lengths 6h   muscle lengths in mm
+       pose    18f  platform attachment points, 6 rows of x, y, z in mm
+   "text": the original comma separated message,
+       request,x,y,z,r,p,y,distances,d0,...,d5,pose,x;y;z,...\n
+
+ usage:
+    echo = EchoSender([("<broadcast>", 10020)], rate_hz=30, fmt="text").start()
+    echo = EchoSender([("239.255.10.20", 10020)], rate_hz=30).start()   # binary to a multicast group
+    echo.publish(request, muscle_lengths, pose)   # every frame
+    echo.stop()
+
+    python -m output.echo_sender listen [--group 239.255.10.20] [--port 10020]
+    python -m output.echo_sender bench       # per frame cost of publish vs formatting and sending
+"""
+
+import math
+import time
+import socket
+import struct
+import logging
+import threading
+import ipaddress
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("binary", "text")
+BROADCAST = "<broadcast>"
+ECHO_MAGIC = b"PE"
+ECHO_VERSION = 1
+ECHO_PACKET = struct.Struct("<2sBBId6f6h18f")
+
+
+def format_text(request, lengths, pose):
+    """ The text echo message for the converted request (z inverted, degrees). """
+    t = [str(round(v)) for v in request[:3]] + [str(round(v, 1)) for v in request[3:]]
+    return ("request," + ",".join(t)
+            + ",distances," + ",".join(str(int(d)) for d in lengths)
+            + ",pose," + ",".join(";".join(format(x, ".1f") for x in row) for row in pose) + "\n")
+
+
+def decode_echo(data):
+    """ Returns dict(seq, time, request, lengths, pose) for a binary or text echo packet. """
+    if data[:2] == ECHO_MAGIC:
+        fields = ECHO_PACKET.unpack_from(data)
+        if fields[1] != ECHO_VERSION:
+            raise ValueError(f"unsupported echo version {fields[1]}")
+        return dict(seq=fields[3], time=fields[4], request=np.array(fields[5:11]),
+                    lengths=np.array(fields[11:17]), pose=np.array(fields[17:35]).reshape(6, 3))
+    items = data.decode("utf-8").strip().split(",")
+    i_dist, i_pose = items.index("distances"), items.index("pose")
+    return dict(seq=None, time=None, request=np.array(items[1:i_dist], dtype=float),
+                lengths=np.array(items[i_dist + 1:i_pose], dtype=float),
+                pose=np.array([row.split(";") for row in items[i_pose + 1:]], dtype=float))
+
+
+class EchoSender(object):
+    def __init__(self, destinations, rate_hz=30, fmt="binary", multicast_ttl=1):
+        if fmt not in FORMATS:
+            raise ValueError(f"echo format must be one of {FORMATS}")
+        self.destinations = [(ip, int(port)) for ip, port in destinations]
+        self.period = 1.0 / rate_hz
+        self.fmt = fmt
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        multicast = [ip != BROADCAST and ipaddress.ip_address(ip).is_multicast for ip, _ in self.destinations]
+        if any(multicast):
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, multicast_ttl)
+        if not all(multicast):
+            # <broadcast> or a subnet broadcast address, the option is harmless for unicast subscribers
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.lock = threading.Lock()
+        # newest frame, written by publish, converted on the sender thread
+        self.request = np.zeros(6)
+        self.lengths = np.zeros(6)
+        self.pose = np.zeros((6, 3))
+        self.publish_time = 0.0
+        self.pending = False
+        self.packet = bytearray(ECHO_PACKET.size)
+        self.seq = 0
+        self.nbr_errors = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name="echo_sender", daemon=True)
+            self.thread.start()
+            log.info("Echo sender: %s at %.0f Hz to %s", self.fmt, 1 / self.period, self.destinations)
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.sock.close()
+
+    def publish(self, request, lengths, pose):
+        """ Called every frame with the kinematics request, muscle lengths and pose, returns immediately. """
+        with self.lock:
+            self.request[:] = request
+            self.lengths[:] = lengths
+            self.pose[:] = pose
+            self.publish_time = time.time()
+            self.pending = True
+
+    def encode(self):
+        """ Packet for the newest frame (caller holds the lock). """
+        request = self.request.copy()
+        request[2] = -request[2]
+        request[3:] *= 180 / math.pi
+        if self.fmt == "text":
+            return bytes(format_text(request, self.lengths, self.pose), "utf-8")
+        lengths = np.clip(np.rint(self.lengths), -32768, 32767).astype(int)
+        ECHO_PACKET.pack_into(self.packet, 0, ECHO_MAGIC, ECHO_VERSION, 0, self.seq & 0xFFFFFFFF,
+                              self.publish_time, *request, *lengths, *self.pose.ravel())
+        return self.packet
+
+    def run(self):
+        next_time = time.perf_counter()
+        while self.running:
+            with self.lock:
+                data = self.encode() if self.pending else None
+                self.pending = False
+            if data is not None:
+                self.seq += 1
+                for address in self.destinations:
+                    try:
+                        self.sock.sendto(data, address)
+                    except OSError as e:
+                        self.nbr_errors += 1
+                        if self.nbr_errors % 100 == 1:
+                            log.warning("Echo sender: send to %s failed: %s", address, e)
+            next_time += self.period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self.period:
+                next_time = time.perf_counter()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Digital twin echo stream tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listen = sub.add_parser("listen", help="print received echo packets")
+    listen.add_argument("--group", default=None, help="multicast group to join")
+    listen.add_argument("--port", type=int, default=10020)
+    sub.add_parser("bench", help="per frame cost in the control loop")
+    args = parser.parse_args()
+
+    if args.command == "listen":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("", args.port))
+        if args.group:
+            mreq = struct.pack("4s4s", socket.inet_aton(args.group), socket.inet_aton("0.0.0.0"))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        prev_seq = None
+        while True:
+            frame = decode_echo(sock.recv(2048))
+            lost = "" if prev_seq is None or frame["seq"] is None else f" lost {frame['seq'] - prev_seq - 1}"
+            prev_seq = frame["seq"]
+            print(f"seq {frame['seq']}{lost} request {np.round(frame['request'], 1)} lengths {frame['lengths']}")
+
+    # bench: the old per frame text formatting and broadcast send against publish()
+    rng = np.random.default_rng(0)
+    request = rng.uniform(-0.3, 0.3, 6) * [100, 100, 100, 1, 1, 1]
+    lengths = rng.uniform(750, 1000, 6)
+    pose = rng.uniform(-600, 600, (6, 3))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    def old_echo():
+        converted = list(request[:3] * [1, 1, -1]) + list(request[3:] * 180 / math.pi)
+        sock.sendto(bytes(format_text(converted, lengths, pose), "utf-8"), ("127.0.0.1", 10020))
+
+    import timeit
+    n = 5000
+    old = timeit.timeit(old_echo, number=n) / n
+    echo = EchoSender([("127.0.0.1", 10020)], rate_hz=30).start()
+    new = timeit.timeit(lambda: echo.publish(request, lengths, pose), number=n) / n
+    echo.stop()
+    with echo.lock:
+        packet = bytes(echo.encode())
+    text = format_text(list(request), lengths, pose)
+    print(f"per frame: format and send {old * 1e6:.1f} us, publish {new * 1e6:.1f} us")
+    print(f"packet size: text {len(text)} bytes, binary {len(packet)} bytes")
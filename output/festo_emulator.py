@@ -0,0 +1,131 @@
+"""
+ festo_emulator.py
+
+ Headless Festo controller emulator for running and benchmarking the output stage
+ without hardware or Qt (the Qt version with pressure bars is fstlib/festoEmulator.py).
+
+ Answers EasyIP packets the way the platform's Festo controller does:
+   - flagword sends (the pressure commands) are acknowledged and recorded,
+   - flagword requests at offset 10 return the actual pressures, modelled as a first
+     order lag of time_constant seconds behind the commanded pressures.
+ supply_gain and offset (mbar) model a regulator that does not reach the commanded pressure,
+ as when the supply pressure sags, so the actual pressure settles at
+ commanded * supply_gain + offset. They can be changed while running to emulate drift.
+
+ When recording, the arrival time and values of every command are kept so the timing
+ of the sender can be analysed (see output_sender.py).
+
+ usage:
+    python -m output.festo_emulator [--port PORT] [--tau SECONDS]
+ then point FESTO_IP in sim_config.py at this PC.
+"""
+
+import math
+import time
+import socket
+import logging
+import argparse
+import threading
+
+from output.fstlib import easyip
+
+log = logging.getLogger(__name__)
+
+PRESSURE_OFFSET = 10   # flagword index of the actual pressures
+
+
+class FestoEmulator(object):
+    def __init__(self, port=easyip.EASYIP_PORT, time_constant=0.15, host='', supply_gain=1.0, offset=0.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.time_constant = time_constant
+        self.supply_gain = supply_gain
+        self.offset = offset
+        self.commanded = [0] * 6
+        self.actual = [0.0] * 6
+        self.last_update = time.perf_counter()
+        self.recording = False
+        self.commands = []     # (perf_counter arrival time, pressures) while recording
+        self.nbr_commands = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        log.info("Festo emulator listening on port %d", self.port)
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        self.sock.close()
+
+    def start_recording(self):
+        self.commands = []
+        self.recording = True
+
+    def stop_recording(self):
+        self.recording = False
+        return self.commands
+
+    def update_actual(self, now):
+        """ Advance the first order lag of the actual pressures to now. """
+        dt = now - self.last_update
+        self.last_update = now
+        k = 1.0 - math.exp(-dt / self.time_constant) if self.time_constant > 0 else 1.0
+        targets = [max(0.0, c * self.supply_gain + self.offset) if c else 0.0 for c in self.commanded]
+        self.actual = [a + (t - a) * k for a, t in zip(self.actual, targets)]
+
+    def serve(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            now = time.perf_counter()
+            try:
+                packet = easyip.Packet(data)
+                response = easyip.Factory.response(packet)
+                if packet.senddata_type == easyip.Operands.FLAG_WORD:
+                    values = packet.decode_payload(easyip.Packet.DIRECTION_SEND)
+                    self.update_actual(now)
+                    self.commanded = list(values[:6])
+                    self.nbr_commands += 1
+                    if self.recording:
+                        self.commands.append((now, self.commanded))
+                elif packet.reqdata_type == easyip.Operands.FLAG_WORD:
+                    self.update_actual(now)
+                    start = packet.reqdata_offset_server - PRESSURE_OFFSET
+                    words = [int(round(p)) for p in self.actual][max(start, 0):][:packet.reqdata_size]
+                    response.reqdata_type = easyip.Operands.FLAG_WORD
+                    response.reqdata_size = len(words)
+                    response.payload = b"".join(w.to_bytes(2, "little") for w in words)
+                self.sock.sendto(response.pack(), addr)
+            except Exception as e:
+                log.warning("Festo emulator: bad packet from %s: %s", addr, e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Festo EasyIP emulator")
+    parser.add_argument("--port", type=int, default=easyip.EASYIP_PORT, help="UDP port (default %(default)s)")
+    parser.add_argument("--tau", type=float, default=0.15, help="pressure time constant in seconds (default %(default)s)")
+    parser.add_argument("--supply-gain", type=float, default=1.0, help="actual / commanded pressure (default %(default)s)")
+    parser.add_argument("--offset", type=float, default=0.0, help="actual pressure offset in mbar (default %(default)s)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S')
+    emulator = FestoEmulator(args.port, args.tau, supply_gain=args.supply_gain, offset=args.offset).start()
+    try:
+        prev = 0
+        while True:
+            time.sleep(1)
+            rate, prev = emulator.nbr_commands - prev, emulator.nbr_commands
+            print(f"{rate:4d} commands/s, commanded {emulator.commanded}, actual {[int(a) for a in emulator.actual]}")
+    except KeyboardInterrupt:
+        emulator.stop()
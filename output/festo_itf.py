@@ -26,12 +26,18 @@ class Festo(object):
     # Set the socket parameters for festo requests    
     FST_port = easyip.EASYIP_PORT
 
-    def __init__(self, FST_ip='192.168.0.10'):
-        # create festo client
+    def __init__(self, FST_ip='192.168.0.10', FST_port=None):
+        # create festo client, FST_port is only needed for an emulator on a non-standard port
+        if FST_port is not None:
+            self.FST_port = FST_port
         self.FSTs = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.FST_addr = (FST_ip, self.FST_port)
         self.FSTs.bind(('0.0.0.0', 0))
         self.FSTs.settimeout(1)  # timout after 1 second if no response
+        # pressure queries use their own socket so their replies can't be confused with send acks
+        self.query_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.query_sock.bind(('0.0.0.0', 0))
+        self.query_sock.settimeout(0.1)
         log.info("Using Festo controller socket %s:%d ",  FST_ip, self.FST_port)
 
         self.wait= False # set true for send confirmation
@@ -89,16 +95,17 @@ class Festo(object):
         self.poll_pressures = state
         log.info("festo poll for actual pressure is set to %s", state)
 
-    def _output_festo_packet(self, packet, wait_ack):
+    def _output_festo_packet(self, packet, wait_ack, sock=None):
+        sock = sock or self.FSTs
         data = packet.pack()
         # print "sending to", self.FST_addr, packet
         resp = None
-        self.FSTs.sendto(data, self.FST_addr)
+        sock.sendto(data, self.FST_addr)
         if wait_ack:
             #  print "in sendpacket,waiting for response..."
             t = time.time()
             try:
-                data, srvaddr = self.FSTs.recvfrom(BUFSIZE)
+                data, srvaddr = sock.recvfrom(BUFSIZE)
                 dur = time.time()-t
                 self.msg_latency = int(dur * 1000)
                 resp = easyip.Packet(data)
@@ -125,10 +132,10 @@ class Festo(object):
         try:
             # print "dummy data"
             packet = easyip.Factory.req_flagword(1, 6, 10)
-            resp = self._output_festo_packet(packet, True)
+            resp = self._output_festo_packet(packet, True, self.query_sock)
             # print resp
             values = resp.decode_payload(easyip.Packet.DIRECTION_REQ)
-            print("in _get_festo_pressure", list(values))
+            log.debug("in _get_festo_pressure %s", list(values))
             return list(values)
         except socket.timeout:
             log.warning("timeout waiting for Pressures from Festo")
@@ -0,0 +1,174 @@
+"""
+ motion_profile.py
+
+ Non-blocking point to point moves of the six muscles (lengths or pressures) for
+ activation, deactivation and calibration.
+
+ A move is planned once as a NumPy array of positions, one row per control frame, and the
+ control loop takes the next row each frame with step(), so nothing sleeps or recurses.
+ Profiles of the normalized path (0 to 1, scaled by the largest muscle distance so all
+ muscles arrive together):
+   - "linear":    constant velocity, steps in velocity at start and end
+   - "trapezoid": acceleration limited ramps to and from max_velocity
+   - "scurve":    the trapezoid velocity smoothed by a moving average of jerk_time seconds,
+                  which limits jerk (the move takes jerk_time longer)
+
+ retarget() changes the end point mid move: a profile from the old end to the new end is
+ added to the rest of the current path, so position and velocity stay continuous.
+
+ usage:
+    mover = MotionProfileExecutor(period=0.05, kind="scurve", max_velocity=50)
+    mover.start(current_lengths, target_lengths)
+    ...
+    lengths = mover.step()      # every frame, None once the move is complete
+"""
+
+import math
+
+import numpy as np
+
+PROFILES = ("linear", "trapezoid", "scurve")
+
+
+def make_profile(distance, period, kind="scurve", max_velocity=50.0, max_accel=100.0,
+                 jerk_time=0.2, duration=None):
+    """
+    Normalized positions (0 to 1] at the end of each frame for a move of distance units
+    (mm or mbar) with the given limits per second. If duration is given the profile keeps
+    its shape but is stretched or squeezed to take that many seconds.
+    """
+    if kind not in PROFILES:
+        raise ValueError(f"motion profile must be one of {PROFILES}")
+    distance = abs(distance)
+    if distance == 0:
+        return np.ones(1)
+    if kind == "linear":
+        t_accel, v_peak = 0.0, max_velocity
+        cruise = distance / max_velocity
+    else:
+        t_accel = max_velocity / max_accel
+        if distance >= max_velocity * t_accel:
+            v_peak = max_velocity
+            cruise = distance / max_velocity - t_accel
+        else:  # never reaches max_velocity, triangular profile
+            t_accel = math.sqrt(distance / max_accel)
+            v_peak = max_accel * t_accel
+            cruise = 0.0
+    total = 2 * t_accel + cruise
+    t = (np.arange(max(1, int(math.ceil(total / period)))) + 0.5) * period
+    velocity = np.minimum.reduce([np.full_like(t, v_peak),
+                                  v_peak * t / t_accel if t_accel else np.full_like(t, v_peak),
+                                  v_peak * (total - t) / t_accel if t_accel else np.full_like(t, v_peak)])
+    velocity = np.maximum(velocity, 0.0)
+    if kind == "scurve":
+        taps = max(1, int(round(jerk_time / period)))
+        velocity = np.convolve(velocity, np.ones(taps) / taps)
+    positions = np.cumsum(velocity)
+    positions /= positions[-1]
+    if duration is not None:
+        frames = max(1, int(round(duration / period)))
+        positions = np.interp(np.arange(1, frames + 1) / frames,
+                              np.arange(1, len(positions) + 1) / len(positions), positions)
+    return positions
+
+
+class MotionProfileExecutor(object):
+    def __init__(self, period, kind="scurve", max_velocity=50.0, max_accel=100.0, jerk_time=0.2):
+        self.period = period
+        self.kind = kind
+        self.max_velocity = max_velocity
+        self.max_accel = max_accel
+        self.jerk_time = jerk_time
+        self.path = None       # (frames, 6) positions of the move, path[index:] still to be output
+        self.index = 0
+        self.position = None   # last position output
+        self._steps = None
+
+    def plan(self, start, end, duration=None, max_velocity=None):
+        """ Rows of positions from start (excluded) to end (included). """
+        start = np.asarray(start, dtype=float)
+        end = np.asarray(end, dtype=float)
+        distance = float(np.max(np.abs(end - start)))
+        s = make_profile(distance, self.period, self.kind, max_velocity or self.max_velocity,
+                         self.max_accel, self.jerk_time, duration)
+        return start + (end - start) * s[:, None]
+
+    def start(self, start, end, duration=None, max_velocity=None):
+        self.path = self.plan(start, end, duration, max_velocity)
+        self.index = 0
+        self.position = np.asarray(start, dtype=float)
+        self._steps = self._play()
+
+    def retarget(self, end, max_velocity=None):
+        """ Move to a new end point, continuing smoothly from the move in progress. """
+        if not self.active:
+            self.start(self.position if self.position is not None else end, end, max_velocity=max_velocity)
+            return
+        remaining = self.path[self.index:]
+        correction = self.plan(np.zeros_like(remaining[-1]), np.asarray(end, dtype=float) - remaining[-1],
+                               max_velocity=max_velocity)
+        frames = max(len(remaining), len(correction))
+        remaining = np.vstack([remaining, np.repeat(remaining[-1:], frames - len(remaining), axis=0)])
+        correction = np.vstack([correction, np.repeat(correction[-1:], frames - len(correction), axis=0)])
+        self.path = remaining + correction
+        self.index = 0
+
+    def _play(self):
+        while self.index < len(self.path):
+            self.position = self.path[self.index]
+            self.index += 1
+            yield self.position
+
+    def step(self):
+        """ Next position of the move, None once complete. """
+        if self._steps is None:
+            return None
+        position = next(self._steps, None)
+        if position is None:
+            self._steps = None
+        return position
+
+    def stop(self):
+        """ Abandon the move, the last output position is kept. """
+        self._steps = None
+
+    @property
+    def active(self):
+        return self._steps is not None and self.index < len(self.path)
+
+    @property
+    def end(self):
+        return None if self.path is None else self.path[-1]
+
+    @property
+    def progress(self):
+        """ Fraction of the current path completed, 1.0 when idle. """
+        if not self.active:
+            return 1.0
+        return self.index / len(self.path)
+
+
+if __name__ == "__main__":
+    # compare the profiles for a 150 mm move at 20 Hz and show a retarget half way
+    period = 0.05
+    start, end = np.full(6, 1000.0), np.full(6, 850.0)
+    for kind in PROFILES:
+        mover = MotionProfileExecutor(period, kind, max_velocity=50, max_accel=100, jerk_time=0.2)
+        mover.start(start, end)
+        path = np.vstack([start, start, mover.path])[:, 0]   # from rest
+        v = np.diff(path) / period
+        a = np.diff(v) / period
+        j = np.diff(a) / period
+        print(f"{kind:>9}: {len(mover.path) * period:.2f} s, peak velocity {np.abs(v).max():.1f} mm/s, "
+              f"accel {np.abs(a).max():.0f} mm/s2, jerk {np.abs(j).max():.0f} mm/s3")
+
+    mover = MotionProfileExecutor(period, "scurve", max_velocity=50, max_accel=100, jerk_time=0.2)
+    mover.start(start, end)
+    out = [start[0]]
+    while mover.active:
+        if mover.index == len(mover.path) // 2 and mover.end[0] == 850:
+            mover.retarget(np.full(6, 950.0))   # reverse mid move
+        out.append(mover.step()[0])
+    v = np.diff(out) / period
+    print(f"retarget 850 -> 950 mm mid move: {len(out) - 1} frames, ends at {out[-1]:.1f} mm, "
+          f"largest velocity change per frame {np.abs(np.diff(v)).max():.1f} mm/s")
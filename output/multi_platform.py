@@ -0,0 +1,410 @@
+"""
+ multi_platform.py
+
+ Drives several platforms (rigs) side by side from one sim, each with its own config
+ module, load level and Festo address.
+
+ Every frame the transform is converted for all rigs at once:
+   conditioning  each rig's TransformConditioner matrix and clip limits stacked (N, 6, 6)
+   kinematics    rotation matrices for the N requests built together, poses and actuator
+                 lengths for all N x 6 attachment points in one matmul and norm
+   d_to_p        the hysteresis tables of all rigs stacked (N, 2, columns), branch selection
+                 and lookup for the N x 6 compressions at once. The branch state stays in each
+                 rig's DistanceToPressure, so its slow moves and the batch share it. Only used when
+                 pressures are sent from the control loop (OUTPUT_RATE_HZ = 0); with output
+                 threads each rig's sender converts and sends on its own thread.
+ then the pressures are sent to the rigs' Festos in parallel from a thread pool, so one
+ slow Festo (waiting for an ack) does not delay the others.
+
+ Rig 0 is the platform selected in sim_config (DEFAULT_PLATFORM_INDEX, FESTO_IP); the UI,
+ echo, flight recorder and payload estimator follow it. Each rig has its own StageTimers
+ (festo_send, end_to_end) so the cost of every added rig can be read from the timing table.
+
+ usage:
+    rigs = PlatformArray([create_platform("rig0", cfg0, ip0, ...), create_platform("rig1", cfg1, ip1, ...)])
+    requests = rigs.condition(transform)          # (N, 6)
+    lengths = rigs.kinematics(requests)           # (N, 6) muscle lengths in mm
+    pressures = rigs.pressures(lengths)           # (N, 6), None when output threads convert
+    rigs.send(lengths, pressures, origin_time)
+
+    python -m output.multi_platform     # batch vs per rig cost, rigs per frame against Festo emulators
+"""
+
+import time
+import logging
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kinematics.kinematics_V2SP import Kinematics
+from kinematics.conditioning import TransformConditioner
+from output.muscle_output import MuscleOutput
+from common.stage_timer import StageTimers
+
+log = logging.getLogger(__name__)
+
+PLATFORM_STAGES = ("festo_send", "end_to_end")   # timed per rig
+
+
+class PlatformInstance(object):
+    """ One rig: its config, kinematics, d_to_p, muscle output and state. """
+    def __init__(self, name, cfg, k, d_to_p, muscle_output, festo_ip, is_slider=False, window_frames=200):
+        self.name = name
+        self.cfg = cfg
+        self.k = k
+        self.DtoP = d_to_p
+        self.muscle_output = muscle_output
+        self.festo_ip = festo_ip
+        self.is_slider = is_slider
+        self.payload_weights = [int((w + cfg.UNLOADED_PLATFORM_WEIGHT) / 6) for w in cfg.PAYLOAD_WEIGHTS]
+        self.load_level = None
+        self.conditioner = TransformConditioner()
+        self.predictor = None     # optional AlphaBetaPredictor
+        self.transition = None    # MotionProfileExecutor for activation moves (rigs after the first)
+        self.muscle_lengths = list(cfg.DEACTIVATED_MUSCLE_LENGTHS)
+        self.timers = StageTimers(PLATFORM_STAGES, window_frames)
+
+    def set_load_level(self, load_level):
+        """ Select the light, medium or heavy load (0-2) from the config's payload weights. """
+        load = self.payload_weights[load_level]
+        self.DtoP.set_load(load)
+        self.load_level = load_level
+        log.info("%s: load level %d, %dkg per muscle", self.name, load_level, load)
+
+
+def create_platform(name, cfg, festo_ip, sleep_func, frame_period, load_level=1,
+                    output_rate_hz=0, output_interpolation="linear", window_frames=200, motion_factory=None):
+    """
+    Build a rig from a PlatformConfig: kinematics, d_to_p with the config's table or model,
+    and a MuscleOutput to festo_ip with the config's pressure control and the output thread.
+    motion_factory makes the executor for the MuscleOutput's slow moves (default settings if None).
+    Raises if the d_to_p data can't be loaded.
+    """
+    k = Kinematics()
+    cfg.calculate_coords()
+    k.set_geometry(cfg.BASE_POS, cfg.PLATFORM_POS)
+    if cfg.PLATFORM_TYPE == "SLIDER":
+        k.set_slider_params(cfg.joint_min_offset, cfg.joint_max_offset, cfg.strut_length,
+                            cfg.slider_angles, cfg.slider_endpoints)
+        is_slider = True
+    else:
+        k.set_platform_params(cfg.MIN_ACTUATOR_LENGTH, cfg.MAX_ACTUATOR_LENGTH, cfg.FIXED_HARDWARE_LENGTH)
+        is_slider = False
+
+    if cfg.MUSCLE_PRESSURE_MAPPING_FILE:
+        d_to_p_data = cfg.MUSCLE_PRESSURE_MAPPING_FILE
+        d_to_p = importlib.import_module("output.d_to_p")
+        log.info(f"{name}: d_to_p using lookup table: {d_to_p_data}")
+    else:
+        d_to_p_data = cfg.MUSCLE_PRESSURE_ML_MODEL
+        d_to_p = importlib.import_module("output.d_to_p_ML")
+        log.info(f"{name}: d_to_p using Machine Learning model: {d_to_p_data}")
+    DtoP = d_to_p.DistanceToPressure(cfg.MUSCLE_LENGTH_RANGE + 1, cfg.MUSCLE_MAX_LENGTH)
+    muscle_output = MuscleOutput(DtoP.muscle_length_to_pressure, sleep_func, festo_ip,
+                                 cfg.MUSCLE_MAX_LENGTH, cfg.MUSCLE_LENGTH_RANGE, frame_period,
+                                 motion_factory() if motion_factory else None)
+    rig = PlatformInstance(name, cfg, k, DtoP, muscle_output, festo_ip, is_slider, window_frames)
+
+    if getattr(cfg, "PRESSURE_CONTROL", False):
+        muscle_output.enable_poll_pressures(True)
+        muscle_output.enable_pressure_control(True, cfg.PRESSURE_KP, cfg.PRESSURE_KI,
+                                              cfg.PRESSURE_MAX_CORRECTION, cfg.PRESSURE_MAX_RATE)
+    if output_rate_hz and cfg.MUSCLE_PRESSURE_MAPPING_FILE:
+        muscle_output.start_output_thread(output_rate_hz, output_interpolation)
+    if DtoP.load_data(d_to_p_data):
+        log.info(f"{name}: muscle pressure mapping table loaded.")
+        rig.set_load_level(load_level)
+    return rig
+
+
+def rotation_matrices(rpy):
+    """ (N, 3, 3) rotation matrices for (N, 3) roll, pitch, yaw, as Kinematics.calc_rotation. """
+    cr, sr = np.cos(rpy[:, 0]), np.sin(rpy[:, 0])
+    cp, sp = np.cos(rpy[:, 1]), np.sin(rpy[:, 1])
+    cy, sy = np.cos(rpy[:, 2]), np.sin(rpy[:, 2])
+    r = np.empty((len(rpy), 3, 3))
+    r[:, 0, 0] = cy * cp
+    r[:, 0, 1] = cy * sp * sr - sy * cr
+    r[:, 0, 2] = cy * sp * cr + sy * sr
+    r[:, 1, 0] = sy * cp
+    r[:, 1, 1] = sy * sp * sr + cy * cr
+    r[:, 1, 2] = sy * sp * cr - cy * sr
+    r[:, 2, 0] = -sp
+    r[:, 2, 1] = cp * sr
+    r[:, 2, 2] = cp * cr
+    return r
+
+
+class BatchKinematics(object):
+    """ Inverse kinematics of N Stewart platforms at once, the geometry comes from their Kinematics. """
+    def __init__(self, kinematics):
+        self.kinematics = kinematics
+        self.base = np.stack([k.base_coords for k in kinematics]).astype(float)              # (N, 6, 3)
+        self.platform_t = np.stack([k.platform_coords.T for k in kinematics]).astype(float)  # (N, 3, 6)
+        self.fixed = np.array([[k.FIXED_HARDWARE_LENGTH] for k in kinematics], dtype=float)  # (N, 1)
+
+    def muscle_lengths(self, requests):
+        """ (N, 6) int muscle lengths for (N, 6) requests, each rig's pose is left in its Kinematics. """
+        a = np.asarray(requests, dtype=float) * np.array([[k.intensity] for k in self.kinematics])
+        poses = np.matmul(rotation_matrices(a[:, 3:]), self.platform_t).transpose(0, 2, 1) + a[:, None, :3]
+        for k, pose in zip(self.kinematics, poses):
+            k.pose = pose
+        actuator_lengths = np.sqrt(((poses - self.base) ** 2).sum(axis=2))
+        return np.rint(actuator_lengths - self.fixed).astype(int)
+
+
+class BatchDistanceToPressure(object):
+    """
+    Hysteresis table lookup of N rigs at once (as DistanceToPressure.muscle_compression_to_pressure).
+    The tables are restacked when a rig's load changes; anchors and active rows are read from
+    and written back to the rigs' converters.
+    """
+    def __init__(self, converters):
+        self.converters = converters
+        self.max_lengths = np.stack([c.max_muscle_lengths for c in converters])
+        self.thresholds = np.array([[c.threshold] for c in converters])
+        self.rows = np.arange(len(converters))[:, None]
+        self.sources = [None] * len(converters)
+        self.tables = None
+        self.last_columns = None
+
+    def _stack_tables(self):
+        tables = [c.d_to_p for c in self.converters]
+        if all(t is s for t, s in zip(tables, self.sources)):
+            return
+        width = max(t.shape[1] for t in tables)
+        self.tables = np.stack([np.pad(t, ((0, 0), (0, width - t.shape[1])), mode="edge") for t in tables])
+        self.last_columns = np.array([[t.shape[1] - 1] for t in tables])
+        self.sources = tables
+
+    def muscle_length_to_pressure(self, muscle_lengths):
+        compressions = self.max_lengths - np.asarray(muscle_lengths, dtype=int)
+        return self.muscle_compression_to_pressure(compressions)
+
+    def muscle_compression_to_pressure(self, compressions):
+        self._stack_tables()
+        compressions = np.asarray(compressions, dtype=int)
+        indices = np.clip(compressions, 0, self.last_columns)
+        # a converter that has not been called yet starts on the up row, anchored where it is
+        anchors = np.stack([c.anchors if hasattr(c, "anchors") else compressions[i]
+                            for i, c in enumerate(self.converters)])
+        active_row = np.stack([c.active_row if hasattr(c, "anchors") else np.zeros(6, dtype=int)
+                               for c in self.converters])
+
+        rising = active_row == 0
+        anchors = np.where(rising, np.maximum(anchors, compressions), np.minimum(anchors, compressions))
+        reversal = compressions - anchors
+        up_mask = ~rising & (reversal >= self.thresholds)
+        down_mask = rising & (reversal <= -self.thresholds)
+        active_row[up_mask] = 0
+        active_row[down_mask] = 1
+        switched = up_mask | down_mask
+        anchors[switched] = compressions[switched]
+
+        for c, a, r in zip(self.converters, anchors, active_row):
+            c.anchors, c.active_row = a, r
+        return self.tables[self.rows, active_row, indices]
+
+
+class PlatformArray(object):
+    def __init__(self, platforms, motion_factory=None):
+        """ platforms: PlatformInstances, the first is the one the UI shows. motion_factory makes their transition executors. """
+        self.platforms = list(platforms)
+        n = len(self.platforms)
+        self.matrices = np.zeros((n, 6, 6))
+        self.limits = np.full((n, 6), np.inf)
+        self.batch_kinematics = None
+        if not any(p.is_slider for p in self.platforms):
+            self.batch_kinematics = BatchKinematics([p.k for p in self.platforms])
+        self.batch_d_to_p = None
+        if all(hasattr(p.DtoP, "all_d_to_p_up") for p in self.platforms):   # lookup tables, not the ML model
+            self.batch_d_to_p = BatchDistanceToPressure([p.DtoP for p in self.platforms])
+        for p in self.platforms[1:]:
+            if motion_factory:
+                p.transition = motion_factory()
+        self.pool = ThreadPoolExecutor(max_workers=n, thread_name_prefix="festo_send") if n > 1 else None
+
+    def __len__(self):
+        return len(self.platforms)
+
+    def __getitem__(self, index):
+        return self.platforms[index]
+
+    def update_conditioning(self, gains, master_gain, intensity_percent, dynamics_gains, dynamics_master_gain,
+                            primary_conditioner=None):
+        """
+        Rebuild each rig's conditioner with its own inversion, swap and range, then restack them.
+        The first rig uses primary_conditioner (the core's) if given, already built.
+        """
+        for i, p in enumerate(self.platforms):
+            if i == 0 and primary_conditioner is not None:
+                p.conditioner = primary_conditioner
+            else:
+                p.conditioner.build(gains, master_gain, intensity_percent, p.cfg.INVERT_AXIS, dynamics_gains,
+                                    dynamics_master_gain, p.cfg.LIMITS_1DOF_TRANFORM, p.cfg.SWAP_ROLL_PITCH)
+            self.matrices[i] = p.conditioner.matrix
+            self.limits[i] = p.conditioner.limit
+
+    def condition(self, transform):
+        """ (N, 6) requests for the normalized transform. """
+        clipped = np.clip(np.asarray(transform, dtype=float)[None, :], -self.limits, self.limits)
+        return np.matmul(self.matrices, clipped[:, :, None])[:, :, 0]
+
+    def kinematics(self, requests):
+        """ (N, 6) muscle lengths for (N, 6) requests. """
+        if self.batch_kinematics:
+            return self.batch_kinematics.muscle_lengths(requests)
+        return np.array([p.k.muscle_lengths(r) for p, r in zip(self.platforms, requests)])
+
+    def pressures(self, lengths):
+        """ (N, 6) table pressures for the lengths, or None if output threads (or the ML model) convert them. """
+        if self.batch_d_to_p is None or any(p.muscle_output.sender for p in self.platforms):
+            return None
+        return self.batch_d_to_p.muscle_length_to_pressure(lengths)
+
+    def start_frame(self):
+        for p in self.platforms:
+            p.timers.start_frame()
+
+    def _send(self, index, lengths, pressures, origin_time):
+        p = self.platforms[index]
+        start = time.perf_counter()
+        p.muscle_output.set_muscle_lengths(lengths, origin_time, pressures)
+        p.timers.add("festo_send", time.perf_counter() - start)
+        if p.muscle_output.e2e_latency is not None:
+            p.timers.add("end_to_end", p.muscle_output.e2e_latency)
+
+    def send(self, lengths, pressures=None, origin_time=None, indices=None):
+        """ Send each rig's lengths (and pressures, if converted in the batch) in parallel, returns when all are sent. """
+        indices = range(len(self.platforms)) if indices is None else indices
+        jobs = []
+        for i in indices:
+            p = self.platforms[i]
+            if p.transition is not None and p.transition.active:
+                continue   # still moving to its start position, see step_transitions
+            p.muscle_lengths = [int(x) for x in lengths[i]]
+            row = None if pressures is None else pressures[i]
+            if self.pool:
+                jobs.append(self.pool.submit(self._send, i, p.muscle_lengths, row, origin_time))
+            else:
+                self._send(i, p.muscle_lengths, row, origin_time)
+        for job in jobs:
+            job.result()
+
+    def set_lengths(self, lengths):
+        """ Record lengths without sending (virtual only mode). """
+        for p, row in zip(self.platforms, lengths):
+            if p.transition is None or not p.transition.active:
+                p.muscle_lengths = [int(x) for x in row]
+
+    def start_transitions(self, mode, transform=None):
+        """ Start the activation (to the pose for transform) or deactivation move of every rig after the first. """
+        for p in self.platforms[1:]:
+            if p.predictor:
+                p.predictor.reset()
+            if mode == "activating":
+                end_lengths = p.k.muscle_lengths(p.conditioner.apply(transform))
+            else:
+                end_lengths = p.cfg.DEACTIVATED_MUSCLE_LENGTHS
+            if p.transition.active:
+                p.transition.retarget(end_lengths)
+            else:
+                start_lengths = p.cfg.DEACTIVATED_MUSCLE_LENGTHS if mode == "activating" else p.muscle_lengths
+                p.transition.start(start_lengths, end_lengths)
+
+    def step_transitions(self, send=True):
+        """ Step the rigs that are moving, called every frame. Returns True while any is still moving. """
+        moving = []
+        for i, p in enumerate(self.platforms[1:], 1):
+            if p.transition is None or not p.transition.active:
+                continue
+            lengths = p.transition.step()
+            if lengths is not None:
+                p.muscle_lengths = lengths.tolist()
+                moving.append(i)
+        if send and moving:
+            jobs = [self.pool.submit(self._send, i, self.platforms[i].muscle_lengths, None, None) for i in moving]
+            for job in jobs:
+                job.result()
+        return bool(moving)
+
+    def summary(self):
+        """ {"<rig> <stage>": (count, min, mean, p99, max)} in milliseconds, for every rig. """
+        result = {}
+        for p in self.platforms:
+            for stage, stats in p.timers.summary().items():
+                result[f"{p.name} {stage}"] = stats
+        return result
+
+    def close(self):
+        for p in self.platforms:
+            p.muscle_output.stop_output_thread()
+        if self.pool:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+
+if __name__ == "__main__":
+    # cost per frame of 1 to 8 rigs: per rig conversion as the single platform core does it against
+    # the stacked batch, and the full frame with parallel sends to local Festo emulators
+    import argparse
+    import timeit
+    from output.festo_itf import Festo
+    from output.festo_emulator import FestoEmulator
+    from kinematics.cfg_SuspendedPlatform import PlatformConfig
+
+    parser = argparse.ArgumentParser(description="Multi platform batch cost")
+    parser.add_argument("--rigs", type=int, default=8, help="largest number of rigs")
+    parser.add_argument("--frame", type=float, default=0.05, help="frame period in seconds")
+    parser.add_argument("--wait-ack", action="store_true", help="wait for each Festo to acknowledge")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    rng = np.random.default_rng(2)
+    transforms = rng.uniform(-1, 1, (200, 6))
+    emulators, rigs = [], []
+    for i in range(args.rigs):
+        rig = create_platform(f"rig{i}", PlatformConfig(), "127.0.0.1", time.sleep, args.frame, load_level=i % 3)
+        emulator = FestoEmulator(port=0, host="127.0.0.1", time_constant=0.05).start()
+        rig.muscle_output.festo = Festo("127.0.0.1", emulator.port)
+        rig.muscle_output.festo.wait = args.wait_ack
+        emulators.append(emulator)
+        rigs.append(rig)
+
+    print(f"{'rigs':>4} {'per rig us':>11} {'batch us':>9} {'frame with sends us':>20}")
+    frame_costs = []
+    for n in range(1, args.rigs + 1):
+        array = PlatformArray(rigs[:n])
+        array.update_conditioning(np.ones(6), 1.0, 100, np.ones(6), 1.0)
+        count = [0]
+
+        def per_rig():
+            t = transforms[count[0] % len(transforms)]
+            count[0] += 1
+            for p in array.platforms:
+                p.DtoP.muscle_length_to_pressure(p.k.muscle_lengths(p.conditioner.apply(t)))
+
+        def batch(send=False):
+            t = transforms[count[0] % len(transforms)]
+            count[0] += 1
+            lengths = array.kinematics(array.condition(t))
+            pressures = array.pressures(lengths)
+            if send:
+                array.send(lengths, pressures)
+
+        loops = 2000
+        single = timeit.timeit(per_rig, number=loops) / loops
+        batched = timeit.timeit(batch, number=loops) / loops
+        frame = timeit.timeit(lambda: batch(True), number=loops // 4) / (loops // 4)
+        frame_costs.append(frame)
+        print(f"{n:>4} {single * 1e6:>11.1f} {batched * 1e6:>9.1f} {frame * 1e6:>20.1f}")
+        array.pool and array.pool.shutdown()
+
+    # frame cost is close to linear in the number of rigs
+    per_rig_cost, fixed_cost = np.polyfit(np.arange(1, args.rigs + 1), frame_costs, 1)
+    budget = 0.5 * args.frame   # leave half the frame for the sim, washout and the rest of the loop
+    print(f"frame cost {fixed_cost * 1e6:.0f} us + {per_rig_cost * 1e6:.0f} us per rig, "
+          f"about {int(max(0, budget - fixed_cost) / max(per_rig_cost, 1e-9))} rigs in half a {args.frame * 1000:.0f} ms frame")
+    for emulator in emulators:
+        emulator.stop()
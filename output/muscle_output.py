@@ -5,14 +5,22 @@ import logging
 import traceback
 
 import output.festo_itf as festo_itf
+from output.output_sender import OutputSender
+from output.motion_profile import MotionProfileExecutor
+from output.pressure_control import PressureController
+import output.calibration as calibration
 
 log = logging.getLogger(__name__)
 
 PLOT_PRESSURES = False
 
 class MuscleOutput(object):
-    def __init__(self, d_to_p_func, sleep_func, FST_ip='192.168.0.10', max_muscle_length= 1000, muscle_length_range=250):
-        """ Initialize the muscle output control module. """
+    def __init__(self, d_to_p_func, sleep_func, FST_ip='192.168.0.10', max_muscle_length= 1000, muscle_length_range=250,
+                 frame_period=0.05, mover=None):
+        """
+        Initialize the muscle output control module, frame_period is the interval between step_move calls.
+        mover is the MotionProfileExecutor for slow moves and sweeps, the core passes one with its motion settings.
+        """
         self.muscle_length_to_pressure = d_to_p_func
         self.sleep_func = sleep_func
         self.festo = festo_itf.Festo(FST_ip)
@@ -27,6 +35,16 @@ class MuscleOutput(object):
         self.loaded_payload_weight = 100  # Default payload in kg
         self.prev_time = time.perf_counter()
         self.sent_pressures = [0] * 6
+        self.stage_timers = None  # optional common.stage_timer.StageTimers
+        self.e2e_latency = None   # seconds from sim sampling to pressure command of the last frame
+        self.sender = None        # optional OutputSender, sends interpolated pressures at a higher rate than the frames
+        self.mover = mover or MotionProfileExecutor(frame_period)  # slow moves, stepped by step_move from the frame loop
+        self.move_kind = None     # "lengths" or "pressures"
+        self.suspended_sender = None  # output thread stopped while pressures are sent directly
+        self.sweep = None         # calibration.PressureSweep in progress, stepped by step_move
+        self.sweep_load = None
+        self.calibration_sweeps = {}  # load (kg per muscle) -> logged sweep, fitted by write_calibration
+        self.pressure_controller = None  # optional PressureController, corrects commands with measured pressures
         
         if PLOT_PRESSURES:
             from common.plot_itf import PlotItf
@@ -41,6 +59,50 @@ class MuscleOutput(object):
         """ Set the progress callback function. """
         self.progress_callback = cb
 
+    def set_stage_timers(self, stage_timers):
+        """ Time d_to_p conversion and Festo send as stages of the motion pipeline. """
+        self.stage_timers = stage_timers
+
+    def start_output_thread(self, rate_hz, interpolation="linear"):
+        """ Send pressures from a thread at rate_hz, interpolating between the lengths given each frame. """
+        if self.sender is None:
+            self.sender = OutputSender(self.command_pressures, self.festo, rate_hz, interpolation)
+            self.sender.start()
+
+    def stop_output_thread(self):
+        if self.sender:
+            self.sender.stop()
+            self.sender = None
+
+    def suspend_output_thread(self):
+        """ Stop the output thread while pressures are sent directly, resume_output_thread restarts it. """
+        if self.sender:
+            self.suspended_sender = self.sender
+            self.stop_output_thread()
+
+    def resume_output_thread(self):
+        sender, self.suspended_sender = self.suspended_sender, None
+        if sender:
+            self.start_output_thread(round(1.0 / sender.period), sender.interpolation)
+
+    def enable_pressure_control(self, state, kp=0.3, ki=2.0, max_correction=600, max_rate=20000):
+        """ Correct the commanded pressures with the measured pressures (which must be polled). """
+        if state:
+            self.pressure_controller = PressureController(kp, ki, max_correction, max_rate)
+        else:
+            self.pressure_controller = None
+        log.info("MuscleOutput closed loop pressure control is %s", "on" if state else "off")
+
+    def command_pressures(self, muscle_lengths):
+        """ Pressures to send for muscle lengths: the d_to_p table, corrected when pressure control is on. """
+        return self.correct_pressures(self.muscle_length_to_pressure(muscle_lengths))
+
+    def correct_pressures(self, pressures):
+        """ Table pressures corrected with the measured pressures when pressure control is on. """
+        if self.pressure_controller is None:
+            return pressures
+        return self.pressure_controller.update(pressures, self.festo.get_pressure()).astype(int).tolist()
+
     def send_pressures(self, pressures):
         """ Send pressure commands to the Festo interface. """
         try:
@@ -170,12 +232,41 @@ class MuscleOutput(object):
         # print("in do_pressure_plot sent", msg)
         """
     
-    def set_muscle_lengths(self, muscle_lengths):
-        """ parm is list of muscle lengths in mm """ 
+    def set_muscle_lengths(self, muscle_lengths, origin_time=None, pressures=None):
+        """
+        parm is list of muscle lengths in mm
+        origin_time is the time.time() the sim sampled this frame, if known, used to measure end-to-end latency
+        pressures are the table pressures for the lengths if already converted (batched with other rigs),
+        they are not used when the output thread converts
+        """
         try:
-            out_pressures = self.muscle_length_to_pressure(muscle_lengths)
+            if self.sender:
+                # conversion and sending happen on the sender thread, latency is that of the previous frame
+                self.sender.set_target(muscle_lengths, origin_time)
+                if self.stage_timers:
+                    self.stage_timers.mark("festo_send")
+                self.sent_pressures = self.sender.sent_pressures
+                self.e2e_latency = self.sender.e2e_latency if origin_time is not None else None
+                if self.e2e_latency is not None and self.stage_timers:
+                    self.stage_timers.add("end_to_end", self.e2e_latency)
+                self.muscle_lengths = muscle_lengths
+                return
+            if pressures is None:
+                out_pressures = self.command_pressures(muscle_lengths)
+            else:
+                out_pressures = self.correct_pressures(pressures)
+            if self.stage_timers:
+                self.stage_timers.mark("d_to_p")
             # print("in set_muscle_lengths,", (','.join(str(d) for d in distances)), "pressures,", (','.join(str(p) for p in out_pressures)))
             self.send_pressures(out_pressures)
+            if self.stage_timers:
+                self.stage_timers.mark("festo_send")
+            if origin_time is None:
+                self.e2e_latency = None
+            else:
+                self.e2e_latency = time.time() - origin_time
+                if self.stage_timers:
+                    self.stage_timers.add("end_to_end", self.e2e_latency)
             self.muscle_lengths = muscle_lengths
         except Exception as e:
             print("error in set_muscle_lengths", str(e), traceback.format_exc(),muscle_lengths)
@@ -195,81 +286,79 @@ class MuscleOutput(object):
         clamped_percents = [100 - max(0, min(percent, 100)) for percent in percents]
         self.set_muscle_percents(clamped_percents)
 
-    def calibrate(self):
-        # moves platform to mid pressure to determine best d_to_p files
-        self.slow_pressure_move(0,3000, 1000)
+    def start_calibration(self, length_source, load, **sweep_args):
+        """
+        Start the calibration pressure sweep for the load (kg per muscle) now on the platform,
+        stepped by step_move (see output/calibration.py). length_source returns the six measured
+        muscle lengths. Sweep each load in turn, then write the table with write_calibration.
+        """
+        self.mover.stop()
+        self.suspend_output_thread()   # the sweep sends the pressures
+        self.enable_poll_pressures(True)
+        self.sweep = calibration.PressureSweep(self.festo, length_source, self.MAX_MUSCLE_LENGTH,
+                                               self.mover.period, mover=self.mover, **sweep_args)
+        self.sweep_load = load
+        log.info("MuscleOutput: calibration sweep of load %s kg started, %.0f s", load,
+                 self.sweep.nbr_steps * self.mover.period)
 
-    def slow_move(self, start_lengths, end_lengths, rate_cm_per_s, new_target):
-        rate_mm = rate_cm_per_s * 10
-        interval = 0.05  
-        muscle_length = max([abs(j - i) for i, j in zip(start_lengths, end_lengths)])
-        steps = int(muscle_length / rate_mm / interval)
+    def write_calibration(self, csv_path="output/calibrated_DtoP.csv"):
+        """ Fit the completed sweeps and write a d_to_p table, returns the up and down rows. """
+        return calibration.write_table(self.calibration_sweeps, int(self.MUSCLE_LENGTH_RANGE) + 1, csv_path)
 
-        if steps < 1:
-            self.set_muscle_lengths(end_lengths)
-        else:
-            current = start_lengths
-            delta = [float(e - s) / steps for s, e in zip(start_lengths, end_lengths)]
-
-            for step in range(steps):
-                new_end = new_target()
-                if new_end is not None:
-                    print(f"New target {new_end} detected, slowing down before switching.")
-                    for _ in range(5):  # Reduce speed before switching
-                        current = [x + (y * 0.2) for x, y in zip(current, delta)]
-                        self.set_muscle_lengths(current)
-                        self.sleep_func(interval)
-
-                    self.slow_move(current, new_end, rate_cm_per_s, new_target)
-                    return  
-
-                current = [x + y for x, y in zip(current, delta)]
-                current = np.clip(current, 0, 6000)
-                self.set_muscle_lengths(current)
-                self.sleep_func(interval)
+    def step_sweep(self):
+        running = self.sweep.step()
+        self.sent_pressures = self.sweep.pressures
+        if running:
+            if self.progress_callback:
+                self.progress_callback(self.sweep.progress)
+            return True
+        self.calibration_sweeps[self.sweep_load] = self.sweep.result()
+        log.info("MuscleOutput: calibration sweep of load %s kg complete", self.sweep_load)
+        self.sweep = None
+        self.resume_output_thread()
+        return True   # the sweep sent zero pressures in this frame
 
-    """
-    def slow_move(self, start, end, rate_cm_per_s):
-        raise Exception("slow_move method now implimented in platform_controller")
-        # moves from the given start to end lengths at the given duration
-        #  caution, this moves even if disabled
-        rate_mm = rate_cm_per_s *10
-        interval = .05  # ms between steps
-        # distance = max(end - start, key=abs)
-        distance = max([abs(j-i) for i,j in zip(start, end)])
-        print("max distance=", distance)
-        dur = abs(distance) / rate_mm
-        steps = int(dur / interval)
-        if steps < 1:
-            self.move_distance(end)
+    def slow_move(self, start_lengths, end_lengths, rate_cm_per_s):
+        """
+        Start moving the muscles from start to end lengths at up to rate_cm_per_s.
+        The move is advanced by step_move, which the core calls every frame; calling this
+        during a length move redirects it to the new end lengths without stopping.
+        """
+        if self.move_kind == "lengths" and self.mover.active:
+            self.mover.retarget(end_lengths, max_velocity=rate_cm_per_s * 10)
         else:
-            current = start
-            print("moving from", start, "to", end, "steps", steps)
-            # print "percent", (end[0]/start[0]) * 100
-            delta = [float(e - s)/steps for s, e in zip(start, end)]
-            for step in range(steps):
-                current = [x + y for x, y in zip(current, delta)]
-                current = np.clip(current, 0, 6000)
-                self.move_distance(current)
-                self.sleep_func(interval)
-    """  
+            self.mover.start(start_lengths, end_lengths, max_velocity=rate_cm_per_s * 10)
+        self.move_kind = "lengths"
+
     def slow_pressure_move(self, start_pressure, end_pressure, duration_ms):
+        """ Start ramping all muscles between two pressures over duration_ms, advanced by step_move. """
         #  caution, this moves even if disabled
-        interval = 50  # time between steps in ms
-        steps = duration_ms / interval
-        if steps < 1:
-            self.send_pressures([end_pressure]*6)
-        else:            
-            current = [start_pressure]*6
-            #  print("moving from", start_pressure, "to", end_pressure, "steps", steps)
-            delta = float(end_pressure - start_pressure)/steps
-            #  print("delta = ", delta)
-            for step in range(steps):
-                current  =  [p+delta for p in current]
-                #  print(current)
-                self.sleep_func(interval / 1000.0)
-                if self.progress_callback:
-                    self.progress_callback(100 * step/steps)
+        self.suspend_output_thread()   # the ramp sends the pressures
+        self.mover.start([start_pressure] * 6, [end_pressure] * 6, duration=duration_ms / 1000.0)
+        self.move_kind = "pressures"
+        if self.pressure_controller:
+            self.pressure_controller.reset()  # pressures are sent uncorrected during the ramp
+
+    def step_move(self):
+        """
+        Output the next step of a slow move or calibration sweep, called every frame by the core
+        (which sends nothing else while this returns True). Returns False when neither is in progress.
+        """
+        if self.sweep:
+            return self.step_sweep()
+        position = self.mover.step()
+        if position is None:
+            if self.move_kind == "pressures":
+                self.resume_output_thread()
+            self.move_kind = None
+            return False
+        if self.move_kind == "lengths":
+            self.set_muscle_lengths(np.clip(position, 0, 6000).tolist())
+        else:
+            self.send_pressures([int(round(p)) for p in position])
+        if self.progress_callback:
+            self.progress_callback(100 * self.mover.progress)
+        return True
 
     ##### legacy code for chairs
     """
@@ -335,6 +424,10 @@ class MuscleOutput(object):
 if __name__ == "__main__":
     log_level = logging.INFO
     logging.basicConfig(level=log_level, format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S')
-    out = MuscleOutput()
-    out.slow_pressure_move(0,3000, 1000)
-    out.slow_pressure_move(3000, 2000,  1000)
\ No newline at end of file
+    # pressure ramps sent to a Festo (or festo_emulator.py) on this PC
+    out = MuscleOutput(lambda lengths: lengths, time.sleep, '127.0.0.1')
+    out.set_progress_callback(lambda percent: print(f"{percent:.0f}%", out.sent_pressures))
+    for start, end in ((0, 3000), (3000, 2000)):
+        out.slow_pressure_move(start, end, 1000)
+        while out.step_move():
+            time.sleep(0.05)
@@ -0,0 +1,240 @@
+"""
+ output_sender.py
+
+ Sends pressure commands to the Festo controller at a higher rate than the control loop.
+
+ The control loop hands over muscle length targets at its own rate (set_target). A sender
+ thread running at rate_hz moves the output from where it is towards the latest target over
+ one (measured) control period and converts each intermediate set of lengths to pressures,
+ so the muscles see small frequent steps instead of a staircase at the frame rate.
+ Interpolation is either:
+   - "linear": a straight ramp to the target, continuous in position,
+   - "hermite": a cubic segment that also matches the velocity at both ends (the current
+     output velocity and the target velocity of the last two targets), so the commanded
+     motion has no corners at frame boundaries.
+ If the next target is late the output holds at the last target.
+
+ All distance-to-pressure conversions happen on the sender thread while it runs, so the
+ d_to_p hysteresis sees one continuous stream of lengths.
+
+ usage:
+    sender = OutputSender(d_to_p.muscle_length_to_pressure, festo, rate_hz=100)
+    sender.start()
+    sender.set_target(muscle_lengths, origin_time)   # every control frame
+    sender.stop()
+
+ Running this module benchmarks the achieved output rate and timing jitter against the
+ headless Festo emulator (festo_emulator.py):
+    python -m output.output_sender [--rate 200] [--control-rate 20]
+"""
+
+import time
+import logging
+import threading
+import traceback
+
+import numpy as np
+
+from common.stage_timer import RollingStats
+
+log = logging.getLogger(__name__)
+
+INTERPOLATIONS = ("linear", "hermite")
+
+
+class OutputSender(object):
+    MAX_CONTROL_PERIOD = 0.2   # longer gaps between targets are treated as a restart, not a slow ramp
+
+    def __init__(self, d_to_p_func, festo, rate_hz=100, interpolation="linear"):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"interpolation must be one of {INTERPOLATIONS}")
+        self.d_to_p = d_to_p_func
+        self.festo = festo
+        self.period = 1.0 / rate_hz
+        self.interpolation = interpolation
+        self.lock = threading.Lock()
+
+        # current segment, replaced by set_target under the lock
+        self.seg_start = 0.0
+        self.seg_duration = 0.0
+        self.p0 = self.p1 = None   # start and end lengths
+        self.v0 = self.v1 = None   # start and end velocities in mm/s (hermite)
+        self.prev_target = None
+        self.prev_target_time = None
+        self.control_period = None  # smoothed interval between targets
+        self.pending_origin = None  # origin time of the newest target, until its first command is sent
+
+        self.sent_pressures = [0] * 6
+        self.e2e_latency = None     # seconds from sim sampling to the first command towards that frame's target
+        self.nbr_sent = 0
+        self.interval_stats = RollingStats()  # time between commands
+        self.send_stats = RollingStats()      # d_to_p conversion and send
+        self.window = max(1, int(10 * rate_hz))
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="output_sender", daemon=True)
+        self.thread.start()
+        log.info("Output sender running at %.0f Hz with %s interpolation", 1 / self.period, self.interpolation)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def set_target(self, muscle_lengths, origin_time=None):
+        """ Called every control frame with the new muscle lengths, returns immediately. """
+        now = time.perf_counter()
+        target = np.asarray(muscle_lengths, dtype=float)
+        if self.prev_target_time is not None:
+            dt = now - self.prev_target_time
+            if 0 < dt < self.MAX_CONTROL_PERIOD:
+                self.control_period = dt if self.control_period is None else 0.9 * self.control_period + 0.1 * dt
+        with self.lock:
+            if self.p1 is None or self.control_period is None or now - self.prev_target_time >= self.MAX_CONTROL_PERIOD:
+                # first target or restart after a pause: go straight there
+                position, velocity = target, np.zeros_like(target)
+                duration = 0.0
+                end_velocity = np.zeros_like(target)
+            else:
+                position, velocity = self._evaluate(now)
+                duration = max(self.control_period, self.period)
+                end_velocity = (target - self.prev_target) / self.control_period
+            self.seg_start = now
+            self.seg_duration = duration
+            self.p0, self.v0 = position, velocity
+            self.p1, self.v1 = target, end_velocity
+            self.pending_origin = origin_time
+        self.prev_target = target
+        self.prev_target_time = now
+
+    def _evaluate(self, now):
+        """ Lengths and velocity of the current segment at time now (caller holds the lock). """
+        if self.seg_duration <= 0:
+            return self.p1, np.zeros_like(self.p1)
+        s = (now - self.seg_start) / self.seg_duration
+        if s >= 1.0:
+            return self.p1, np.zeros_like(self.p1)
+        if s < 0.0:
+            s = 0.0
+        d = self.seg_duration
+        if self.interpolation == "linear":
+            return self.p0 + (self.p1 - self.p0) * s, (self.p1 - self.p0) / d
+        # cubic hermite basis
+        s2, s3 = s * s, s * s * s
+        position = ((2 * s3 - 3 * s2 + 1) * self.p0 + (s3 - 2 * s2 + s) * d * self.v0
+                    + (-2 * s3 + 3 * s2) * self.p1 + (s3 - s2) * d * self.v1)
+        velocity = ((6 * s2 - 6 * s) * self.p0 / d + (3 * s2 - 4 * s + 1) * self.v0
+                    + (-6 * s2 + 6 * s) * self.p1 / d + (3 * s2 - 2 * s) * self.v1)
+        return position, velocity
+
+    def run(self):
+        next_time = time.perf_counter()
+        prev_send = None
+        while self.running:
+            now = time.perf_counter()
+            with self.lock:
+                if self.p1 is None:
+                    lengths = None
+                else:
+                    lengths, _ = self._evaluate(now)
+                origin, self.pending_origin = self.pending_origin, None
+            if lengths is not None:
+                try:
+                    pressures = self.d_to_p(lengths)
+                    self.festo.send_pressures(pressures)
+                    self.sent_pressures = pressures
+                    if origin is not None:
+                        self.e2e_latency = time.time() - origin
+                except Exception as e:
+                    log.error("Output sender: %s, %s", e, traceback.format_exc())
+                done = time.perf_counter()
+                self.send_stats.add(done - now)
+                if prev_send is not None:
+                    self.interval_stats.add(now - prev_send)
+                prev_send = now
+                self.nbr_sent += 1
+                if self.nbr_sent % self.window == 0:
+                    self.interval_stats.rotate()
+                    self.send_stats.rotate()
+
+            next_time += self.period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self.period:
+                next_time = time.perf_counter()  # fell behind (blocked send), don't try to catch up
+
+        # finish at the last target rather than part way along its segment
+        with self.lock:
+            final = self.p1
+        if final is not None:
+            try:
+                self.sent_pressures = self.d_to_p(final)
+                self.festo.send_pressures(self.sent_pressures)
+            except Exception as e:
+                log.error("Output sender: final send failed: %s", e)
+
+    def summary(self):
+        """ Returns {name: (count, min, mean, p99, max)} in milliseconds, as StageTimers.summary. """
+        result = {}
+        for name, stats in (("out_interval", self.interval_stats), ("out_send", self.send_stats)):
+            n, lo, mean, p99, hi = stats.summary()
+            result[name] = (n, lo * 1000, mean * 1000, p99 * 1000, hi * 1000)
+        return result
+
+
+if __name__ == "__main__":
+    # benchmark: drive the sender from a simulated control loop and measure the command
+    # timing seen by the headless Festo emulator
+    import argparse
+    from output.festo_itf import Festo
+    from output.festo_emulator import FestoEmulator
+    from output.d_to_p import DistanceToPressure
+    from common.stage_timer import format_table
+
+    parser = argparse.ArgumentParser(description="Output sender timing benchmark")
+    parser.add_argument("--rate", type=float, nargs="+", default=[100, 200], help="output rates in Hz")
+    parser.add_argument("--control-rate", type=float, default=20, help="control loop rate in Hz")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per run")
+    parser.add_argument("--interpolation", choices=INTERPOLATIONS, default="linear")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S')
+
+    emulator = FestoEmulator(port=0, host="127.0.0.1").start()
+    festo = Festo("127.0.0.1", emulator.port)
+    d2p = DistanceToPressure(251, 1000)
+    d2p.load_data("output/wheelchair_DtoP.csv")
+    d2p.set_load(24)
+
+    for rate in args.rate:
+        sender = OutputSender(d2p.muscle_length_to_pressure, festo, rate, args.interpolation)
+        sender.start()
+        emulator.start_recording()
+        start = time.perf_counter()
+        frame = 0
+        while time.perf_counter() - start < args.duration:
+            t = frame / args.control_rate
+            sender.set_target([900 + 60 * np.sin(2 * np.pi * 0.5 * t + i) for i in range(6)], time.time())
+            frame += 1
+            time.sleep(max(0.0, start + frame / args.control_rate - time.perf_counter()))
+        commands = emulator.stop_recording()
+        sender.stop()
+
+        arrivals = np.array([c[0] for c in commands])
+        intervals = np.diff(arrivals) * 1000
+        period = 1000 / rate
+        steps = np.abs(np.diff([c[1][0] for c in commands]))
+        print(f"\n{rate:.0f} Hz output, {args.control_rate:.0f} Hz control, {args.interpolation}:")
+        print(f"  achieved {len(commands) / (arrivals[-1] - arrivals[0]):.1f} commands/s, "
+              f"interval mean {intervals.mean():.3f} ms, std {intervals.std():.3f} ms, "
+              f"p99 |error| {np.percentile(np.abs(intervals - period), 99):.3f} ms, max {intervals.max():.3f} ms")
+        print(f"  mean pressure step on muscle 0: {steps.mean():.1f} mbar "
+              f"(about {steps.mean() * rate / args.control_rate:.0f} mbar per frame without upsampling)")
+        print(format_table(sender.summary()))
+    emulator.stop()
@@ -0,0 +1,198 @@
+"""
+ payload_estimator.py
+
+ Online estimate of the rider's payload from the pressures the muscles need to hold
+ their lengths, replacing the light/medium/heavy load buttons.
+
+ The PtoD tables (output/PtoD_40.csv, PtoD_80.csv) are pressure sweeps recorded with a
+ known payload: the muscle compression (mm) reached at each pressure step, for rising
+ (up) and falling (down) pressure over several cycles. At each pressure, compression is
+ modelled as linear in payload across the tables:
+     compression = intercept(p) + slope(p) * payload
+ so a muscle holding compression c at measured pressure p implies
+     payload = (c - intercept(p)) / slope(p)
+
+ Samples are only taken at steady state: the muscle's commanded length has stayed within
+ STEADY_TOLERANCE for SETTLE_TIME seconds, the measured pressure is above MIN_PRESSURE
+ (below it the tables for different payloads hardly differ) and the hysteresis branch is
+ the one the muscle last moved along. Each sample is weighted by slope^2, so pressures
+ where payload changes compression most count most. Every interval seconds the weighted
+ mean is low-pass filtered with time_constant and a new estimate is returned if it moved
+ more than deadband kg.
+
+ The estimate assumes the muscles are at the commanded lengths; when closed loop pressure
+ control is on the measured pressure follows the table for the current estimate, so the
+ estimate holds its value rather than converging.
+
+ usage:
+    estimator = PayloadEstimator(("output/PtoD_40.csv", "output/PtoD_80.csv"), max_length=1000,
+                                 initial_payload=60, payload_range=(50, 150))
+    payload = estimator.update(muscle_lengths, measured_pressures)   # every frame
+    if payload is not None:
+        d_to_p.set_load(...)                                         # a few times a minute at most
+
+    python -m output.payload_estimator     # convergence on a simulated ride
+
+ The core runs it only if the platform config sets PAYLOAD_ESTIMATION = True (off by default).
+"""
+
+import math
+import time
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def load_ptod(csv_path):
+    """
+    Returns (weight, pressures, curves) from a PtoD sweep file, where curves has shape
+    (2, len(pressures)): the mean compression of all muscles and cycles for the up and
+    down branches at each pressure step.
+    """
+    weight, header_lines = None, 0
+    with open(csv_path, 'r') as file:
+        for line in file:
+            header_lines += 1
+            fields = line.strip().split(',')
+            if fields[0] == 'WEIGHT':
+                weight = float(fields[1])
+            elif fields[0] == 'cycle':
+                break
+    if weight is None:
+        raise ValueError(f"{csv_path} has no WEIGHT line")
+    data = np.genfromtxt(csv_path, delimiter=',', skip_header=header_lines, usecols=range(10))
+    direction, pressure, compression = data[:, 1], data[:, 3], data[:, 4:10].mean(axis=1)
+    pressures = np.unique(pressure)
+    curves = np.array([[compression[(direction == d) & (pressure == p)].mean() for p in pressures]
+                       for d in (0, 1)])
+    return weight, pressures, curves
+
+
+class PayloadEstimator(object):
+    SETTLE_TIME = 1.0        # seconds a muscle must hold its length before it is sampled
+    STEADY_TOLERANCE = 2     # mm
+    MIN_PRESSURE = 1500      # mbar
+    MIN_SLOPE = 0.02         # mm per kg, pressures where payload makes less difference are not sampled
+
+    def __init__(self, ptod_files, max_length, initial_payload, payload_range,
+                 interval=1.0, time_constant=10.0, deadband=1.0):
+        tables = [load_ptod(path) for path in ptod_files]
+        weights = np.array([t[0] for t in tables])
+        self.pressures = tables[0][1]
+        curves = np.array([np.interp(self.pressures, t[1], t[2][d]) for t in tables for d in (0, 1)])
+        curves = curves.reshape(len(tables), 2, len(self.pressures))
+        # least squares line through the tables at each pressure step and branch
+        w = weights - weights.mean()
+        c_mean = curves.mean(axis=0)
+        self.slope = np.tensordot(w, curves - c_mean, axes=1) / (w @ w)   # (2, pressures)
+        self.intercept = c_mean - self.slope * weights.mean()
+        self.max_length = max_length
+        self.payload_range = payload_range
+        self.interval = interval
+        self.time_constant = time_constant
+        self.deadband = deadband
+        log.info("Payload estimator using %s, payloads %s kg", ptod_files, weights.tolist())
+        self.reset(initial_payload)
+
+    def reset(self, payload):
+        """ Restart the estimate from payload, e.g. when the operator selects a load. """
+        self.estimate = float(payload)
+        self.published = float(payload)
+        self.anchors = None           # compression of each muscle when it last moved
+        self.steady_since = np.zeros(6)
+        self.rising = np.ones(6, dtype=bool)   # last move increased compression (up branch)
+        self.sum_weights = 0.0
+        self.sum_loads = 0.0
+        self.last_estimate_time = None
+
+    def update(self, muscle_lengths, pressures, now=None):
+        """ Add this frame's lengths and measured pressures, returns a new payload in kg or None. """
+        now = time.perf_counter() if now is None else now
+        compressions = self.max_length - np.asarray(muscle_lengths, dtype=float)
+        if self.anchors is None:
+            self.anchors = compressions.copy()
+            self.steady_since[:] = now
+            self.last_estimate_time = now
+            return None
+
+        delta = compressions - self.anchors
+        moved = np.abs(delta) > self.STEADY_TOLERANCE
+        self.rising = np.where(moved, delta > 0, self.rising)
+        self.anchors[moved] = compressions[moved]
+        self.steady_since[moved] = now
+
+        pressures = np.asarray(pressures, dtype=float)
+        steady = (now - self.steady_since >= self.SETTLE_TIME) & (pressures >= self.MIN_PRESSURE)
+        if steady.any():
+            slope = np.where(self.rising, np.interp(pressures, self.pressures, self.slope[0]),
+                             np.interp(pressures, self.pressures, self.slope[1]))
+            intercept = np.where(self.rising, np.interp(pressures, self.pressures, self.intercept[0]),
+                                 np.interp(pressures, self.pressures, self.intercept[1]))
+            usable = steady & (np.abs(slope) >= self.MIN_SLOPE)
+            if usable.any():
+                loads = np.clip((compressions[usable] - intercept[usable]) / slope[usable], *self.payload_range)
+                weights = slope[usable] ** 2
+                self.sum_loads += float(weights @ loads)
+                self.sum_weights += float(weights.sum())
+
+        elapsed = now - self.last_estimate_time
+        if elapsed < self.interval:
+            return None
+        self.last_estimate_time = now
+        if self.sum_weights == 0:
+            return None
+        measured = min(max(self.sum_loads / self.sum_weights, self.payload_range[0]), self.payload_range[1])
+        self.sum_loads = self.sum_weights = 0.0
+        self.estimate += (measured - self.estimate) * (1.0 - math.exp(-elapsed / self.time_constant))
+        if abs(self.estimate - self.published) < self.deadband:
+            return None
+        self.published = self.estimate
+        log.debug("Payload estimate %.1f kg", self.published)
+        return self.published
+
+
+if __name__ == "__main__":
+    # simulated ride: the platform holds random poses, each muscle at the pressure the PtoD
+    # model needs for the true payload, measured with noise
+    import argparse
+    from output.d_to_p import DistanceToPressure
+
+    parser = argparse.ArgumentParser(description="Payload estimator on a simulated ride")
+    parser.add_argument("--payload", type=float, default=95, help="true payload in kg")
+    parser.add_argument("--initial", type=float, default=60, help="starting estimate in kg")
+    parser.add_argument("--noise", type=float, default=30, help="pressure measurement noise, mbar rms")
+    args = parser.parse_args()
+
+    files = ("output/PtoD_40.csv", "output/PtoD_80.csv")
+    estimator = PayloadEstimator(files, 1000, args.initial, (40, 150))
+    rng = np.random.default_rng(3)
+
+    def holding_pressure(compression, rising):
+        """ Pressure the model needs to hold compression on the given branch at the true payload. """
+        branch = 0 if rising else 1
+        curve = np.maximum.accumulate(estimator.intercept[branch] + estimator.slope[branch] * args.payload)
+        return float(np.interp(compression, curve, estimator.pressures))
+
+    dt, t = 0.05, 0.0
+    compressions = np.full(6, 100.0)
+    rising = np.ones(6, dtype=bool)
+    print(f"true payload {args.payload} kg, starting estimate {args.initial} kg")
+    for hold in range(60):
+        target = rng.uniform(60, 170, 6)   # within the range the muscles reach below 6 bar
+        rising = np.where(np.abs(target - compressions) > estimator.STEADY_TOLERANCE, target > compressions, rising)
+        for step in range(int(rng.uniform(1, 4) / dt)):
+            compressions += np.clip(target - compressions, -5, 5)   # move at up to 100 mm/s then hold
+            pressures = [holding_pressure(c, r) for c, r in zip(compressions, rising)] + rng.normal(0, args.noise, 6)
+            payload = estimator.update(1000 - compressions, pressures, t)
+            if payload is not None:
+                print(f"{t:6.1f} s: payload estimate {payload:5.1f} kg")
+            t += dt
+
+    import timeit
+    d2p = DistanceToPressure(251, 1000)
+    d2p.load_data("output/wheelchair_DtoP.csv")
+    d2p.set_load(20)
+    cached = timeit.timeit(lambda: d2p.set_load(20), number=10000) / 10000
+    print(f"set_load of a cached load: {cached * 1e6:.1f} us")
@@ -0,0 +1,203 @@
+"""
+ predictor.py
+
+ Latency compensating feed-forward for muscle length targets.
+
+ The platform trails the sim by the network and processing latency plus the time the
+ muscles take to reach a new pressure. The predictor estimates the velocity of each
+ muscle's target with an alpha-beta filter and sends the length the target will have
+ lead_time seconds ahead, so the response lines up with the sim instead of lagging it.
+
+   x_pred = x + v * dt          (predict)
+   r      = z - x_pred          (residual of the new measurement z)
+   x      = x_pred + alpha * r
+   v      = v + beta / dt * r
+   output = x + v * lead        (clipped to +-max_offset mm from the target and to the muscle range)
+
+ The default gains are close to the critically damped pairing beta = alpha^2 / (2 - alpha);
+ lower gains smooth more but the velocity estimate lags, which eats into the lead.
+
+ All six muscles are updated as NumPy vectors. Lead times are per muscle and can be
+ learned from flight recorder dumps: the lag between commanded and measured pressures
+ (cross correlation) plus the mean end-to-end latency.
+
+ usage:
+    predictor = AlphaBetaPredictor(lead_times, limits=(750, 1000))
+    lengths = predictor.update(muscle_lengths)    # every frame
+
+    python -m output.predictor learn flight_logs/*.npz    # prints lead times for sim_config
+    python -m output.predictor demo                       # phase lag on the C172_demo.csv replay
+"""
+
+import time
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class AlphaBetaPredictor(object):
+    RESTART_INTERVAL = 0.5   # seconds without an update after which the estimate is restarted
+    MIN_INTERVAL = 0.002     # updates closer together than this do not change the velocity estimate
+
+    def __init__(self, lead_times, alpha=0.8, beta=0.5, max_offset=40, limits=None):
+        self.lead_times = np.broadcast_to(np.asarray(lead_times, dtype=float), (6,)).copy()
+        self.alpha = alpha
+        self.beta = beta
+        self.max_offset = max_offset   # mm
+        self.limits = limits           # (min, max) muscle length in mm, or None
+        self.x = None                  # filtered lengths
+        self.v = np.zeros(6)           # filtered velocities, mm/s
+        self.last_time = None
+
+    def reset(self):
+        self.x = None
+        self.v[:] = 0
+
+    def set_lead_times(self, lead_times):
+        self.lead_times = np.broadcast_to(np.asarray(lead_times, dtype=float), (6,)).copy()
+
+    def update(self, lengths, now=None):
+        """ Returns the predicted lengths for this frame's target lengths. """
+        now = time.perf_counter() if now is None else now
+        z = np.asarray(lengths, dtype=float)
+        dt = None if self.last_time is None else now - self.last_time
+        self.last_time = now
+        if self.x is None or dt is None or dt <= 0 or dt > self.RESTART_INTERVAL:
+            self.x = z.copy()
+            self.v[:] = 0
+            return z
+        if dt < self.MIN_INTERVAL:
+            self.last_time -= dt   # measure the next interval from the previous update
+        else:
+            x_pred = self.x + self.v * dt
+            r = z - x_pred
+            self.x = x_pred + self.alpha * r
+            self.v += (self.beta / dt) * r
+        offset = np.clip(self.x + self.v * self.lead_times - z, -self.max_offset, self.max_offset)
+        predicted = z + offset
+        if self.limits:
+            predicted = np.clip(predicted, self.limits[0], self.limits[1])
+        return predicted
+
+
+def estimate_lag(command, response, dt, max_lag=1.0):
+    """
+    Delay in seconds of each column of response behind command, from the peak of their
+    cross correlation (refined between samples with a parabola). Columns with no
+    variation return NaN.
+    """
+    command = np.asarray(command, dtype=float)
+    response = np.asarray(response, dtype=float)
+    if command.ndim == 1:
+        command, response = command[:, None], response[:, None]
+    c = command - command.mean(axis=0)
+    r = response - response.mean(axis=0)
+    n = len(c)
+    max_shift = min(int(max_lag / dt), n // 2)
+    lags = np.full(c.shape[1], np.nan)
+    for col in range(c.shape[1]):
+        if not c[:, col].any() or not r[:, col].any():
+            continue
+        corr = np.array([np.dot(c[:n - k, col], r[k:, col]) / (n - k) for k in range(max_shift + 1)])
+        k = int(np.argmax(corr))
+        shift = float(k)
+        if 0 < k < max_shift:
+            y0, y1, y2 = corr[k - 1], corr[k], corr[k + 1]
+            denom = y0 - 2 * y1 + y2
+            if denom:
+                shift += 0.5 * (y0 - y2) / denom
+        lags[col] = shift * dt
+    return lags
+
+
+def learn_lead_times(flight_log, default=0.1):
+    """
+    Per muscle lead times from a flight recorder dump (dict from load_flight_log):
+    lag of measured behind commanded pressure plus the mean end-to-end latency.
+    Muscles without usable data get the default.
+    """
+    running = flight_log["state"] == 3   # PLATFORM_STATES index of "running"
+    if running.sum() < 100:
+        running = np.ones(len(flight_log["time"]), dtype=bool)
+    dt = float(np.median(flight_log["frame_interval"][running]))
+    measured = flight_log["meas_pressures"][running]
+    pneumatic = estimate_lag(flight_log["cmd_pressures"][running], measured, dt)
+    pneumatic[~measured.any(axis=0)] = np.nan    # pressures were not polled
+    latency = flight_log["e2e_latency"][running] if "e2e_latency" in flight_log else np.array([np.nan])
+    latency = float(np.nanmean(latency)) if np.isfinite(latency).any() else 0.0
+    return np.where(np.isnan(pneumatic), default, pneumatic + latency)
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Muscle length predictor tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    learn = sub.add_parser("learn", help="learn lead times from flight recorder dumps")
+    learn.add_argument("logs", nargs="+")
+    demo = sub.add_parser("demo", help="phase lag with and without prediction on the C172 demo replay")
+    demo.add_argument("--latency", type=float, default=0.05, help="simulated network and processing latency (s)")
+    demo.add_argument("--tau", type=float, default=0.15, help="simulated muscle time constant (s)")
+    args = parser.parse_args()
+
+    if args.command == "learn":
+        from common.flight_recorder import load_flight_log
+        leads = np.array([learn_lead_times(load_flight_log(path)) for path in args.logs])
+        for path, lead in zip(args.logs, leads):
+            print(f"{path}: " + ", ".join(f"{v:.3f}" for v in lead))
+        print(f"PREDICTOR_LEAD_TIMES = ({', '.join(f'{v:.3f}' for v in np.median(leads, axis=0))})")
+        sys.exit(0)
+
+    # demo: replay the recorded C172 flight through washout and kinematics, then through a
+    # model of the platform (latency followed by a first order muscle response)
+    from kinematics.cfg_SuspendedPlatform import PlatformConfig
+    from kinematics.kinematics_V2SP import Kinematics
+    from kinematics.dynamics import Dynamics
+
+    cfg = PlatformConfig()
+    cfg.calculate_coords()
+    k = Kinematics()
+    k.set_geometry(cfg.BASE_POS, cfg.PLATFORM_POS)
+    k.set_platform_params(cfg.MIN_ACTUATOR_LENGTH, cfg.MAX_ACTUATOR_LENGTH, cfg.FIXED_HARDWARE_LENGTH)
+    dynam = Dynamics()
+    dynam.begin(cfg.LIMITS_1DOF_TRANFORM, "shape.cfg")
+    transforms = np.loadtxt("dummy_xplane/C172_demo.csv", delimiter=",", skiprows=4)  # 3 comment lines and the column names
+    dt = 0.025   # interval_ms of the recording
+    targets = np.array([k.muscle_lengths(dynam.regulate(list(t))) for t in transforms], dtype=float)
+
+    def platform(commands):
+        """ Muscle lengths reached by the platform for the commanded lengths. """
+        delay = int(round(args.latency / dt))
+        delayed = np.vstack([np.repeat(commands[:1], delay, axis=0), commands[:len(commands) - delay]])
+        a = 1 - np.exp(-dt / args.tau)
+        out = np.empty_like(delayed)
+        out[0] = delayed[0]
+        for i in range(1, len(delayed)):
+            out[i] = out[i - 1] + a * (delayed[i] - out[i - 1])
+        return out
+
+    def replay(lead_times):
+        if lead_times is None:
+            commands = targets   # predictor not in the pipeline
+        else:
+            predictor = AlphaBetaPredictor(lead_times, limits=(cfg.MUSCLE_MIN_LENGTH, cfg.MUSCLE_MAX_LENGTH))
+            commands = np.array([predictor.update(t, i * dt) for i, t in enumerate(targets)])
+        return commands, platform(commands)
+
+    # flight log of an uncompensated run, commanded and measured pressure taken as proportional to length
+    commands, response = replay(None)
+    flight_log = dict(state=np.full(len(targets), 3), time=np.arange(len(targets)) * dt,
+                      frame_interval=np.full(len(targets), dt), cmd_pressures=commands, meas_pressures=response,
+                      e2e_latency=np.full(len(targets), args.latency))
+    learned = learn_lead_times(flight_log)
+    print(f"C172 replay, {len(targets)} frames, latency {args.latency * 1000:.0f} ms, muscle time constant {args.tau * 1000:.0f} ms")
+    print("learned lead times (s): " + ", ".join(f"{v:.3f}" for v in learned))
+    for label, lead in (("no prediction", None), ("learned lead", learned)):
+        commands, response = replay(lead)
+        lag = estimate_lag(targets, response, dt)
+        rms = np.sqrt(np.mean((response - targets) ** 2, axis=0))
+        print(f"{label:>14}: phase lag ms " + " ".join(f"{v * 1000:6.1f}" for v in lag)
+              + f"   rms error mm {rms.mean():.2f}")
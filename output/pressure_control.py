@@ -0,0 +1,135 @@
+"""
+ pressure_control.py
+
+ Closed loop correction of the commanded muscle pressures using the pressures measured by
+ the Festo controller (words 10-15, polled by festo_itf.Festo when enabled).
+
+ The d_to_p table gives the pressure each muscle needs for its target length, but the
+ pressure actually reached drifts with supply pressure and temperature. Per muscle, a PI
+ controller adds a correction so the measured pressure settles on the table pressure:
+
+   error      = setpoint - measured
+   correction = kp * error + integral,   integral += ki * error * dt
+   command    = setpoint + correction    (rate limited to max_rate mbar/s, within 0..max_pressure)
+
+ Anti-windup: the correction is limited to +-max_correction, and the integral stops where
+ proportional plus integral reaches that limit rather than growing into it. When no measurement is
+ available (pressures not polled, all zero) the setpoints pass through unchanged.
+
+ All six muscles are computed as NumPy vectors. Gains are set in the platform config
+ (PRESSURE_CONTROL, PRESSURE_KP, ...).
+
+ Running this module validates the controller against the headless Festo emulator with a
+ regulator that only reaches 88% of the commanded pressure less 60 mbar:
+    python -m output.pressure_control
+"""
+
+import time
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class PressureController(object):
+    def __init__(self, kp=0.3, ki=2.0, max_correction=600, max_rate=20000, max_pressure=6000):
+        self.kp = kp
+        self.ki = ki
+        self.max_correction = max_correction
+        self.max_rate = max_rate
+        self.max_pressure = max_pressure
+        self.integral = np.zeros(6)
+        self.command = None         # last output, for rate limiting
+        self.last_time = None
+
+    def reset(self):
+        self.integral[:] = 0
+        self.command = None
+        self.last_time = None
+
+    def update(self, setpoints, measured, now=None):
+        """ Returns the pressures to send for the table setpoints, given the latest measured pressures. """
+        now = time.perf_counter() if now is None else now
+        setpoints = np.asarray(setpoints, dtype=float)
+        measured = np.asarray(measured, dtype=float)
+        if not measured.any():
+            self.reset()
+            return setpoints
+        dt = 0.0 if self.last_time is None else min(now - self.last_time, 0.1)
+        self.last_time = now
+
+        error = setpoints - measured
+        proportional = self.kp * error
+        integral = self.integral + self.ki * error * dt
+        correction = proportional + integral
+        # conditional integration: where the new integral would push further into saturation, it only
+        # moves (in the error's direction, never back) as far as the value that puts the correction on the limit
+        saturated = np.abs(correction) > self.max_correction
+        winding = saturated & (np.sign(error) == np.sign(correction))
+        on_limit = np.sign(correction) * self.max_correction - proportional
+        limited = np.where(error > 0, np.maximum(self.integral, np.minimum(integral, on_limit)),
+                           np.minimum(self.integral, np.maximum(integral, on_limit)))
+        self.integral = np.where(winding, limited, integral)
+        self.integral = np.clip(self.integral, -self.max_correction, self.max_correction)
+        correction = np.clip(proportional + self.integral, -self.max_correction, self.max_correction)
+
+        command = np.clip(setpoints + correction, 0, self.max_pressure)
+        if self.command is not None and dt > 0:
+            step = self.max_rate * dt
+            command = np.clip(command, self.command - step, self.command + step)
+        self.command = command
+        return command
+
+
+if __name__ == "__main__":
+    import argparse
+    from output.festo_itf import Festo
+    from output.festo_emulator import FestoEmulator
+    from output.output_sender import OutputSender
+    from output.d_to_p import DistanceToPressure
+
+    parser = argparse.ArgumentParser(description="Validate closed loop pressure control against the Festo emulator")
+    parser.add_argument("--duration", type=float, default=6, help="seconds per run")
+    parser.add_argument("--supply-gain", type=float, default=0.88)
+    parser.add_argument("--offset", type=float, default=-60)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S')
+
+    d2p = DistanceToPressure(251, 1000)
+    d2p.load_data("output/wheelchair_DtoP.csv")
+    d2p.set_load(24)
+    emulator = FestoEmulator(port=0, host="127.0.0.1", time_constant=0.15,
+                             supply_gain=args.supply_gain, offset=args.offset).start()
+    festo = Festo("127.0.0.1", emulator.port)
+    festo.enable_poll_pressure(True)
+
+    for closed_loop in (False, True):
+        controller = PressureController() if closed_loop else None
+        setpoints = np.zeros(6)
+
+        def lengths_to_command(lengths):
+            global setpoints
+            setpoints = np.asarray(d2p.muscle_length_to_pressure(lengths), dtype=float)
+            if controller is None:
+                return setpoints.astype(int)
+            return controller.update(setpoints, festo.get_pressure()).astype(int)
+
+        sender = OutputSender(lengths_to_command, festo, 100)
+        sender.start()
+        errors = []
+        start = time.perf_counter()
+        frame = 0
+        while time.perf_counter() - start < args.duration:
+            t = frame * 0.05
+            sender.set_target([900 + 40 * np.sin(2 * np.pi * 0.2 * t + i) for i in range(6)])
+            frame += 1
+            if t > 2:   # after settling
+                errors.append(setpoints - np.asarray(emulator.actual))
+            time.sleep(max(0.0, start + frame * 0.05 - time.perf_counter()))
+        sender.stop()
+        errors = np.array(errors)
+        label = "closed loop" if closed_loop else "open loop"
+        print(f"{label:>11}: measured - table pressure, mean {-errors.mean():7.1f} mbar, "
+              f"rms {np.sqrt((errors ** 2).mean()):6.1f} mbar")
+    emulator.stop()
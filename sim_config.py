@@ -29,6 +29,62 @@ DEFAULT_PLATFORM_INDEX = 0
  
 FESTO_IP = "192.168.0.10"
 
+# further platforms driven side by side from the same sim, as (AVAILABLE_PLATFORMS index, Festo IP, load level 0-2)
+# the platform above is always the first, the UI, echo and flight recorder follow it
+# e.g. [(0, "192.168.0.11", 1), (1, "192.168.0.12", 2)]
+EXTRA_PLATFORMS: List[Tuple[int, str, int]] = []
+
+# flight recorder (black box) keeps this many minutes of per-frame data,
+# dumped to FLIGHT_RECORDER_DIR on deactivation, on error, or with Ctrl+D in the UI
+FLIGHT_RECORDER_MINUTES = 5
+FLIGHT_RECORDER_DIR = "flight_logs"
+
+# seconds between log lines of motion pipeline stage timing, 0 disables the log
+STAGE_TIMING_LOG_INTERVAL = 0
+
+# rate the UI pulls the latest values from the core (15-30 is plenty for the display)
+UI_REFRESH_HZ = 20
+# interval between polls of the hardware switch serial port
+SWITCH_POLL_INTERVAL_MS = 20
+
+# pressure commands are sent from a thread at this rate, interpolated between the muscle lengths
+# calculated each frame ("linear" or "hermite"), 0 sends once per frame from the control loop.
+# Only used with a lookup table d_to_p, the ML model is tuned to the frame rate.
+# Off until validated on the rig, 100 is the rate to try
+OUTPUT_RATE_HZ = 0
+OUTPUT_INTERPOLATION = "linear"
+
+# activation and deactivation moves: profile ("linear", "trapezoid" or "scurve"),
+# max muscle speed mm/s, acceleration mm/s2 and jerk smoothing time in seconds (scurve)
+MOTION_PROFILE = "scurve"
+MOTION_MAX_VELOCITY = 50
+MOTION_MAX_ACCEL = 100
+MOTION_JERK_TIME = 0.2
+
+# optional feed-forward of muscle length targets to compensate latency and muscle lag,
+# None disables; per muscle lead times in seconds, learn them from flight recorder dumps with
+#   python -m output.predictor learn flight_logs/*.npz
+PREDICTOR_LEAD_TIMES = None
+PREDICTOR_ALPHA = 0.8
+PREDICTOR_BETA = 0.5
+
+# digital twin echo to the Unity visualizer, sent from a thread at ECHO_RATE_HZ.
+# The default is the original comma separated text broadcast on the LAN, which the current
+# visualizer parses. Visualizers that read the binary format (output/echo_sender.py) can opt in
+# with ECHO_FORMAT = "binary" and a multicast group they join, e.g. [("239.255.10.20", 10020)];
+# other (ip, port) entries are individual subscribers
+ECHO_DESTINATIONS = [("<broadcast>", 10020)]
+ECHO_RATE_HZ = 30
+ECHO_FORMAT = "text"
+ECHO_MULTICAST_TTL = 1
+
+# run the motion pipeline in a separate control process (siminterface_control.py); the UI
+# attaches to it through shared memory and can be closed and restarted while the platform runs
+CONTROL_PROCESS = False
+CONTROL_PROCESS_LOG = "control_process.log"
+# seconds without a UI heartbeat before the control process pauses the sim
+UI_LOSS_TIMEOUT = 2.0
+
 def get_switch_comport(os_name: str) -> str:
     """Returns the correct COM port based on the operating system."""
     if os_name == 'nt':
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+ siminterface_control.py
+
+ Runs the motion pipeline in its own process so it does not share the GIL with Qt painting.
+
+ The UI process (siminterface.py with sim_config.CONTROL_PROCESS set) starts this module if
+ it is not already running and talks to it through common.shared_state:
+   - every frame the control process writes transform, muscle lengths, pressures, status codes
+     and timing to the shared state block,
+   - UI requests (state changes, gains, intensity, mode, load) arrive on the command ring,
+   - core signals (state changes, status messages, connection status, activation progress) go
+     out on the event ring; the connection status is also kept in the state block for UIs that
+     attach later.
+
+ The control process keeps running when the UI is closed or restarted. If the UI heartbeat
+ stops for sim_config.UI_LOSS_TIMEOUT seconds while flying, the sim is paused so the platform
+ holds its position until a UI attaches again.
+
+ usage:
+    python siminterface_control.py [--rate HZ]   # normally started by siminterface.py
+    python siminterface_control.py --stop        # deactivate the platform and end the control process
+"""
+
+import sys
+import time
+import math
+import signal
+import logging
+import argparse
+
+import sim_config
+from siminterface_core import SimInterfaceCore
+from siminterface_headless import HeadlessRunner
+from common.shared_state import SharedState, STATUS_CODES, MAX_STAGES
+from common.flight_recorder import PLATFORM_STATES
+
+log = logging.getLogger(__name__)
+
+# core methods the UI process may call through the command ring
+COMMANDS = ("update_state", "update_gain", "intensityChanged", "loadLevelChanged",
+            "modeChanged", "assistLevelChanged", "pause_sim")
+
+
+class ControlRunner(HeadlessRunner):
+    TIMING_INTERVAL = 1.0  # seconds between stage timing updates in the state block
+
+    def __init__(self, core, shared):
+        super().__init__(core)
+        self.shared = shared
+        self.activation_percent = 0
+        self.last_timing_publish = 0
+        self.stages_dropped = False
+        self.ui_lost = False
+        self.shutting_down = False
+        core.activationLevelUpdated.connect(self.on_activation_level)
+        core.connectionStateChanged.connect(self.on_connection_state_changed)
+
+    def send_event(self, *message):
+        if not self.shared.events.put(list(message)):
+            log.debug("Control: event ring full, %s dropped", message[0])
+
+    # core signals are forwarded to the UI process instead of being handled here
+    def on_platform_state_changed(self, state):
+        log.info("Control: platform state is now '%s'", state)
+        self.send_event("platformStateChanged", state)
+
+    def on_sim_status_changed(self, status):
+        if status != self.last_status:
+            self.last_status = status
+            self.send_event("simStatusChanged", status)
+
+    def on_fatal_error(self, msg):
+        log.error("Control: %s", msg)
+        self.send_event("fatal_error", msg)
+
+    def on_connection_state_changed(self, state):
+        self.shared.write(
+            conn_status=STATUS_CODES.index(state.conn_status),
+            data_status=STATUS_CODES.index(state.data_status),
+            aircraft_status=STATUS_CODES.index(state.aircraft_info.status),
+            aircraft_name=state.aircraft_info.name.encode()[:40]
+        )
+        self.send_event("connectionStateChanged", state.conn_status, state.data_status,
+                        state.aircraft_info.status, state.aircraft_info.name)
+
+    def on_activation_level(self, transition):
+        self.activation_percent = transition.activation_percent
+        self.send_event("activationLevelUpdated", transition.activation_percent, list(transition.muscle_lengths))
+
+    def update(self):
+        self.service_commands()
+        self.core.data_update()
+        self.publish()
+        self.check_ui()
+        if self.shutting_down and self.core.transition_state is None and self.core.state in ("initialized", "deactivated"):
+            log.info("Control: platform deactivated, exiting")
+            self.stop()
+
+    def service_commands(self):
+        while True:
+            command = self.shared.commands.get()
+            if command is None:
+                return
+            name, args = command[0], command[1:]
+            try:
+                if name == "shutdown":
+                    self.request_shutdown()
+                elif name == "dump_flight_recorder":
+                    path = self.core.dump_flight_recorder(*args)
+                    if path:
+                        self.send_event("simStatusChanged", f"Flight recorder saved to {path}")
+                elif name in COMMANDS:
+                    getattr(self.core, name)(*args)
+                else:
+                    log.warning("Control: unknown command %s", command)
+            except Exception as e:
+                log.error("Control: command %s failed: %s", command, e)
+
+    def publish_static(self):
+        """ Values that do not change while running, written once after setup. """
+        self.shared.write(
+            local_ip=self.core.local_ip.encode(),
+            sim_ip=self.core.sim_ip_address.encode(),
+            festo_ip=self.core.FESTO_IP.encode()
+        )
+
+    def publish(self):
+        core = self.core
+        values = dict(
+            muscle_lengths=core.muscle_lengths,
+            cmd_pressures=core.muscle_output.sent_pressures,
+            meas_pressures=core.muscle_output.festo.actual_pressures,
+            platform_state=PLATFORM_STATES.index(core.state),
+            activation_percent=self.activation_percent,
+            temperature=math.nan if core.temperature is None else core.temperature,
+            processing_percent=core.processing_percent,
+            jitter_percent=core.jitter_percent,
+            e2e_latency=math.nan if core.e2e_latency is None else core.e2e_latency
+        )
+        update = core.latest_update
+        if update is not None:
+            values.update(transform=update.transform)
+        now = time.perf_counter()
+        if now - self.last_timing_publish > self.TIMING_INTERVAL:
+            self.last_timing_publish = now
+            values.update(self.stage_timing())
+        self.shared.write(**values)
+
+    def stage_timing(self):
+        """ Stage names with their rows, the set changes while running (output sender suspended, extra rigs). """
+        timing = self.core.get_stage_timing()
+        if len(timing) > MAX_STAGES and not self.stages_dropped:
+            self.stages_dropped = True
+            log.warning("Control: %d timing stages, only the first %d are shared with the UI", len(timing), MAX_STAGES)
+        names = list(timing)[:MAX_STAGES]
+        rows = [timing[name] for name in names]
+        return dict(nbr_stages=len(names),
+                    stage_names=[n.encode() for n in names] + [b""] * (MAX_STAGES - len(names)),
+                    timing=rows + [(0, 0, 0, 0, 0)] * (MAX_STAGES - len(rows)))
+
+    def check_ui(self):
+        heartbeat = float(self.shared.ui_heartbeat[0])
+        if heartbeat == 0:
+            return  # no UI has attached yet
+        lost = time.time() - heartbeat > sim_config.UI_LOSS_TIMEOUT
+        if lost and not self.ui_lost:
+            log.warning("Control: UI not responding")
+            if self.core.state == "running":
+                log.warning("Control: pausing sim until the UI returns")
+                self.core.update_state("paused")
+        elif self.ui_lost and not lost:
+            log.info("Control: UI attached")
+        self.ui_lost = lost
+
+    def request_shutdown(self):
+        """ Deactivate the platform, the runner stops once the deactivation move is complete. """
+        if self.shutting_down:
+            return
+        log.info("Control: shutdown requested")
+        self.shutting_down = True
+        if self.core.state not in ("initialized", "deactivated"):
+            self.core.update_state("deactivated")
+
+
+def man():
+    parser = argparse.ArgumentParser(description='Sim interface control process')
+    parser.add_argument("-r", "--rate", type=float, default=20.0,
+                        help="control loop rate in Hz (default 20)")
+    parser.add_argument("--stop", action="store_true",
+                        help="ask the running control process to deactivate the platform and exit")
+    return parser
+
+
+if __name__ == "__main__":
+    args = man().parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        datefmt="%H:%M:%S")
+    if args.stop:
+        try:
+            shared = SharedState.attach()
+        except FileNotFoundError:
+            print("control process is not running")
+            sys.exit(1)
+        shared.commands.put(["shutdown"])
+        shared.close()
+        sys.exit(0)
+
+    try:
+        shared = SharedState.create()
+    except FileExistsError as e:
+        print(f"{e}, stop it first with --stop")
+        sys.exit(1)
+    core = SimInterfaceCore(sleep_func=time.sleep, data_period_ms=1000.0 / args.rate)
+    runner = ControlRunner(core, shared)
+    core.setup()
+    if not core.is_started:
+        log.error("Control: core failed to start")
+        shared.close()
+        sys.exit(1)
+    runner.publish_static()
+    signal.signal(signal.SIGTERM, lambda signum, frame: runner.request_shutdown())
+    signal.signal(signal.SIGINT, lambda signum, frame: runner.request_shutdown())
+
+    log.info("Control: running at %.1f Hz", args.rate)
+    runner.run()
+    core.flight_recorder.wait()
+    core.cleanup_on_exit()
+    shared.close()
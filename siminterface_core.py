@@ -0,0 +1,758 @@
+"""
+ siminterface_core.py
+
+ Core logic for controlling the platform from simulations, free of Qt so it can
+ be driven by the Qt front end (siminterface.py) or run headless
+ (siminterface_headless.py). Front ends subscribe to the core's Signals and
+ call data_update every data_period_ms.
+"""
+
+import os
+import sys
+import platform
+import traceback
+import time
+import logging
+import importlib
+
+import numpy as np
+
+import sim_config
+#naming#from kinematics.kinematicsV2 import Kinematics
+from kinematics.dynamics import Dynamics
+from kinematics.conditioning import TransformConditioner
+
+# d_to_p is now imported in load_config method
+# import output.d_to_p_ML as d_to_p
+
+from common.get_local_ip import get_local_ip
+from common.signals import Signal
+from common.flight_recorder import FlightRecorder, PLATFORM_STATES
+from common.stage_timer import StageTimers, format_table
+
+#naming#from output.muscle_output import MuscleOutput
+from output.predictor import AlphaBetaPredictor
+from output.motion_profile import MotionProfileExecutor
+from output.payload_estimator import PayloadEstimator
+from output.echo_sender import EchoSender
+from output.multi_platform import PlatformArray, create_platform
+from sims.shared_types import SimUpdate, ActivationTransition, ConnectionState, AircraftInfo
+from sims.sim_adapter import load_adapter
+
+log = logging.getLogger(__name__)
+
+
+# stages of the motion pipeline timed in every frame
+# end_to_end is the time from the sim sampling telemetry to the pressure command being sent
+PIPELINE_STAGES = ("sim_read", "washout", "regulate", "kinematics", "predict", "d_to_p",
+                   "festo_send", "echo", "recorder", "publish", "frame", "end_to_end")
+
+class SimInterfaceCore(object):
+    """
+    Core logic for controlling platform from simulations.
+
+    Responsibilities:
+      - Loading platform config (chair/slider).
+      =	Handles platform state management, simulation data updates, and communication with xplane.py
+      - Reads sim data in data_update, called every data_period_ms by a runner
+        (QTimer in siminterface.py, plain loop in siminterface_headless.py).
+      -	Handles intensity, assist, and mode changes (intensityChanged(), modeChanged(), assistLevelChanged()).
+      - Notifies the UI of simulation state (simStatusChanged) and of connection, data and
+        aircraft status changes (connectionStateChanged).
+      - Publishes the latest frame values (latest_update) for the UI to pull at its own rate.
+      - Converting transforms -> muscle movements via kinematics, d_to_p, etc.
+    """
+
+    def __init__(self, sleep_func=time.sleep, data_period_ms=50):
+        # Signals to inform the UI (or any other front end)
+        self.simStatusChanged = Signal(str)          # e.g., "Connected", "Not Connected", ...
+        self.fatal_error = Signal(str)               # fatal error forcing exit of application
+        self.logMessage = Signal(str)                # general logs or warnings to display in UI
+        self.activationLevelUpdated = Signal(object) # activation percent passed in slow moved  
+        self.platformStateChanged = Signal(str)      # "enabled", "deactivated", "running", "paused"
+        self.connectionStateChanged = Signal(object) # ConnectionState, emitted only when it changes
+
+        # sleep that keeps the front end responsive, passed to the sim and muscle output
+        self.sleep_func = sleep_func
+
+        # Simulation references
+        self.sim = None # the sim to run (xplane 11)
+        self.current_pilot_assist_level = None
+        self.current_mode = None # this is the currently selected flight situation (or ride if roller coaster) 
+
+        # data_update is called by the runner every data_period_ms
+        self.data_period_ms = data_period_ms
+        self.data_period = data_period_ms / 1000.0
+        
+        # performance timer
+        self.last_frame_time = time.perf_counter()
+        self.last_loop_start = None
+
+        # Basic flags and states
+        self.is_started = False      # True after platform config and sim are loaded
+        self.state = 'initialized'    # runtime platform states: disabled, enabled, running, paused
+
+        # Default transforms
+        self.transform = np.array([0, 0, -1, 0, 0, 0], dtype=float)   # sim transform with UI gains, for display
+        self.raw_transform = [0] * 6      # from sim, before washout
+        self.washed_transform = [0] * 6   # after washout
+        self.request = [0] * 6            # regulated request passed to kinematics
+        self.e2e_latency = None           # seconds from sim sampling to pressure command, None if unknown
+        self.latest_update = None         # most recent SimUpdate, replaced (never mutated) every frame
+        # status reported by the sim when it changes, sims that do not report one are assumed ready
+        self.connection_state = ConnectionState("nogo", "nogo", AircraftInfo(status="nogo", name="Aircraft"))
+
+        # Kinematics, dynamics, distance->pressure references
+        self.k = None
+        self.dynam = None
+        self.DtoP = None
+        self.muscle_output = None
+        self.predictor = None   # optional AlphaBetaPredictor between kinematics and d_to_p
+        self.platforms = None   # PlatformArray of every rig driven, the first is k, DtoP and muscle_output above
+        self.echo_sender = None  # EchoSender to the Unity digital twin, started in setup
+        self.payload_estimator = None  # optional PayloadEstimator, sets the d_to_p load from measured pressures
+        self.cfg = None
+        self.is_slider = False
+        self.invert_axis = (1, 1, 1, 1, 1, 1)   # can be set by config
+        self.swap_roll_pitch = False
+        self.gains = [1.0]*6
+        self.master_gain = 1.0
+        self.intensity_percent = 100 
+        self.conditioner = TransformConditioner()   # all gains, inversion, clip, range and swap in one matrix
+        self.ui_gains = np.ones(6)                  # gains * master gain * intensity, for the displayed transform
+        
+        # Transition control, the motion profile is stepped once per frame
+        self.transition_state = None            # "activating" or "deactivating"
+        self.transition_motion = self.new_motion_executor()
+        self.transition_start_percent = 0       # activation percent when the current move started
+        self.transition_percent = 0
+
+        self._block_sim_control = False         # Used to suppress sim input during transition
+        self.virtual_only_mode = False          # If true, Unity only — no physical output
+
+
+       
+        # temperature monitor        
+        self.temperature = None
+        self.TEMPERATURE_INTERVAL = 10  # seconds
+        self.last_temperature_read = 0
+        self.is_pi = platform.system() == "Linux" and os.path.exists("/sys/class/thermal/thermal_zone0/temp")
+        if self.is_pi:
+            log.info("SimInterfaceCore: temperature read every %d seconds", self.TEMPERATURE_INTERVAL)
+        
+        # performance monitor   
+        self.processing_percent = 0
+        self.jitter_percent = 0
+
+        # black box recorder of the last few minutes of platform motion
+        self.flight_recorder = FlightRecorder(sim_config.FLIGHT_RECORDER_MINUTES, 1000 / self.data_period_ms)
+
+        # per stage timing, statistics cover the last 10 to 20 seconds
+        self.stage_timers = StageTimers(PIPELINE_STAGES, window_frames=int(10000 / self.data_period_ms))
+        self.last_timing_log = time.perf_counter()
+
+    # --------------------------------------------------------------------------
+    # set up configurations
+    # --------------------------------------------------------------------------
+    def setup(self):
+        """ Load config and sim, the runner starts calling data_update if is_started is then True. """
+        self.load_config()
+        self.load_sim()
+    
+        logging.info("Core: Initialization complete. Emitting 'initialized' state.")
+        self.platformStateChanged.emit("initialized")  
+        
+        self.echo_sender = EchoSender(sim_config.ECHO_DESTINATIONS, sim_config.ECHO_RATE_HZ,
+                                      sim_config.ECHO_FORMAT, sim_config.ECHO_MULTICAST_TTL).start()
+        self.local_ip = get_local_ip()
+        
+    # --------------------------------------------------------------------------
+    # Platform Config
+    # --------------------------------------------------------------------------
+    def load_config(self):
+        """
+        Imports the platform config (chair or slider). Then sets up Kinematics, DtoP, MuscleOutput.
+        """
+        try:
+            import importlib
+            selected_platform, description = sim_config.AVAILABLE_PLATFORMS[sim_config.DEFAULT_PLATFORM_INDEX]
+            cfg_module = importlib.import_module(selected_platform)       
+            self.cfg = cfg_module.PlatformConfig()
+            log.info(f"Core: Imported cfg from {selected_platform}: {description}")
+            self.FESTO_IP = sim_config.FESTO_IP
+        except Exception as e:
+            self.handle_error(e, f"Unable to import platform config from {cfg_module}, check sim_config.py")
+            return              
+
+        # Setup kinematics, distance->pressure and muscle output of each rig, the first is the platform above
+        rigs = [(self.cfg, self.FESTO_IP, 1)]  # default is middle weight
+        try:
+            for platform_index, festo_ip, load_level in sim_config.EXTRA_PLATFORMS:
+                module_name, _ = sim_config.AVAILABLE_PLATFORMS[platform_index]
+                rigs.append((importlib.import_module(module_name).PlatformConfig(), festo_ip, load_level))
+            platforms = [create_platform(f"rig{i}", cfg, festo_ip, self.sleep_func, self.data_period, load_level,
+                                         sim_config.OUTPUT_RATE_HZ, sim_config.OUTPUT_INTERPOLATION,
+                                         int(10000 / self.data_period_ms), self.new_motion_executor)
+                         for i, (cfg, festo_ip, load_level) in enumerate(rigs)]
+        except Exception as e:
+            self.handle_error(e, "Error loading platform configs or Muscle pressure mapping tables ")
+            return
+        self.platforms = PlatformArray(platforms, self.new_motion_executor)
+        self.k = platforms[0].k
+        self.DtoP = platforms[0].DtoP
+        self.muscle_output = platforms[0].muscle_output
+        self.is_slider = platforms[0].is_slider
+        self.muscle_lengths = self.cfg.DEACTIVATED_MUSCLE_LENGTHS.copy()
+        if len(platforms) > 1:
+            log.info("Core: driving %d platforms: %s", len(platforms),
+                     ", ".join(f"{p.name} {type(p.cfg).__module__} at {p.festo_ip}" for p in platforms))
+        else:
+            self.muscle_output.set_stage_timers(self.stage_timers)  # with several rigs each times its own sends
+
+        self.payload_weights = platforms[0].payload_weights
+        log.info(f"Core: Payload weights in kg per muscle: {self.payload_weights}")
+        
+        self.invert_axis = self.cfg.INVERT_AXIS
+        self.swap_roll_pitch = self.cfg.SWAP_ROLL_PITCH
+
+        self.dynam = Dynamics()
+        self.dynam.begin(self.cfg.LIMITS_1DOF_TRANFORM, "shape.cfg")
+        self.update_conditioning()
+
+        if sim_config.PREDICTOR_LEAD_TIMES:
+            for p in platforms:
+                p.predictor = AlphaBetaPredictor(sim_config.PREDICTOR_LEAD_TIMES, sim_config.PREDICTOR_ALPHA,
+                                                 sim_config.PREDICTOR_BETA,
+                                                 limits=(p.cfg.MUSCLE_MIN_LENGTH, p.cfg.MUSCLE_MAX_LENGTH))
+            self.predictor = platforms[0].predictor
+            log.info("Core: muscle length predictor lead times %s", sim_config.PREDICTOR_LEAD_TIMES)
+        if getattr(self.cfg, "PAYLOAD_ESTIMATION", False) and self.cfg.MUSCLE_PRESSURE_MAPPING_FILE:
+            try:
+                self.payload_estimator = PayloadEstimator(self.cfg.PAYLOAD_PTOD_FILES, self.cfg.MUSCLE_MAX_LENGTH,
+                                                          self.cfg.PAYLOAD_WEIGHTS[1],
+                                                          (min(self.cfg.PAYLOAD_WEIGHTS), max(self.cfg.PAYLOAD_WEIGHTS)),
+                                                          self.cfg.PAYLOAD_ESTIMATE_INTERVAL,
+                                                          self.cfg.PAYLOAD_ESTIMATE_TIME_CONSTANT)
+                self.muscle_output.enable_poll_pressures(True)
+            except Exception as e:
+                self.handle_error(e, "Error loading payload estimation tables ")
+
+        log.info("Core: %s config data loaded", description)
+        self.simStatusChanged.emit("Config Loaded")
+
+    def new_motion_executor(self):
+        """ A MotionProfileExecutor stepped once per frame with the sim_config motion settings, for every move. """
+        return MotionProfileExecutor(self.data_period, sim_config.MOTION_PROFILE, sim_config.MOTION_MAX_VELOCITY,
+                                     sim_config.MOTION_MAX_ACCEL, sim_config.MOTION_JERK_TIME)
+
+    # --------------------------------------------------------------------------
+    # Simulation Management
+    # --------------------------------------------------------------------------
+    def load_sim(self):
+        """
+        Loads or re-loads a simulation by index from available_sims.
+        """
+        self.sim_name, self.sim_class, self.sim_image, self.sim_ip_address = sim_config.AVAILABLE_SIMS[sim_config.DEFAULT_SIM_INDEX]
+
+        try:
+            sim_adapter = load_adapter(self.sim_class)   # imported only now, see sims/sim_adapter.py
+            frame = None # this version does not allocate a UI frame
+            self.sim = sim_adapter(self.sleep_func, frame, self.emit_status, self.sim_ip_address )
+            if self.sim:
+                self.is_started = True
+                log.info("Core: Instantiated sim '%s' from class '%s'", self.sim.name, self.sim_class)
+
+            self.simStatusChanged.emit(f"Sim '{self.sim_name}' loaded.")
+            if hasattr(self.sim, "set_connection_state_callback"):
+                self.sim.set_connection_state_callback(self.on_connection_state_changed)
+                self.on_connection_state_changed(self.sim.get_connection_state())
+            else:
+                self.on_connection_state_changed(ConnectionState("ok", "ok", AircraftInfo(status="ok", name=self.sim.name)))
+            self.sim.set_default_address(self.sim_ip_address)
+            self.install_washout()
+            log.info(f"Core: Preparing to connect to {self.sim_name} at {self.sim_ip_address}")    
+        except Exception as e:
+            self.handle_error(e, f"Unable to load sim '{self.sim_class}'")
+
+    def install_washout(self):
+        """ Apply the sim's washout times and wash its transforms (through wash_telemetry) from the first frame. """
+        if self.dynam:
+            washout_times = self.sim.get_washout_config()
+            for idx in range(6):
+                self.dynam.set_washout(idx, washout_times[idx])
+        self.sim.set_washout_callback(self.wash_telemetry)
+
+    def connect_sim(self):
+        """
+        Connects to the loaded sim. 
+        """
+        if not self.sim:
+            self.simStatusChanged.emit("No sim loaded")
+            return
+
+        if not self.sim.is_Connected(): 
+            try:
+                self.sim.connect()
+                # self.simStatusChanged.emit("Sim connected")
+                self.state = "deactivated"  # default
+                # self.sim.run()
+
+            except Exception as e:
+                self.handle_error(e, "Error connecting sim")
+                self.sleep_func(1)
+
+    def on_connection_state_changed(self, connection_state):
+        """ Called by the sim when its status changes, never per frame. """
+        self.connection_state = connection_state
+        self.connectionStateChanged.emit(connection_state)
+
+    def wash_telemetry(self, telemetry):
+        """ Washout callback installed by load_sim, keeps the unwashed transform for the flight recorder. """
+        self.raw_transform = telemetry
+        if not self.dynam:
+            return telemetry
+        start = time.perf_counter()
+        washed = self.dynam.get_washed_telemetry(list(telemetry))
+        # called from inside sim.read(), so the washout is taken out of the sim_read interval
+        self.stage_timers.exclude("washout", time.perf_counter() - start)
+        return washed
+
+    # --------------------------------------------------------------------------
+    # Update Loop, called every data_period_ms by the runner
+    # --------------------------------------------------------------------------
+
+    def data_update(self):
+        frame_start = time.perf_counter()
+        frame_interval = frame_start - self.last_frame_time
+        self.last_frame_time = frame_start
+
+        if not self.is_started:
+            self.simStatusChanged.emit("Sim interface failed to start")
+            print("Sim interface failed to start")
+            return
+        self.stage_timers.start_frame()
+        self.e2e_latency = None
+        if self.is_pi and frame_start - self.last_temperature_read > self.TEMPERATURE_INTERVAL:
+            self.last_temperature_read = frame_start
+            self.read_temperature()
+
+        # a slow move or pressure ramp started on the muscle output owns the output until it completes
+        if self.muscle_output.step_move():
+            self.muscle_lengths = self.muscle_output.muscle_lengths
+            self.sim.service()
+            self.record_frame(frame_start, frame_interval)
+            return
+
+        # Handle any platform motion state (activation/deactivation transitions)
+        if self.handle_transition_step():
+            self.record_frame(frame_start, frame_interval)
+            return  # skip sim-driven control during transition
+
+        if self._block_sim_control or self.connection_state.aircraft_info.status != "ok" or self.state == 'deactivated':
+            transform = self.transform
+            self.sim.service()
+            self.stage_timers.mark("sim_read")
+        else:
+            transform = self.sim.read()
+            self.stage_timers.mark("sim_read")
+            if transform is None:
+                return
+            self.washed_transform = transform
+            np.multiply(transform, self.ui_gains, out=self.transform)
+            origin_time = self.sim.get_frame_origin_time() if hasattr(self.sim, "get_frame_origin_time") else None
+            self.move_platform(transform, origin_time)
+            # print("in data update", self.transform)
+        self.record_frame(frame_start, frame_interval)
+        self.stage_timers.mark("recorder")
+
+        # Publish latest values, the UI pulls them at its own refresh rate
+        self.latest_update = SimUpdate(
+            transform=tuple(self.transform),
+            muscle_lengths=tuple(self.muscle_lengths),
+            temperature=self.temperature,
+            processing_percent=self.processing_percent,
+            jitter_percent=self.jitter_percent
+        )
+        self.stage_timers.mark("publish")
+
+        # Performance monitoring
+        loop_duration = time.perf_counter() - frame_start
+        self.processing_percent = int((loop_duration / self.data_period) * 100)
+        self.jitter_percent = int(abs(frame_interval - self.data_period) / self.data_period * 100)
+        self.stage_timers.add("frame", loop_duration)
+        if sim_config.STAGE_TIMING_LOG_INTERVAL and frame_start - self.last_timing_log > sim_config.STAGE_TIMING_LOG_INTERVAL:
+            self.last_timing_log = frame_start
+            log.info("Core: %s", self.stage_timers.format_summary())
+            if self.platforms and len(self.platforms) > 1:
+                frame_ms = self.stage_timers.summary()["frame"][2]
+                log.info("Core: %d platforms, frame %.2f ms mean, %.2f ms per platform", len(self.platforms),
+                         frame_ms, frame_ms / len(self.platforms))
+
+    def get_stage_timing(self):
+        """ Returns {stage: (count, min, mean, p99, max)} in milliseconds for the recent frames. """
+        summary = self.stage_timers.summary()
+        if self.muscle_output and self.muscle_output.sender:
+            summary.update(self.muscle_output.sender.summary())
+        if self.platforms and len(self.platforms) > 1:
+            summary.update(self.platforms.summary())
+        return summary
+
+    def format_stage_timing(self):
+        """ Table of the stage timing statistics for tool tips and logs. """
+        return format_table(self.get_stage_timing())
+
+    def record_frame(self, frame_start, frame_interval):
+        """ Store this frame in the flight recorder (cheap, called every frame). """
+        self.flight_recorder.record(
+            time=time.perf_counter(),
+            frame_interval=frame_interval,
+            processing=time.perf_counter() - frame_start,
+            state=PLATFORM_STATES.index(self.state),
+            raw=self.raw_transform,
+            washed=self.washed_transform,
+            request=self.request,
+            muscle_lengths=self.muscle_lengths,
+            cmd_pressures=self.muscle_output.sent_pressures,
+            meas_pressures=self.muscle_output.festo.actual_pressures,
+            e2e_latency=self.e2e_latency
+        )
+
+    def dump_flight_recorder(self, reason="manual"):
+        """ Write the flight recorder contents to disk in the background, returns the file name. """
+        path = self.flight_recorder.dump(sim_config.FLIGHT_RECORDER_DIR, reason)
+        if path:
+            log.info("Core: flight recorder dump (%s) started: %s", reason, path)
+        return path
+
+
+    # following is used to drive slow moves on activation and deactivation
+    def handle_transition_step(self):
+        if self.platforms and len(self.platforms) > 1:
+            self.platforms.step_transitions(send=not self.virtual_only_mode)
+        if not self.transition_state:
+            return False
+
+        lengths = self.transition_motion.step()
+        if lengths is None:
+            ###  TODO need to echo transform outside of valid range 
+            final_percent = 100 if self.transition_state == "activating" else 0
+            self.update_activate_transition(final_percent, self.muscle_lengths)
+            self.transition_state = None
+            self._block_sim_control = False
+            return False
+
+        self.muscle_lengths = lengths.tolist()
+        if not self.virtual_only_mode:
+            self.muscle_output.set_muscle_lengths(self.muscle_lengths)
+
+        final_percent = 100 if self.transition_state == "activating" else 0
+        start_percent = self.transition_start_percent
+        self.transition_percent = int(start_percent + (final_percent - start_percent) * self.transition_motion.progress)
+        self.update_activate_transition(self.transition_percent, self.muscle_lengths)
+        return True
+
+
+    def start_transition(self, mode: str, end_lengths: list):
+        """ Start the activation or deactivation move, a move already in progress is redirected to end_lengths. """
+        if self.predictor:
+            self.predictor.reset()   # velocity estimate is stale once sim control resumes
+        if self.transition_state and self.transition_motion.active:
+            self.transition_motion.retarget(end_lengths)
+            self.transition_start_percent = self.transition_percent  # progress continues from where it was
+            log.info(f"[Transition] {self.transition_state} redirected to {mode}, ending at {end_lengths}")
+        else:
+            start_lengths = self.cfg.DEACTIVATED_MUSCLE_LENGTHS if mode == "activating" else self.muscle_lengths
+            self.transition_motion.start(start_lengths, end_lengths)
+            self.transition_start_percent = 0 if mode == "activating" else 100
+            log.info(f"[Init Transition] {mode}: {len(self.transition_motion.path)} steps from {start_lengths} to {end_lengths}")
+        self.transition_state = mode
+        self._block_sim_control = True
+
+
+    def activate_platform(self):
+        log.debug("Core: activating platform")
+        self._requested_motion_state = "activating"
+
+    def deactivate_platform(self):
+        log.debug("Core: deactivating platform")
+        self._requested_motion_state = "deactivating"
+        
+    def echo(self, transform, distances, pose):
+        """ Hand the frame to the echo sender, which sends it to the digital twin at its own rate. """
+        self.echo_sender.publish(transform, distances, pose)
+
+    def update_activate_transition(self, percent,  muscle_lengths=None):
+        """
+        Emits activation progress including muscle lengths.
+        If muscle_lengths not provided, falls back to current physical state.
+        """
+        if muscle_lengths is None:
+            muscle_lengths = self.muscle_lengths
+
+        self.activationLevelUpdated.emit(ActivationTransition(
+            activation_percent = percent,
+            muscle_lengths=tuple(muscle_lengths)
+        ))
+
+      
+    def update_gain(self, index, value):
+        """
+        Updates the gain based on the slider change.
+        """
+        if index == 6:  # index 6 corresponds to the master gain
+            self.master_gain = value *.01
+        else:
+            self.gains[index] = value *.01
+        self.update_conditioning()
+
+    def update_conditioning(self):
+        """ Rebuild the transform conditioning matrix after a gain, intensity or config change. """
+        if self.dynam is None:
+            return  # built when the config is loaded
+        self.ui_gains = np.asarray(self.gains) * self.master_gain * self.intensity_percent / 100.0
+        self.conditioner.build(self.gains, self.master_gain, self.intensity_percent, self.invert_axis,
+                               self.dynam.gains, self.dynam.master_gain, self.dynam.range, self.swap_roll_pitch)
+        if self.platforms:
+            self.platforms.update_conditioning(self.gains, self.master_gain, self.intensity_percent,
+                                               self.dynam.gains, self.dynam.master_gain, self.conditioner)
+        
+    def intensityChanged(self, percent):
+        if self.is_started:
+            self.intensity_percent = percent
+            self.update_conditioning()
+            log.debug(f"Core: intensity set to {percent}%")
+        
+    def loadLevelChanged(self, load_level):
+        if self.is_started:
+            if load_level>=0 and load_level <=2:   
+                load = self.payload_weights[load_level]     
+                self.DtoP.set_load(load)            
+                log.info(f"load level changed to {load_level},({load})kg per muscle, {load*6}kg total inc platform")
+                if self.payload_estimator:
+                    # the selected level is the starting point, estimation continues from there
+                    self.payload_estimator.reset(self.cfg.PAYLOAD_WEIGHTS[load_level])
+
+    def platformLoadLevelChanged(self, platform_index, load_level):
+        """ Load level of one of the rigs, platform 0 is the one loadLevelChanged sets. """
+        if platform_index == 0:
+            self.loadLevelChanged(load_level)
+        elif self.is_started and 0 <= load_level <= 2:
+            self.platforms[platform_index].set_load_level(load_level)
+
+    def set_payload(self, payload_kg):
+        """ Set the d_to_p load for a rider payload in kg (estimated or selected). """
+        load = (payload_kg + self.cfg.UNLOADED_PLATFORM_WEIGHT) / 6
+        self.DtoP.set_load(load)
+        log.debug(f"Core: payload {payload_kg:.1f}kg, {load:.1f}kg per muscle")
+
+    def modeChanged(self, mode_id):
+        """
+        Handles mode changes and ensures it is sent to X-Plane.
+        """
+        if self.sim:
+            self.current_mode = mode_id
+            log.debug(f"Flight mode changed to {mode_id}")
+            self.sim.set_flight_mode(self.current_mode)
+
+    def pause_sim(self):
+        """ Pause the sim without changing the platform state (used by the UI on activate/deactivate). """
+        if self.sim:
+            self.sim.pause()
+
+    def assistLevelChanged(self, pilotAssistLevel):
+        """
+        Handles assist level changes and ensures it is sent to X-Plane.
+        """
+        if self.sim:
+            self.current_pilot_assist_level = pilotAssistLevel
+            log.debug(f"Pilot assist level changed to {pilotAssistLevel}")
+            self.sim.set_pilot_assist(self.current_pilot_assist_level)
+
+    # --------------------------------------------------------------------------
+    # Platform Movement
+    # --------------------------------------------------------------------------
+    def move_platform(self, transform, origin_time=None):
+        """
+        Convert the normalized sim transform to muscle moves, gains are applied here.
+        origin_time is the time.time() the sim sampled the transform, if known.
+        """
+        if self.state == "deactivated":
+            return
+        if len(self.platforms) > 1:
+            return self.move_platforms(transform, origin_time)
+        request = self.conditioner.apply(transform)
+        self.request = request
+        self.stage_timers.mark("regulate")
+
+        muscle_lengths = self.k.muscle_lengths(request)
+        self.stage_timers.mark("kinematics")
+        if self.predictor:
+            muscle_lengths = self.predictor.update(muscle_lengths).tolist()
+            self.stage_timers.mark("predict")
+        if not all(x == y for x, y in zip(muscle_lengths, self.muscle_lengths)):
+            # print(f"Muscle Lengths: {muscle_lengths}")
+            self.muscle_lengths = muscle_lengths
+        #self.muscle_lengths = self.k.muscle_lengths(request)
+        
+        # output actuator command (physical platform) only if enabled
+        if not self.virtual_only_mode:
+            self.muscle_output.set_muscle_lengths(self.muscle_lengths, origin_time)
+            self.e2e_latency = self.muscle_output.e2e_latency
+            if self.payload_estimator and self.state == "running":
+                payload = self.payload_estimator.update(self.muscle_lengths, self.muscle_output.festo.get_pressure())
+                if payload is not None:
+                    self.set_payload(payload)
+
+        # Always echo to Unity for digital twin sync
+        pose = self.k.get_pose()
+        self.echo(request, self.muscle_lengths, pose)
+        self.stage_timers.mark("echo")
+
+        return self.muscle_lengths
+
+    def move_platforms(self, transform, origin_time=None):
+        """ move_platform for several rigs: conditioning, kinematics and d_to_p batched, sends in parallel. """
+        rigs = self.platforms
+        rigs.start_frame()
+        requests = rigs.condition(transform)
+        self.request = requests[0]
+        self.stage_timers.mark("regulate")
+
+        lengths = rigs.kinematics(requests)
+        self.stage_timers.mark("kinematics")
+        if self.predictor:
+            lengths = np.array([p.predictor.update(row) for p, row in zip(rigs, lengths)])
+            self.stage_timers.mark("predict")
+        self.muscle_lengths = lengths[0].tolist()
+
+        if not self.virtual_only_mode:
+            pressures = rigs.pressures(lengths)
+            self.stage_timers.mark("d_to_p")
+            rigs.send(lengths, pressures, origin_time)
+            self.stage_timers.mark("festo_send")
+            self.e2e_latency = self.muscle_output.e2e_latency
+            if self.e2e_latency is not None:
+                self.stage_timers.add("end_to_end", self.e2e_latency)
+            if self.payload_estimator and self.state == "running":
+                payload = self.payload_estimator.update(self.muscle_lengths, self.muscle_output.festo.get_pressure())
+                if payload is not None:
+                    self.set_payload(payload)
+        else:
+            rigs.set_lengths(lengths)
+
+        self.echo(self.request, self.muscle_lengths, self.k.get_pose())
+        self.stage_timers.mark("echo")
+        return self.muscle_lengths
+        
+    # --------------------------------------------------------------------------
+    # Platform State Machine 
+    # --------------------------------------------------------------------------
+     
+    def update_state(self, new_state):
+        """
+        Valid transitions:
+        - Disabled → Enabled (only)
+        - Enabled → Running, Paused, Disabled
+        - Running → Paused, Disabled
+        - Paused → Running, Disabled
+        """
+
+        if new_state == self.state:
+            return  # No change needed
+        
+        # Enforce allowed transitions
+        valid_transitions = {
+            "initialized": ["deactivated"],  
+            "deactivated": ["enabled"],
+            "enabled": ["running", "paused", "deactivated"],
+            "running": ["paused", "deactivated"],
+            "paused": ["running", "deactivated"]
+        }
+        
+        if new_state not in valid_transitions.get(self.state, []):
+            log.warning("Invalid transition: %s → %s", self.state, new_state)
+            return  # Invalid transition
+        if new_state == "enabled" and self.muscle_output.sweep:
+            log.warning("Core: not activating during a calibration sweep")
+            return
+
+        old_state = self.state
+        self.state = new_state
+        log.debug("Core: Platform state changed from %s to %s", old_state, new_state)
+        self.platformStateChanged.emit(self.state)
+
+        # Handle transitions
+        if new_state == 'enabled':
+            transform = self.sim.read()
+            if transform is None:
+                # no frame yet, activate to the neutral pose so sim control never starts without a slow move
+                transform = [0] * 6
+            end_lengths = self.k.muscle_lengths(self.conditioner.apply(transform))
+            self.start_transition("activating", end_lengths)
+            self.platforms.start_transitions("activating", transform)
+        elif new_state == 'deactivated':
+            if old_state != "initialized":
+                self.dump_flight_recorder("deactivated")
+            self.start_transition("deactivating", self.cfg.DEACTIVATED_MUSCLE_LENGTHS)
+            self.platforms.start_transitions("deactivating")
+        elif new_state == 'running':
+            self.sim.run()
+        elif new_state == 'paused':
+            self.sim.pause()
+
+    def start_calibration(self, length_source, load, **sweep_args):
+        """
+        Sweep the pressures for the load on the platform to calibrate d_to_p (output/calibration.py).
+        Only while deactivated; data_update steps the sweep and sends nothing else until it is done.
+        """
+        if self.state not in ("initialized", "deactivated") or self.transition_state:
+            log.warning("Core: calibration needs the platform deactivated, state is %s", self.state)
+            return False
+        self.muscle_output.start_calibration(length_source, load, **sweep_args)
+        return True
+
+    def write_calibration(self, csv_path="output/calibrated_DtoP.csv"):
+        """ Fit the calibration sweeps done so far and write the d_to_p table. """
+        return self.muscle_output.write_calibration(csv_path)
+
+    def read_temperature(self):
+        """Read CPU temperature on Raspberry Pi if available."""
+        try:
+            with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
+                raw = f.readline().strip()
+                self.temperature = round(int(raw) / 1000.0, 1)
+        except Exception as e:
+            log.warning(f"Failed to read temperature: {e}")
+            self.temperature = None
+
+
+    # --------------------------------------------------------------------------
+    # Error Handling
+    # --------------------------------------------------------------------------
+    def handle_error(self, exc, context=""):
+        msg = f"{context} - {exc}"
+        log.error(msg)
+        log.error(traceback.format_exc())
+        self.dump_flight_recorder("error")
+        self.fatal_error.emit(msg)
+        self.simStatusChanged.emit(msg)
+
+    def emit_status(self, status):
+        self.simStatusChanged.emit(status)
+
+    # --------------------------------------------------------------------------
+    # Additional methods: slow_move, echo, remote controls, etc. 
+    # (Omitted here for brevity but you can copy them in full from original code.)
+    # --------------------------------------------------------------------------
+
+    def cleanup_on_exit(self):
+        print("cleaning up")
+        if self.sim:
+            try:
+                self.sim.fin()   # releases the sim's sockets and shared memory (telemetry hub)
+            except Exception as e:
+                log.warning("Core: error closing sim '%s': %s", self.sim_name, e)
+        if self.platforms:
+            self.platforms.close()
+        if self.echo_sender:
+            self.echo_sender.stop()
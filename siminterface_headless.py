@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+ siminterface_headless.py
+
+ Runs the motion core without Qt or a display, for servers, soak and load tests,
+ CI and display-less Pi installs.
+
+ HeadlessRunner calls core.data_update at the core's data_period_ms using absolute
+ deadlines, so a late frame does not delay the following ones; if a frame overruns
+ its deadline the schedule is restarted from the current time rather than bursting
+ to catch up (the same as a QTimer). run() blocks, start() runs it in a thread.
+
+ The role of the UI in the state machine (moving from 'initialized' to
+ 'deactivated', and optionally activating and running) is taken by the runner.
+ platformStateChanged is emitted from inside core.update_state, so the next state is
+ queued and requested from the run loop; activation waits until the sim reports its
+ connection, data and aircraft status ok, so the activation move starts from live telemetry.
+
+ usage: python siminterface_headless.py [--rate HZ] [--duration SECONDS] [--activate] [--virtual] [--dump]
+"""
+
+import sys
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+
+from siminterface_core import SimInterfaceCore
+
+log = logging.getLogger(__name__)
+
+
+class HeadlessRunner(object):
+    def __init__(self, core, activate=False):
+        self.core = core
+        self.activate = activate
+        self.frames = 0
+        self.overruns = 0     # frames that started after the next frame was due
+        self.last_status = None
+        self.state_requests = deque()   # platform states to request from the run loop
+        self._stop = threading.Event()
+        self._thread = None
+        core.platformStateChanged.connect(self.on_platform_state_changed)
+        core.simStatusChanged.connect(self.on_sim_status_changed)
+        core.fatal_error.connect(self.on_fatal_error)
+
+    def on_platform_state_changed(self, state):
+        log.info("Headless: platform state is now '%s'", state)
+        if state == "initialized":
+            self.state_requests.append("deactivated")
+        elif state == "deactivated" and self.activate:
+            self.state_requests.append("enabled")
+        elif state == "enabled" and self.activate:
+            self.state_requests.append("running")
+
+    def sim_ready(self):
+        state = self.core.connection_state
+        return state.conn_status == state.data_status == state.aircraft_info.status == "ok"
+
+    def request_states(self):
+        """ Request the queued platform states, activation waits until the sim is ready. """
+        while self.state_requests:
+            if self.state_requests[0] == "enabled" and not self.sim_ready():
+                return
+            self.core.update_state(self.state_requests.popleft())
+
+    def on_sim_status_changed(self, status):
+        # only log changes, some sims repeat their status
+        if status != self.last_status:
+            self.last_status = status
+            log.info("Headless: %s", status)
+
+    def on_fatal_error(self, msg):
+        log.error("Headless: fatal error, stopping: %s", msg)
+        self.stop()
+
+    def run(self, duration=None):
+        """ Call data_update every data_period until stop() or for duration seconds. """
+        period = self.core.data_period
+        next_frame = time.perf_counter()
+        end_time = next_frame + duration if duration else None
+        while not self._stop.is_set():
+            delay = next_frame - time.perf_counter()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            if end_time and time.perf_counter() >= end_time:
+                break
+            self.update()
+            self.frames += 1
+            next_frame += period
+            now = time.perf_counter()
+            if now > next_frame:
+                self.overruns += 1
+                next_frame = now
+
+    def update(self):
+        """ Called once per frame, subclasses extend this to exchange data with other processes. """
+        self.request_states()
+        self.core.data_update()
+
+    def start(self, duration=None):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(duration,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+def man():
+    parser = argparse.ArgumentParser(description='Run the sim interface core without a user interface')
+    parser.add_argument("-r", "--rate", type=float, default=20.0,
+                        help="control loop rate in Hz (default 20)")
+    parser.add_argument("-d", "--duration", type=float, default=0,
+                        help="seconds to run, 0 runs until Ctrl+C")
+    parser.add_argument("-a", "--activate", action="store_true",
+                        help="activate the platform and start the sim once connected")
+    parser.add_argument("-v", "--virtual", action="store_true",
+                        help="virtual only, no pressures are sent to the Festo")
+    parser.add_argument("--dump", action="store_true",
+                        help="write the flight recorder to disk on exit")
+    return parser
+
+
+if __name__ == "__main__":
+    args = man().parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        datefmt="%H:%M:%S")
+
+    core = SimInterfaceCore(sleep_func=time.sleep, data_period_ms=1000.0 / args.rate)
+    core.virtual_only_mode = args.virtual
+    runner = HeadlessRunner(core, activate=args.activate)
+    core.setup()
+    if not core.is_started:
+        log.error("Headless: core failed to start")
+        sys.exit(1)
+
+    log.info("Headless: running at %.1f Hz%s", args.rate,
+             f" for {args.duration:.0f} seconds" if args.duration else ", Ctrl+C to stop")
+    start = time.perf_counter()
+    try:
+        runner.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"{runner.frames} frames in {elapsed:.1f} s ({runner.frames / elapsed:.1f} Hz), "
+          f"{runner.overruns} overruns")
+    print(core.format_stage_timing())
+    if args.dump:
+        core.dump_flight_recorder("headless")
+        core.flight_recorder.wait()
+    core.cleanup_on_exit()
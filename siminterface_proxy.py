@@ -0,0 +1,193 @@
+"""
+ siminterface_proxy.py
+
+ Stands in for SimInterfaceCore in the UI process when the motion pipeline runs in the
+ control process (siminterface_control.py), so MainWindow works unchanged with either.
+
+ Method calls are sent to the control process on the command ring, state is read from
+ the shared state block, and events from the control process are re-emitted on local
+ Signals when data_update is called (by the QtRunner, every data_period_ms).
+"""
+
+import os
+import sys
+import time
+import math
+import logging
+import subprocess
+
+import sim_config
+from common.signals import Signal
+from common.shared_state import SharedState, STATUS_CODES
+from common.stage_timer import format_table
+from common.flight_recorder import PLATFORM_STATES
+from sims.shared_types import SimUpdate, AircraftInfo, ActivationTransition, ConnectionState
+
+log = logging.getLogger(__name__)
+
+
+def start_control_process():
+    """ Start the control process detached from this one so it survives the UI exiting. """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "siminterface_control.py")
+    log_file = open(sim_config.CONTROL_PROCESS_LOG, "a")
+    kwargs = {"start_new_session": True} if os.name == "posix" else {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    subprocess.Popen([sys.executable, script], stdout=log_file, stderr=subprocess.STDOUT,
+                     cwd=os.path.dirname(script), **kwargs)
+    log_file.close()
+    log.info("Proxy: started control process, output in %s", sim_config.CONTROL_PROCESS_LOG)
+
+
+def attach_or_start(timeout=15.0):
+    """ Attach to a running control process, starting one if there is none. """
+    try:
+        shared = SharedState.attach()
+        if shared.control_alive():
+            log.info("Proxy: attached to running control process")
+            return shared
+        shared.close()  # left by a process that exited, the new one replaces it
+    except FileNotFoundError:
+        pass
+    start_control_process()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(0.1)
+        try:
+            shared = SharedState.attach()
+            if shared.control_alive():
+                return shared
+            shared.close()
+        except FileNotFoundError:
+            pass
+    raise RuntimeError(f"Control process did not start, see {sim_config.CONTROL_PROCESS_LOG}")
+
+
+class CoreProxy(object):
+    def __init__(self, shared):
+        self.shared = shared
+        self.simStatusChanged = Signal(str)
+        self.fatal_error = Signal(str)
+        self.logMessage = Signal(str)
+        self.activationLevelUpdated = Signal(object)
+        self.platformStateChanged = Signal(str)
+        self.connectionStateChanged = Signal(object)
+
+        self.is_started = True
+        self.data_period_ms = 20      # event servicing, see data_update
+        self.control_lost = False
+        self._frame = None            # frame number of the cached SimUpdate
+        self._update = None
+        shared.events.discard()       # events queued for a previous UI are stale
+
+    @classmethod
+    def connect(cls):
+        return cls(attach_or_start())
+
+    def setup(self):
+        """ Bring the UI up to date with the control process, in place of the core's setup. """
+        state = self.shared.read()
+        if state is not None:
+            self.platformStateChanged.emit(PLATFORM_STATES[int(state["platform_state"])])
+            percent = int(state["activation_percent"])
+            self.activationLevelUpdated.emit(ActivationTransition(percent, tuple(state["muscle_lengths"])))
+            self.connectionStateChanged.emit(ConnectionState(
+                STATUS_CODES[int(state["conn_status"])], STATUS_CODES[int(state["data_status"])],
+                AircraftInfo(status=STATUS_CODES[int(state["aircraft_status"])], name=state["aircraft_name"].decode())))
+
+    def data_update(self):
+        """ Called periodically by the front end: heartbeat to the control process and dispatch its events. """
+        self.shared.ui_heartbeat[0] = time.time()
+        while True:
+            event = self.shared.events.get()
+            if event is None:
+                break
+            name, args = event[0], event[1:]
+            if name == "activationLevelUpdated":
+                self.activationLevelUpdated.emit(ActivationTransition(args[0], tuple(args[1])))
+            elif name == "connectionStateChanged":
+                self.connectionStateChanged.emit(ConnectionState(args[0], args[1], AircraftInfo(status=args[2], name=args[3])))
+            else:
+                getattr(self, name).emit(*args)
+        alive = self.shared.control_alive()
+        if not alive and not self.control_lost:
+            log.error("Proxy: control process not responding")
+            self.simStatusChanged.emit("Control process not responding")
+        self.control_lost = not alive
+
+    def _send(self, *command):
+        if not self.shared.commands.put(list(command)):
+            log.warning("Proxy: command ring full, %s dropped", command[0])
+
+    # commands, see siminterface_control.COMMANDS
+    def update_state(self, new_state):
+        self._send("update_state", new_state)
+
+    def update_gain(self, index, value):
+        self._send("update_gain", index, value)
+
+    def intensityChanged(self, percent):
+        self._send("intensityChanged", percent)
+
+    def loadLevelChanged(self, load_level):
+        self._send("loadLevelChanged", load_level)
+
+    def modeChanged(self, mode_id):
+        self._send("modeChanged", mode_id)
+
+    def assistLevelChanged(self, pilotAssistLevel):
+        self._send("assistLevelChanged", pilotAssistLevel)
+
+    def pause_sim(self):
+        self._send("pause_sim")
+
+    def dump_flight_recorder(self, reason="manual"):
+        """ The control process writes the file and reports its name as a status message. """
+        self._send("dump_flight_recorder", reason)
+        return None
+
+    def stop_control_process(self):
+        """ Deactivate the platform and end the control process. """
+        self._send("shutdown")
+
+    # state
+    @property
+    def latest_update(self):
+        state = self.shared.read()
+        if state is None or int(state["frame"]) == self._frame:
+            return self._update
+        self._frame = int(state["frame"])
+        temperature = float(state["temperature"])
+        self._update = SimUpdate(
+            transform=tuple(state["transform"]),
+            muscle_lengths=tuple(state["muscle_lengths"]),
+            temperature=None if math.isnan(temperature) else temperature,
+            processing_percent=int(state["processing_percent"]),
+            jitter_percent=int(state["jitter_percent"])
+        )
+        return self._update
+
+    def get_stage_timing(self):
+        state = self.shared.read()   # names and rows from the same write
+        if state is None:
+            return {}
+        names = [n.decode() for n in state["stage_names"][:int(state["nbr_stages"])]]
+        return {name: tuple(row) for name, row in zip(names, state["timing"])}
+
+    def format_stage_timing(self):
+        return format_table(self.get_stage_timing())
+
+    @property
+    def local_ip(self):
+        return self.shared.get("local_ip").decode()
+
+    @property
+    def sim_ip_address(self):
+        return self.shared.get("sim_ip").decode()
+
+    @property
+    def FESTO_IP(self):
+        return self.shared.get("festo_ip").decode()
+
+    def cleanup_on_exit(self):
+        """ Detach from the control process, which keeps running. """
+        log.info("Proxy: UI exiting, control process continues")
+        self.shared.close()
@@ -1,4 +1,5 @@
 import os
+import time
 import platform
 import logging
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
@@ -7,6 +8,7 @@ from typing import NamedTuple
 from switch_ui_controller import SwitchUIController
 from sims.shared_types import SimUpdate, AircraftInfo, ActivationTransition
 from ui_widgets import ActivationButton, ButtonGroupHelper,  FatalErrDialog
+import sim_config
 
 log = logging.getLogger(__name__)
 
@@ -31,6 +33,9 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.setupUi(self)
         self.state = None
         self.MAX_ACTUATOR_RANGE = 100
+        self.last_stage_timing_update = 0
+        self.last_update = None  # SimUpdate most recently shown
+        self.shown = {}          # last value written to each group of widgets, see changed()
         self.activation_percent = 0 # steps between 0 and 100 in slow moves when activated/deactivated  
 
         # Replace chk_activate with ActivationButton
@@ -66,13 +71,17 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.switch_controller.validActivateReceived.connect(self.on_valid_activate_received)
         self.switch_controller.activate_switch_invalid.connect(self.show_activate_warning_dialog)
 
+        # the UI pulls the latest values from the core at its own rate
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_ui)
+        self.set_refresh_rate(sim_config.UI_REFRESH_HZ)
 
     def connect_signals(self):
         self.core.simStatusChanged.connect(self.on_sim_status_changed)
         self.core.fatal_error.connect(self.on_fatal_error)
-        self.core.dataUpdated.connect(self.on_data_updated)
         self.core.activationLevelUpdated.connect(self.on_activation_transition)
         self.core.platformStateChanged.connect(self.on_platform_state_changed)
+        self.core.connectionStateChanged.connect(self.on_connection_state_changed)
         self.btn_fly.clicked.connect(self.on_btn_fly_clicked)
         self.btn_pause.clicked.connect(self.on_btn_pause_clicked)
         self.chk_activate.clicked.connect(self.on_activate_toggled)
@@ -280,9 +289,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.inform_button_selections()
 
             #  Ensure X-Plane is paused after scenario load
-            if self.core.sim:
-                logging.info("DEBUG: Pausing X-Plane after scenario load.")
-                self.core.sim.pause()
+            logging.info("DEBUG: Pausing X-Plane after scenario load.")
+            self.core.pause_sim()
 
             #  Enable Pause and Fly buttons
             self.btn_fly.setEnabled(True)
@@ -294,9 +302,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.core.update_state("deactivated")
 
             #  Pause X-Plane when deactivated
-            if self.core.sim:
-                logging.info("DEBUG: Pausing X-Plane due to deactivation.")
-                self.core.sim.pause()
+            logging.info("DEBUG: Pausing X-Plane due to deactivation.")
+            self.core.pause_sim()
 
             #  Disable Pause and Fly buttons (unless override is enabled)
             self.btn_fly.setEnabled(False)
@@ -578,6 +585,17 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.ln_jitter.update()
 
     
+    def show_stage_timing(self):
+        """ Once a second show p99 time of each pipeline stage, full statistics are in the tool tip. """
+        now = time.monotonic()
+        if now - self.last_stage_timing_update < 1.0 or not hasattr(self, "lbl_stage_timing"):
+            return
+        self.last_stage_timing_update = now
+        timing = self.core.get_stage_timing()
+        text = "  ".join(f"{name} {p99:.2f}" for name, (n, lo, mean, p99, hi) in timing.items() if n)
+        self.lbl_stage_timing.setText("p99 ms: " + text)
+        self.lbl_stage_timing.setToolTip("<pre>" + self.core.format_stage_timing() + "</pre>")
+
     # --------------------------------------------------------------------------
     # Core Callbacks / Slots
     # These are connected to Qt signals or used by core.
@@ -587,6 +605,13 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     def on_sim_status_changed(self, status_msg):
         self.lbl_sim_status.setText(status_msg)
 
+    def on_connection_state_changed(self, state):
+        """ Status icons, pushed by the core only when the connection, data or aircraft status changes. """
+        self.apply_icon(self.ico_connection, state.conn_status)
+        self.apply_icon(self.ico_data, state.data_status)
+        self.apply_icon(self.ico_aircraft, state.aircraft_info.status)
+        self.lbl_aircraft.setText(state.aircraft_info.name)
+
     @QtCore.pyqtSlot(ActivationTransition)
     def on_activation_transition(self, transition: ActivationTransition):
         # Update activation fill on the button
@@ -601,46 +626,57 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
        
 
-    @QtCore.pyqtSlot(object)
-    def on_data_updated(self, update):
-        """
-        Called every time the core's data_update fires (every 50 ms if running).
-        Also polls the serial reader for new switch states.
+    def set_refresh_rate(self, hz):
+        """ Set how many times a second the UI pulls and shows the core's latest values. """
+        self.refresh_timer.start(max(1, int(1000 / hz)))
 
-        Args:
-            update (SimUpdate): A namedtuple containing all update info
+    def changed(self, key, value):
+        """ True if value differs from the one last shown in the widgets identified by key. """
+        if self.shown.get(key) == value:
+            return False
+        self.shown[key] = value
+        return True
+
+    def refresh_ui(self):
+        """
+        Called by the refresh timer, shows the core's most recent SimUpdate.
+        Frames published between refreshes are skipped and widgets are only
+        touched when the value they show has changed.
         """
-        self.switch_controller.poll()
+        update = self.core.latest_update
+        if update is None or update is self.last_update:
+            return
+        self.last_update = update
 
         tab_index = self.tabWidget.currentIndex()
         current_tab = self.tabWidget.widget(tab_index).objectName()
 
         if current_tab == 'tab_main':
-            xform = (-1, -.5, 0, .25, .5, 1)
-            for idx in range(6):
+            if self.changed("transform_blocks", update.transform):
                 self.update_transform_blocks(update.transform)
         else: 
-            self.txt_this_ip.setText(self.core.local_ip)
-            self.txt_xplane_ip.setText(self.core.sim_ip_address)
-            self.txt_festo_ip.setText(self.core.FESTO_IP)
+            if self.changed("ip_addresses", (self.core.local_ip, self.core.sim_ip_address, self.core.FESTO_IP)):
+                self.txt_this_ip.setText(self.core.local_ip)
+                self.txt_xplane_ip.setText(self.core.sim_ip_address)
+                self.txt_festo_ip.setText(self.core.FESTO_IP)
             if not self.cb_supress_graphics.isChecked():   
-                self.show_transform(update.transform)
-                self.show_muscles(update.muscle_lengths)
+                if self.changed("transform_views", update.transform):
+                    self.show_transform(update.transform)
+                if self.changed("muscles", update.muscle_lengths):
+                    self.show_muscles(update.muscle_lengths)
             # Update performance metrics
-            if hasattr(update, "processing_percent") and hasattr(update, "jitter_percent"):
+            if self.changed("performance", (update.processing_percent, update.jitter_percent)):
                 self.show_performance_bars(update.processing_percent, update.jitter_percent)
+            self.show_stage_timing()
 
-        self.apply_icon(self.ico_connection, update.conn_status)
-        self.apply_icon(self.ico_data, update.data_status)
-        self.apply_icon(self.ico_aircraft, update.aircraft_info.status)
-        self.lbl_aircraft.setText(update.aircraft_info.name)
- 
         # Static status icons (placeholders)
-        self.apply_icon(self.ico_left_dock, "ok")
-        self.apply_icon(self.ico_right_dock, "ok")
-        self.apply_icon(self.ico_wheelchair_docked, "ok")
+        if self.changed("docks", "ok"):
+            self.apply_icon(self.ico_left_dock, "ok")
+            self.apply_icon(self.ico_right_dock, "ok")
+            self.apply_icon(self.ico_wheelchair_docked, "ok")
 
-        self.update_temperature_display(update.temperature)
+        if self.changed("temperature", update.temperature):
+            self.update_temperature_display(update.temperature)
 
 
     @QtCore.pyqtSlot(str)
@@ -713,6 +749,10 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         #     self.close()
         if event.modifiers() == QtCore.Qt.ControlModifier and event.key() == QtCore.Qt.Key_Q:  # Ctrl+Q
             self.close()
+        elif event.modifiers() == QtCore.Qt.ControlModifier and event.key() == QtCore.Qt.Key_D:  # Ctrl+D
+            path = self.core.dump_flight_recorder()
+            if path:
+                self.status_message(f"Flight recorder saved to {path}")
         elif event.key() == QtCore.Qt.Key_W:
             self.showNormal()  # Exit fullscreen and show windowed mode    
 
@@ -4,7 +4,6 @@ import sys
 import os
 import time
 
-from multiprocessing import Process, Queue
 import traceback
 
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
@@ -17,23 +16,31 @@ slider_increments = (5)*6  # todo for slow moves
 import logging
 log = logging.getLogger(__name__)
 
-global_queue = Queue()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.shm_ring import FrameRing
+from sims.sim_adapter import SimAdapter
+from sims.shared_types import AircraftInfo
 
-class Sim():
-    def __init__(self, sleep_func, frame, report_state_cb):
-        self.frame = frame
-        self.report_state_cb = report_state_cb
-        self.is_connected = False
-        self.name = "Test Sim"
-        global global_queue
-        self.data_Q = global_queue
+# the TestSim UI puts transforms into this ring, Sim.read takes the newest
+TEST_SIM_RING = "simopconsole_testsim"
+
+class Sim(SimAdapter):
+    name = "Test Sim"
+
+    def __init__(self, sleep_func, frame, report_state_cb, sim_ip=None):
+        super().__init__(sleep_func, frame, report_state_cb, sim_ip)
+        self.connected = False
+        self.ring = FrameRing.create(TEST_SIM_RING, width=6)
         self.sim = None
-        self.washout_callback = None
+        self.connect()   # the ring is the connection, transforms from the UI are read once it exists
 
     def __del__(self):
         if self.sim:
             self.sim = None
             print("exiting TestSIm")
+        if self.ring:
+            self.ring.close()
+            self.ring = None
     
     def set_norm_factors(self, norm_factors):
         # values for each element that when multiplied will normalize data to a range of +- 1 
@@ -48,11 +55,12 @@ class Sim():
         self.connect()
 
     def connect(self, server_addr=None):
-        self.is_connected = True
+        self.connected = True
         self.report_state_cb('Test sim is ready')
+        self.set_connection_state("ok", "ok", AircraftInfo(status="ok", name=self.name))
 
-    def is_connected(self):
-        return self.is_connected         
+    def is_Connected(self):
+        return self.connected
 
     def run(self):
         print("run")  
@@ -60,22 +68,14 @@ class Sim():
     def pause(self):
         print("pause")  
         
-    def read(self):
-        while self.data_Q.qsize() > 1:
-            ignored = self.data_Q.get()
-            if ignored == 'exit':
-                sys.exit()
-        if self.data_Q.qsize() > 0:
-            transform = self.data_Q.get()
-            if transform == 'exit':
+    def service(self, washout_callback=None):
+        # newest transform since the last read, frames put in between are skipped
+        transform = self.ring.latest()
+        if transform is None:
+            if self.ring.is_closed():
                 sys.exit()
-            if transform is not None:
-                return transform 
-    def get_washout_config(self):
-        return [0,0,0,0,0,0]
-        
-    def set_washout_callback(self, callback):
-        pass
+            return None
+        return washout_callback(list(transform)) if washout_callback else transform
 
 class Dof_Oscilate():
     # oscilates platform in a given DoF
@@ -135,9 +135,8 @@ class Dof_Oscilate():
 class TestSim(object):
     def __init__(self, frame_rate=0.05):
         self.frame_rate = frame_rate
-     
-        global global_queue
-        self.data_Q = global_queue
+
+        self.ring = FrameRing.attach(TEST_SIM_RING)
         self.timer_data_update = None
         self.is_ready = False # True when platform config is loaded
         self.time_interval = DATA_PERIOD / 1000.0
@@ -155,7 +154,7 @@ class TestSim(object):
         self.dof_oscilate = Dof_Oscilate(self.frame_rate, self.ui.sld_lag.value)
     
     def closeEvent(self, event):
-       self.data_Q.put("exit")
+       self.ring.mark_closed()
     
     def configure_timers(self, frame):
         self.timer_data_update = QtCore.QTimer(frame) 
@@ -211,8 +210,8 @@ class TestSim(object):
                 for i in range(len(self.transfrm_sliders)):
                     self.transfrm_sliders[i].setValue( int(mouse_xform[i] * 100))
             transform = [x * .01 for x in self.lagged_slider_values]
-        if self.data_Q:
-            self.data_Q.put(transform)
+        if self.ring:
+            self.ring.put(transform)
   
     def centre_pos(self):
         for slider in self.transfrm_sliders:
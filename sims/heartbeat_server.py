@@ -1,66 +1,334 @@
-import socket
-import time
-from datetime import datetime
+"""
+ heartbeat_server.py
+
+ Runs on the sim PC and answers the consoles' heartbeat pings (common/heartbeat_client.py)
+ with whether the sim (X-Plane) is running.
+
+ Pings are answered by an asyncio datagram endpoint as soon as they arrive, from the cached
+ result of the process check, so any number of consoles are served concurrently and a slow
+ process listing never delays a reply. The check runs in a worker thread every CHECK_INTERVAL
+ seconds through a pluggable detector:
+   ProcScanDetector   Linux, scans /proc/<pid>/comm and the program name in cmdline
+   TasklistDetector   Windows, parses tasklist CSV output
+ Names are matched case insensitively as substrings, so "X-Plane" finds X-Plane.exe.
+
+ Replies are "xplane_running at HH:MM:SS" or "X-Plane not detected at HH:MM:SS"; pings of the
+ form "ping,<t0>" also get the client's t0 and this PC's receive and send times appended for
+ the client's clock offset estimate. Every STATS_INTERVAL seconds the server logs the consoles
+ heard from, pings answered and its own reply latency (receive to send).
+
+ usage:
+    python sims/heartbeat_server.py [--port 10030] [--process X-Plane] [--interval 5]
+    python sims/heartbeat_server.py selftest    # Linux: consoles pinging, fake target started and stopped
+                                                # and not mistaken for processes that only mention it
+"""
 
+import os
+import sys
+import csv
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import threading
 import subprocess
+from collections import deque
+from datetime import datetime
 
+log = logging.getLogger(__name__)
 
 HEARTBEAT_PORT = 10030
-CHECK_INTERVAL = 5  # seconds to recheck process list
+TARGET_PROCESS = "X-Plane"
+CHECK_INTERVAL = 5     # seconds to recheck process list
+STATS_INTERVAL = 60    # seconds between reply statistics in the log, 0 for none
+CONSOLE_TIMEOUT = 10   # consoles not heard from for this long are no longer counted
+RUNNING_REPLY = "xplane_running"   # HeartbeatClient target_app looks for this in the reply
 
 
-def is_program_running(program_name):
-    try:
-        # Run the tasklist command to get the list of running processes
-        output = subprocess.check_output(['tasklist'], shell=True).decode()
-        
-        # Check if the program name is in the output
-        if program_name.lower() in output.lower():
-            return True
-        else:
-            return False
-    except subprocess.CalledProcessError as e:
-        print(f"Error checking for program: {e}")
+class ProcScanDetector(object):
+    """
+    Linux: matches the name against each process's comm and the file name of its argv[0] in /proc.
+    Arguments are not matched, so this server (started with --process <name>), its parent
+    and a command such as tail "X-Plane 12/Log.txt" are not taken for the target.
+    """
+    def is_running(self, name):
+        name = name.lower()
+        skip = {str(os.getpid()), str(os.getppid())}
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit() or pid in skip:
+                continue
+            try:
+                with open(f"/proc/{pid}/comm", "rb") as f:
+                    comm = f.read().strip()
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    argv0 = f.read().split(b"\0", 1)[0]
+            except OSError:
+                continue   # exited while scanning, or not ours to read
+            # wine and its loaders keep the Windows path in argv[0]
+            program = argv0.replace(b"\\", b"/").rsplit(b"/", 1)[-1]
+            if name in comm.decode(errors="ignore").lower() or name in program.decode(errors="ignore").lower():
+                return True
         return False
 
 
-def get_ipv4_address():
-        hostname = socket.gethostname()
-        ipv4_address = socket.gethostbyname(hostname)
-        return ipv4_address
+class TasklistDetector(object):
+    """ Windows: matches the name against the image names listed by tasklist. """
+    def is_running(self, name):
+        name = name.lower()
+        output = subprocess.check_output(["tasklist", "/FO", "CSV", "/NH"],
+                                         creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        rows = csv.reader(output.decode(errors="ignore").splitlines())
+        return any(row and name in row[0].lower() for row in rows)
 
 
-def main():
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.bind(("0.0.0.0", HEARTBEAT_PORT))
-    sock.settimeout(1.0)
-    
-    print(f"this PCs IPv4 Address: {ipv4_address}")
-    print(f"[Heartbeat Server] Listening on UDP port {HEARTBEAT_PORT}...")
+def default_detector():
+    if os.name == "nt":
+        return TasklistDetector()
+    if os.path.isdir("/proc"):
+        return ProcScanDetector()
+    raise RuntimeError(f"no process detector for platform {sys.platform}")
 
-    xplane_state = is_program_running("X-Plane")
-    last_check = time.time()
 
-    while True:
+class ProcessMonitor(object):
+    """ Checks for the target process in a worker thread, running holds the last result. """
+    def __init__(self, name, detector=None, interval=CHECK_INTERVAL):
+        self.name = name
+        self.detector = detector or default_detector()
+        self.interval = interval
+        self.running = False
+        self.last_check = None     # time.time() of the last completed check
+        self.check_time = None     # seconds the last check took
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.check()   # known before the first ping is answered
+        self._thread = threading.Thread(target=self.run, name="process_monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+
+    def check_now(self):
+        """ Recheck without waiting for the interval, returns immediately. """
+        self._wake.set()
+
+    def check(self):
+        start = time.perf_counter()
         try:
-            # Refresh state periodically
-            if time.time() - last_check > CHECK_INTERVAL:
-                xplane_state = is_program_running("X-Plane")
-                last_check = time.time()
-
-            data, addr = sock.recvfrom(1024)
-            if data.strip().lower() == b'ping':
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                if xplane_state:
-                   reply = f"xplane_running at {timestamp}".encode()
-                else:   
-                     reply = f"X-Plane not detected at {timestamp}".encode()
-                sock.sendto(reply, addr)
-                print(f"Replying {reply} to {addr}")
-        except socket.timeout:
-            continue
+            running = self.detector.is_running(self.name)
         except Exception as e:
-            print(f"[ERROR] {e}")
+            log.warning("Heartbeat: checking for %s failed: %s", self.name, e)
+            running = False
+        self.check_time = time.perf_counter() - start
+        if running != self.running:
+            log.info("Heartbeat: %s %s", self.name, "detected" if running else "not detected")
+        self.running = running
+        self.last_check = time.time()
+
+    def run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self.check()
+
+
+def timestamp_reply(reply, ping, t1):
+    """
+    Append the client's send time (from "ping,<t0>") and this PC's receive and send
+    times so the client can estimate the clock offset between the two PCs.
+    Plain "ping" messages get the reply unchanged.
+    """
+    fields = ping.decode(errors='ignore').strip().split(',')
+    if len(fields) < 2:
+        return reply
+    return f"{reply},{fields[1]},{t1:.6f},{time.time():.6f}"
+
+
+class HeartbeatProtocol(asyncio.DatagramProtocol):
+    def __init__(self, monitor, window=1000):
+        self.monitor = monitor
+        self.transport = None
+        self.consoles = {}                      # addr: time.time() of its last ping
+        self.nbr_pings = 0
+        self.latencies = deque(maxlen=window)   # seconds from receive to reply sent
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        t1 = time.time()
+        start = time.perf_counter()
+        if not data.strip().lower().startswith(b'ping'):
+            return
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        if self.monitor.running:
+            reply = f"{RUNNING_REPLY} at {timestamp}"
+        else:
+            reply = f"{self.monitor.name} not detected at {timestamp}"
+        self.transport.sendto(timestamp_reply(reply, data, t1).encode(), addr)
+        self.latencies.append(time.perf_counter() - start)
+        self.consoles[addr] = t1
+        self.nbr_pings += 1
+        log.debug("Heartbeat: replied %s to %s", reply, addr)
+
+    def error_received(self, exc):
+        log.warning("Heartbeat: %s", exc)
+
+    def active_consoles(self, timeout=CONSOLE_TIMEOUT):
+        now = time.time()
+        return [addr for addr, last in self.consoles.items() if now - last < timeout]
+
+    def latency_summary(self):
+        """ (mean, p99, max) reply latency in ms over the recent pings, None if there were none. """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return sum(ordered) / len(ordered) * 1000, p99 * 1000, ordered[-1] * 1000
+
+
+async def serve(monitor, port=HEARTBEAT_PORT, stats_interval=STATS_INTERVAL, ready=None):
+    """ Answer pings on port until cancelled, ready (a threading.Event) is set once listening. """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: HeartbeatProtocol(monitor), local_addr=("0.0.0.0", port))
+    log.info("Heartbeat: listening on UDP port %d, checking for %s every %g s with %s", port,
+             monitor.name, monitor.interval, type(monitor.detector).__name__)
+    if ready:
+        ready.protocol = protocol
+        ready.set()
+    try:
+        while True:
+            await asyncio.sleep(stats_interval or 3600)
+            latency = protocol.latency_summary()
+            if stats_interval and latency:
+                log.info("Heartbeat: %d consoles, %d pings, reply %.3f ms mean, %.3f ms p99, %.3f ms max, "
+                         "process check %.1f ms", len(protocol.active_consoles()), protocol.nbr_pings,
+                         *latency, (monitor.check_time or 0) * 1000)
+    finally:
+        transport.close()
+
+
+def get_ipv4_address():
+    hostname = socket.gethostname()
+    return socket.gethostbyname(hostname)
+
+
+def selftest(nbr_consoles=8, seconds=3.0):
+    """ Serve on an ephemeral port with a fake target process started and stopped while consoles ping. """
+    name = "fake_xplane_%d" % os.getpid()
+    monitor = ProcessMonitor(name, interval=0.5).start()
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    task = loop.create_task(serve(monitor, port, stats_interval=0, ready=ready))
+
+    def run_server():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    server = threading.Thread(target=run_server, daemon=True)
+    server.start()
+    ready.wait(5)
+
+    consoles = []
+    for _ in range(nbr_consoles):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(1.0)
+        consoles.append(sock)
+
+    def ping_all():
+        """ Ping from every console at once, returns (replies running, round trips) """
+        for sock in consoles:
+            sock.sendto(f"ping,{time.time():.6f}".encode(), ("127.0.0.1", port))
+        running, round_trips = 0, []
+        for sock in consoles:
+            reply = sock.recv(1024).decode()
+            running += RUNNING_REPLY in reply
+            round_trips.append(time.time() - float(reply.split(",")[1]))
+        return running, round_trips
+
+    def phase(label, seconds):
+        end = time.time() + seconds
+        counts, round_trips = [], []
+        while time.time() < end:
+            running, rtt = ping_all()
+            counts.append(running)
+            round_trips += rtt
+            time.sleep(0.05)
+        print(f"{label:<22} replies running: first {counts[0]}/{nbr_consoles}, last {counts[-1]}/{nbr_consoles}, "
+              f"round trip max {max(round_trips) * 1000:.2f} ms")
+        return counts[-1]
+
+    sleeper = "import time; time.sleep(60)"
+    # the name only as an argument (as tail "X-Plane 12/Log.txt") and in a server's own argv
+    decoy = subprocess.Popen([sys.executable, "-c", sleeper, name])
+    own_argv = subprocess.check_output(
+        [sys.executable, "-c", "import sys; from heartbeat_server import ProcScanDetector; "
+         "print(ProcScanDetector().is_running(sys.argv[1]))", name],
+        cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    print(f"name in own argv       detected: {own_argv}")
+    results = [own_argv == "False", phase("no target, decoy", seconds / 3) == 0]
+    decoy.kill()
+    decoy.wait()
+    fake = subprocess.Popen(["./" + name, "-c", sleeper], executable=sys.executable)   # argv[0] is the name
+    results.append(phase("fake target started", seconds / 3) == nbr_consoles)
+    fake.kill()
+    fake.wait()
+    results.append(phase("fake target stopped", seconds / 3) == 0)
+
+    protocol = ready.protocol
+    mean, p99, worst = protocol.latency_summary()
+    print(f"{protocol.nbr_pings} pings from {len(protocol.active_consoles())} consoles, server reply latency "
+          f"{mean:.3f} ms mean, {p99:.3f} ms p99, {worst:.3f} ms max, process check {monitor.check_time * 1000:.1f} ms")
+    loop.call_soon_threadsafe(task.cancel)
+    server.join()
+    monitor.stop()
+    for sock in consoles:
+        sock.close()
+    print("selftest", "passed" if all(results) else "FAILED")
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heartbeat server for the platform consoles")
+    parser.add_argument("command", nargs="?", choices=("serve", "selftest"), default="serve")
+    parser.add_argument("--port", type=int, default=HEARTBEAT_PORT)
+    parser.add_argument("--process", default=TARGET_PROCESS, help="name of the process to report")
+    parser.add_argument("--interval", type=float, default=CHECK_INTERVAL, help="seconds between process checks")
+    parser.add_argument("--stats", type=float, default=STATS_INTERVAL, help="seconds between latency logs, 0 for none")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every reply")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)-8s %(message)s", datefmt="%H:%M:%S")
+
+    if args.command == "selftest":
+        sys.exit(0 if selftest() else 1)
+
+    try:
+        print(f"this PCs IPv4 Address: {get_ipv4_address()}")
+    except OSError:
+        pass
+    monitor = ProcessMonitor(args.process, interval=args.interval).start()
+    try:
+        asyncio.run(serve(monitor, args.port, args.stats))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop()
+
 
 if __name__ == "__main__":
     main()
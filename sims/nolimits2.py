@@ -0,0 +1,314 @@
+"""
+ nolimits2.py
+
+ NoLimits2 coaster adapter, polls the NoLimits2 telemetry server (TCP port 15151, enabled
+ with the --telemetry command line option of NoLimits2 Professional).
+
+ Messages in both directions are framed as
+     'N', type (uint16), request id (uint32), data size (uint16), data, 'L'
+ big endian. The adapter sends GetVersion once per connection, then GetTelemetry at
+ POLL_HZ; each request carries its own id and the server answers them in order, so up to
+ PIPELINE_DEPTH requests are kept in flight and the frame rate is not limited to one frame
+ per round trip. Replies are parsed on the client thread into a TelemetryFeed, timestamped
+ at the midpoint of their request's round trip, and service() takes the resampled frame.
+
+ Telemetry data (76 bytes): state flags, rendered frame, view mode, current coaster,
+ coaster style, current train, car and seat (int32), speed, position x, y, z, rotation
+ quaternion x, y, z, w, g force x, y, z (float). NoLimits2 is right handed with Y up and the
+ car facing -Z; g forces are in the car's frame. The transform is surge, sway, heave (g),
+ roll (right side down), pitch (nose up) and yaw rate, scaled by nolimits2_cfg.norm_factors.
+
+ Motion is only enabled in play mode, the ride name shown is the current coaster.
+
+ usage:
+    python -m sims.nolimits2 [--latency 0.02]   # 100 Hz against the stand-in (nolimits2_emulator.py),
+                                                # pipelined and one request at a time
+"""
+
+import math
+import time
+import socket
+import struct
+import select
+import logging
+import threading
+
+from . import nolimits2_cfg as config
+from .sim_adapter import SimAdapter, TelemetryFeed
+from .shared_types import AircraftInfo
+
+log = logging.getLogger(__name__)
+
+MSG_START, MSG_END = b"N", b"L"
+HEADER = struct.Struct(">cHIH")        # start, type, request id, data size
+TELEMETRY = struct.Struct(">8i11f")
+# message types
+N_IDLE, N_OK, N_ERROR, N_GET_VERSION, N_VERSION, N_GET_TELEMETRY, N_TELEMETRY = range(7)
+# telemetry state flags
+IN_PLAY_MODE = 1 << 0
+BRAKING = 1 << 1
+PAUSED = 1 << 2
+
+STATS_INTERVAL = 60   # seconds between rate and round trip statistics in the log
+
+
+def encode_message(msg_type, request_id, data=b""):
+    return HEADER.pack(MSG_START, msg_type, request_id, len(data)) + data + MSG_END
+
+
+class MessageParser(object):
+    """ Splits the received byte stream into (type, request id, data) messages. """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.nbr_resyncs = 0
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        while len(self.buffer) >= HEADER.size + 1:
+            start, msg_type, request_id, size = HEADER.unpack_from(self.buffer)
+            end = HEADER.size + size
+            if start != MSG_START:
+                self.resync()
+                continue
+            if len(self.buffer) < end + 1:
+                break
+            if self.buffer[end:end + 1] != MSG_END:
+                self.resync()
+                continue
+            messages.append((msg_type, request_id, bytes(self.buffer[HEADER.size:end])))
+            del self.buffer[:end + 1]
+        return messages
+
+    def resync(self):
+        """ Drop bytes up to the next possible message start. """
+        self.nbr_resyncs += 1
+        start = self.buffer.find(MSG_START, 1)
+        del self.buffer[:start if start > 0 else len(self.buffer)]
+
+
+def car_attitude(qx, qy, qz, qw):
+    """ Heading, pitch (nose up) and roll (right side down) in radians from the car's rotation. """
+    # forward (-Z), right (+X) and up (+Y) axes of the car in world coordinates
+    fx, fy, fz = -2 * (qx * qz + qw * qy), -2 * (qy * qz - qw * qx), -(1 - 2 * (qx * qx + qy * qy))
+    ry = 2 * (qx * qy + qw * qz)
+    uy = 1 - 2 * (qx * qx + qz * qz)
+    heading = math.atan2(fx, -fz)
+    pitch = math.asin(max(-1.0, min(1.0, fy)))
+    roll = math.atan2(-ry, uy)
+    return heading, pitch, roll
+
+
+class NoLimits2Client(object):
+    """ Polls the telemetry server on its own thread, reconnecting when the connection drops. """
+
+    def __init__(self, addr, feed, norm_factors, rate_hz=config.POLL_HZ, depth=config.PIPELINE_DEPTH):
+        self.addr = addr
+        self.feed = feed
+        self.norm_factors = norm_factors
+        self.period = 1.0 / rate_hz
+        self.depth = depth
+        self.connected = False
+        self.version = None
+        self.state_flags = 0
+        self.coaster = None
+        self.status_version = 0       # incremented when connected, flags or coaster change
+        self.request_id = 0
+        self.in_flight = {}           # request id: time.time() sent
+        self.round_trips = []         # since the last statistics log
+        self.prev_heading = None      # heading and time of the previous frame, for the yaw rate
+        self.nbr_errors = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name="nolimits2", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def set_status(self, connected=None, state_flags=None, coaster=None):
+        changed = False
+        for name, value in (("connected", connected), ("state_flags", state_flags), ("coaster", coaster)):
+            if value is not None and value != getattr(self, name):
+                setattr(self, name, value)
+                changed = True
+        if changed:
+            self.status_version += 1
+
+    def run(self):
+        while self.running:
+            try:
+                sock = socket.create_connection(self.addr, timeout=config.CONNECT_TIMEOUT)
+            except OSError:
+                time.sleep(config.RECONNECT_INTERVAL)
+                continue
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            log.info("NoLimits2: connected to %s:%d", *self.addr)
+            self.set_status(connected=True)
+            try:
+                self.session(sock)
+            except OSError as e:
+                log.warning("NoLimits2: connection lost: %s", e)
+            finally:
+                sock.close()
+                self.in_flight.clear()
+                self.prev_heading = None
+                self.set_status(connected=False)
+
+    def send(self, sock, msg_type, data=b""):
+        self.request_id = (self.request_id + 1) & 0xFFFFFFFF
+        sock.sendall(encode_message(msg_type, self.request_id, data))
+        return self.request_id
+
+    def session(self, sock):
+        parser = MessageParser()
+        self.send(sock, N_GET_VERSION)
+        next_request = time.time()
+        last_stats = time.time()
+        while self.running:
+            now = time.time()
+            if now >= next_request and len(self.in_flight) < self.depth:
+                self.in_flight[self.send(sock, N_GET_TELEMETRY)] = now
+                next_request += self.period
+                if next_request < now:
+                    next_request = now + self.period   # fell behind (server slow), do not burst
+            wait = next_request - now if len(self.in_flight) < self.depth else self.period
+            readable, _, _ = select.select([sock], [], [], max(0.0, wait))
+            if readable:
+                data = sock.recv(4096)
+                if not data:
+                    raise ConnectionResetError("closed by NoLimits2")
+                for msg_type, request_id, payload in parser.feed(data):
+                    self.handle(msg_type, request_id, payload)
+            if STATS_INTERVAL and now - last_stats > STATS_INTERVAL:
+                last_stats = now
+                self.log_stats()
+
+    def handle(self, msg_type, request_id, payload):
+        arrival = time.time()
+        if msg_type == N_TELEMETRY:
+            sent = self.in_flight.pop(request_id, None)
+            if sent is None:
+                return
+            self.round_trips.append(arrival - sent)
+            self.on_telemetry(TELEMETRY.unpack_from(payload), (sent + arrival) / 2)
+        elif msg_type == N_VERSION:
+            self.version = ".".join(str(b) for b in payload[:4])
+            log.info("NoLimits2: server version %s", self.version)
+        elif msg_type == N_ERROR:
+            self.in_flight.pop(request_id, None)
+            self.nbr_errors += 1
+            if self.nbr_errors % 100 == 1:
+                log.warning("NoLimits2: error reply: %s", payload.decode(errors="replace"))
+
+    def on_telemetry(self, fields, timestamp):
+        flags, _, _, coaster = fields[:4]
+        qx, qy, qz, qw, gx, gy, gz = fields[12:19]
+        self.set_status(state_flags=flags, coaster=coaster)
+        heading, pitch, roll = car_attitude(qx, qy, qz, qw)
+        yaw_rate = 0.0
+        if self.prev_heading is not None and timestamp > self.prev_heading[1]:
+            delta = (heading - self.prev_heading[0] + math.pi) % (2 * math.pi) - math.pi
+            yaw_rate = delta / (timestamp - self.prev_heading[1])
+        self.prev_heading = (heading, timestamp)
+        nf = self.norm_factors
+        self.feed.push((-gz * nf[0], gx * nf[1], gy * nf[2], roll * nf[3], pitch * nf[4], yaw_rate * nf[5]), timestamp)
+
+    def log_stats(self):
+        summary = self.feed.summary()
+        trips = sorted(self.round_trips) or [0.0]
+        self.round_trips = []
+        log.info("NoLimits2: %.1f frames/s, round trip %.1f ms mean, %.1f ms max, longest gap %.1f ms",
+                 summary["rate"], sum(trips) / len(trips) * 1000, trips[-1] * 1000, summary["max_gap"] * 1000)
+
+
+class Sim(SimAdapter):
+    name = "NoLimits2"
+
+    def __init__(self, sleep_func, frame, report_state_cb, sim_ip=None):
+        super().__init__(sleep_func, frame, report_state_cb, sim_ip)
+        self.feed = TelemetryFeed(config.TELEMETRY_TARGET_DELAY, config.TELEMETRY_MAX_EXTRAPOLATION,
+                                  config.TELEMETRY_TIMEOUT)
+        self.client = None
+        self.status_version = None    # client status_version the connection state was made from
+        self.data_live = False
+
+    def connect(self, server_addr=None):
+        if self.client is None:
+            self.client = NoLimits2Client((server_addr or self.sim_ip or "127.0.0.1", config.TELEMETRY_PORT),
+                                          self.feed, config.norm_factors).start()
+            self.report_state_cb("Connecting to NoLimits2...")
+
+    def is_Connected(self):
+        return self.client is not None
+
+    def service(self, washout_callback=None):
+        if self.client is None:
+            self.connect()   # as X-Plane, connecting is driven from the frame loop
+        transform = self.feed.sample()
+        live = transform is not None
+        if live != self.data_live or self.client.status_version != self.status_version:
+            self.data_live = live
+            self.update_connection_state()
+        if transform is None:
+            return None
+        return washout_callback(list(transform)) if washout_callback else transform
+
+    def update_connection_state(self):
+        client = self.client
+        self.status_version = client.status_version
+        in_play = bool(client.state_flags & IN_PLAY_MODE) and not client.state_flags & PAUSED
+        if not client.connected:
+            self.report_state_cb("Waiting for NoLimits2...")
+            self.set_connection_state("nogo", "nogo", AircraftInfo(status="nogo", name="Coaster"))
+            return
+        self.report_state_cb("Receiving NoLimits2 telemetry" if self.data_live else "Waiting for NoLimits2 telemetry...")
+        name = "Coaster" if client.coaster is None else f"Coaster {client.coaster + 1}"
+        self.set_connection_state("ok", "ok" if self.data_live else "warning",
+                                  AircraftInfo(status="ok" if in_play else "warning", name=name))
+
+    def get_washout_config(self):
+        return config.washout_time
+
+    def fin(self):
+        if self.client:
+            self.client.stop()
+            self.client = None
+
+
+if __name__ == "__main__":
+    import argparse
+    from .nolimits2_emulator import NoLimits2Emulator
+
+    parser = argparse.ArgumentParser(description="NoLimits2 adapter against the telemetry stand-in")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in reply latency in seconds")
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    emulator = NoLimits2Emulator(port=0, host="127.0.0.1", latency=args.latency).start()
+    for depth in (config.PIPELINE_DEPTH, 1):
+        feed = TelemetryFeed(config.TELEMETRY_TARGET_DELAY, config.TELEMETRY_MAX_EXTRAPOLATION, config.TELEMETRY_TIMEOUT)
+        client = NoLimits2Client(("127.0.0.1", emulator.port), feed, config.norm_factors, config.POLL_HZ, depth).start()
+        time.sleep(0.5)
+        feed.summary()
+        client.round_trips = []
+        frames, start = 0, time.perf_counter()
+        while time.perf_counter() - start < args.seconds:   # 100 Hz control loop
+            frames += feed.sample() is not None
+            time.sleep(0.01)
+        summary = feed.summary()
+        trips = sorted(client.round_trips)
+        client.stop()
+        print(f"pipeline depth {depth}: {summary['rate']:.1f} telemetry frames/s at {config.POLL_HZ} Hz polling, "
+              f"round trip {sum(trips) / len(trips) * 1000:.1f} ms mean, longest gap {summary['max_gap'] * 1000:.1f} ms, "
+              f"{frames} control frames with data, extrapolated {summary['extrapolated']}, held {summary['held']}")
+    emulator.stop()
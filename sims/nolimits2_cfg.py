@@ -0,0 +1,18 @@
+# nolimits2_cfg.py
+TELEMETRY_PORT = 15151   # NoLimits2 telemetry server, started with: nolimits2app.exe --telemetry
+
+# GetTelemetry requests are sent at POLL_HZ with up to PIPELINE_DEPTH waiting for their reply,
+# so the frame rate is not limited to one frame per round trip
+POLL_HZ = 100
+PIPELINE_DEPTH = 4
+CONNECT_TIMEOUT = 1.0
+RECONNECT_INTERVAL = 1.0
+
+# telemetry jitter buffer, as in xplane_cfg.py
+TELEMETRY_TARGET_DELAY = 0.02
+TELEMETRY_MAX_EXTRAPOLATION = 0.05
+TELEMETRY_TIMEOUT = 0.5
+
+# surge, sway, heave (g), roll, pitch (radians), yaw rate (radians/s) to +-1, set negative to invert
+norm_factors = [0.5, 0.5, 0.5, 1.0, 1.0, 0.5]
+washout_time = [12, 12, 12, 0, 0, 0]  #  washout_time is number of seconds to decay below 2%
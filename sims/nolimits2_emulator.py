@@ -0,0 +1,166 @@
+"""
+ nolimits2_emulator.py
+
+ Stand-in for the NoLimits2 telemetry server, for running and benchmarking the nolimits2
+ adapter without NoLimits2.
+
+ Accepts any number of TCP connections and answers GetVersion and GetTelemetry the way
+ NoLimits2 does (framing and message types in nolimits2.py), other requests with Error.
+ Each reply is sent latency seconds after its request arrived, independently of the other
+ requests in flight, to model the server's frame and network delay.
+
+ The telemetry is a car going round a banked, rolling circuit; paused and in_play_mode can be
+ changed while running.
+
+ usage:
+    python -m sims.nolimits2_emulator [--port 15151] [--latency 0.01]
+ then run the platform with NoLimits2 selected in sim_config.py.
+"""
+
+import math
+import time
+import heapq
+import socket
+import select
+import logging
+import argparse
+import threading
+
+from .nolimits2 import (MessageParser, encode_message, TELEMETRY, N_ERROR, N_GET_VERSION, N_VERSION,
+                        N_GET_TELEMETRY, N_TELEMETRY, IN_PLAY_MODE, PAUSED)
+from .nolimits2_cfg import TELEMETRY_PORT
+
+log = logging.getLogger(__name__)
+
+VERSION = bytes((2, 5, 7, 0))
+
+
+def quaternion(heading, pitch, roll):
+    """ Rotation of a car facing -Z (Y up) turned to heading, pitched nose up and rolled right side down. """
+    def axis_angle(x, y, z, angle):
+        s = math.sin(angle / 2)
+        return (x * s, y * s, z * s, math.cos(angle / 2))
+
+    def multiply(a, b):
+        ax, ay, az, aw = a
+        bx, by, bz, bw = b
+        return (aw * bx + ax * bw + ay * bz - az * by,
+                aw * by - ax * bz + ay * bw + az * bx,
+                aw * bz + ax * by - ay * bx + az * bw,
+                aw * bw - ax * bx - ay * by - az * bz)
+
+    yaw = axis_angle(0, 1, 0, -heading)
+    pitch_q = axis_angle(1, 0, 0, pitch)
+    roll_q = axis_angle(0, 0, 1, -roll)
+    return multiply(multiply(yaw, pitch_q), roll_q)
+
+
+class NoLimits2Emulator(object):
+    def __init__(self, port=TELEMETRY_PORT, host='', latency=0.01):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        self.latency = latency
+        self.in_play_mode = True
+        self.paused = False
+        self.coaster = 0
+        self.start_time = time.time()
+        self.frame = 0
+        self.nbr_requests = 0
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        thread = threading.Thread(target=self.accept, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        log.info("NoLimits2 emulator listening on port %d, reply latency %.0f ms", self.port, self.latency * 1000)
+        return self
+
+    def stop(self):
+        self.running = False
+        self.server.close()
+        for thread in self.threads:
+            thread.join()
+
+    def accept(self):
+        while self.running:
+            readable, _, _ = select.select([self.server], [], [], 0.2)
+            if not readable:
+                continue
+            try:
+                conn, addr = self.server.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            log.info("NoLimits2 emulator: connection from %s", addr)
+            thread = threading.Thread(target=self.serve, args=(conn,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def telemetry(self, now):
+        t = now - self.start_time
+        heading = 0.4 * t
+        pitch = 0.3 * math.sin(0.9 * t)
+        roll = 0.5 * math.sin(0.6 * t)
+        speed = 20 + 5 * math.sin(0.3 * t)
+        flags = (IN_PLAY_MODE if self.in_play_mode else 0) | (PAUSED if self.paused else 0)
+        self.frame += 1
+        return TELEMETRY.pack(flags, self.frame, 0, self.coaster, 0, 0, 0, 0, speed,
+                              100 * math.sin(heading), 10 + 5 * math.sin(0.9 * t), -100 * math.cos(heading),
+                              *quaternion(heading, pitch, roll),
+                              0.3 * math.sin(0.6 * t), 1 + 0.5 * math.sin(1.3 * t), -0.2 * math.cos(0.3 * t))
+
+    def reply(self, msg_type, request_id, now):
+        if msg_type == N_GET_TELEMETRY:
+            return encode_message(N_TELEMETRY, request_id, self.telemetry(now))
+        if msg_type == N_GET_VERSION:
+            return encode_message(N_VERSION, request_id, VERSION)
+        return encode_message(N_ERROR, request_id, b"unsupported request")
+
+    def serve(self, conn):
+        parser = MessageParser()
+        pending = []   # (due time, sequence, reply), sent in due order
+        sequence = 0
+        with conn:
+            while self.running:
+                now = time.time()
+                while pending and pending[0][0] <= now:
+                    conn.sendall(heapq.heappop(pending)[2])
+                timeout = max(0.0, pending[0][0] - now) if pending else 0.2
+                readable, _, _ = select.select([conn], [], [], timeout)
+                if not readable:
+                    continue
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    break
+                if not data:
+                    break
+                now = time.time()
+                for msg_type, request_id, _ in parser.feed(data):
+                    self.nbr_requests += 1
+                    sequence += 1
+                    # sampled now, delivered after the latency, as a server rendering frames would
+                    heapq.heappush(pending, (now + self.latency, sequence, self.reply(msg_type, request_id, now)))
+        log.info("NoLimits2 emulator: connection closed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NoLimits2 telemetry server stand-in")
+    parser.add_argument("--port", type=int, default=TELEMETRY_PORT, help="TCP port (default %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.01, help="reply latency in seconds (default %(default)s)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)-8s %(message)s', datefmt='%H:%M:%S')
+    emulator = NoLimits2Emulator(args.port, latency=args.latency).start()
+    try:
+        prev = 0
+        while True:
+            time.sleep(1)
+            rate, prev = emulator.nbr_requests - prev, emulator.nbr_requests
+            print(f"{rate:4d} requests/s")
+    except KeyboardInterrupt:
+        emulator.stop()
@@ -33,36 +33,54 @@ Angular Positions (degrees → radians):
 
 Aircraft Identifier:
 --------------------
-    - sim/aircraft/type/acf_ICAO → Appended to telemetry message
-
-Telemetry UDP Message Format:
------------------------------
-Message Prefix: xplane_telemetry,
-Message Payload:
-    surge_accel, sway_accel, heave_accel,
-    roll_rate, pitch_rate, yaw_rate,
-    roll_angle, pitch_angle, ICAO
-
-Example:
-    xplane_telemetry,-0.020,0.005,-0.980,-0.003,0.000,-0.002,0.087,-0.045,C172
+    - sim/aircraft/view/acf_ICAO → Appended to telemetry message
+      read when the first frame is sent and again when the user aircraft is loaded
+
+Telemetry UDP Message Format (TELEMETRY_FORMAT):
+------------------------------------------------
+"binary", little endian, 52 bytes, packed into a preallocated buffer:
+    magic 2s b"XT", version B 1, flags B 0, ts d (time.time() of the sample),
+    g_axil, g_side, g_nrml, Prad, Qrad, Rrad, phi, theta as 8 floats, icao 8s (NUL padded)
+"json", the original message:
+    {"header": "xplane_telemetry", "g_axil": ..., "theta": ..., "icao": "C172", "ts": ...}
+The console (sims/xplane_telemetry.py) accepts both.
+
+Flight loop cost:
+-----------------
+Telemetry is sampled every CALLBACK_INTERVAL seconds (negative values are X-Plane frames,
+-1 is every frame). The time spent sampling and sending is logged to Log.txt every
+TIMING_LOG_INTERVAL seconds as frames per second and mean/max microseconds.
+
+Delivery:
+---------
+Consoles register by sending InitComs to port 10023, commands are always received there.
+With MULTICAST_GROUP None each frame is sent to every registered console, one datagram each.
+With a group address the frame is encoded once and sent as a single datagram to the group,
+which every console joins (TELEMETRY_MULTICAST_GROUP in the console's xplane_cfg.py), so the
+cost in X-Plane's flight loop stays the same however many consoles are running. Sending starts
+when the first console registers.
 """
 import json
+import time
+import socket
+import struct
 from XPPython3 import xp
-from collections import namedtuple
 from math import radians
 from udp_tx_rx import UdpReceive
 from situation_loader import SituationLoader
 from accessibility import load_accessibility_settings, set_accessibility
 
 
-transform_refs = namedtuple('transform_refs', (
-    'DR_g_axil', 'DR_g_side', 'DR_g_nrml',
-    'DR_Prad', 'DR_Qrad', 'DR_Rrad',
-    'DR_theta', 'DR_psi', 'DR_phi',
-    'DR_groundspeed'
-))
-
 TARGET_PORT = 10022
+MULTICAST_GROUP = None   # e.g. "239.255.10.22" to send one datagram per frame to all consoles
+MULTICAST_TTL = 1        # 1 keeps the telemetry on the local network
+TELEMETRY_FORMAT = "binary"   # or "json" for consoles from before the binary format
+CALLBACK_INTERVAL = 0.025     # seconds between telemetry frames, negative for X-Plane frames (-1 every frame)
+TIMING_LOG_INTERVAL = 60      # seconds between telemetry cost logs, 0 disables
+
+TELEMETRY_MAGIC = b"XT"
+TELEMETRY_VERSION = 1
+TELEMETRY_PACKET = struct.Struct("<2sBBd8f8s")   # must match sims/xplane_telemetry.py
 
 class PythonInterface:
     def XPluginStart(self):
@@ -71,10 +89,22 @@ class PythonInterface:
         self.Desc = "Sends 6DoF telemetry + ICAO code over UDP to platform."
 
         self.controller_addr = []
+        self.telemetry_addrs = []   # destinations of each frame, see Delivery in the module docstring
         self.udp = UdpReceive(10023)
+        if MULTICAST_GROUP:
+            self.udp.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+            xp.log(f"[INFO] Telemetry multicast to {MULTICAST_GROUP}:{TARGET_PORT}")
         self.situation_loader = SituationLoader()
         self.settings = load_accessibility_settings()
 
+        self.icao = None            # cached, cleared when an aircraft is loaded
+        self.icao_bytes = b""
+        self.packet = bytearray(TELEMETRY_PACKET.size)
+        self.timing_count = 0       # telemetry frames and time spent on them since the last timing log
+        self.timing_total = 0.0
+        self.timing_max = 0.0
+        self.timing_start = time.perf_counter()
+
         self.init_drefs()
         xp.registerFlightLoopCallback(self.InputOutputLoopCallback, 1.0, 0)
 
@@ -91,7 +121,8 @@ class PythonInterface:
         pass
 
     def XPluginReceiveMessage(self, inFromWho, inMessage, inParam):
-        pass
+        if inMessage == xp.MSG_PLANE_LOADED and inParam == 0:   # the user's aircraft
+            self.icao = None   # read again with the next frame, when the new aircraft's datarefs are set
 
     def init_drefs(self):
         self.xform_drefs = [
@@ -110,6 +141,8 @@ class PythonInterface:
         
         self.OutputDataRef = [xp.findDataRef(ref) for ref in self.xform_drefs]
         self.NumberOfDatarefs = len(self.OutputDataRef)
+        # the datarefs sampled each frame, in the order read_telemetry unpacks them (psi and groundspeed are not sent)
+        self.sample_refs = tuple(self.OutputDataRef[i] for i in (0, 1, 2, 3, 4, 5, 6, 8))
         self.pauseCmd = xp.findCommand("sim/operation/pause_toggle")
         self.pauseStateDR = xp.findDataRef("sim/time/paused")
         self.replay_play = xp.findCommand("sim/replay/rep_play_rf")
@@ -119,14 +152,21 @@ class PythonInterface:
             xp.log("[WARN] acf_icao_ref dataref not found.")
 
     def InputOutputLoopCallback(self, elapsedMe, elapsedSim, counter, refcon):
-        try:
-            # telemetry, icao = self.read_telemetry()
-            # msg = "xplane_telemetry," + ",".join(f"{x:.3f}" for x in telemetry) + f",{icao}\n"
-            msg = self.read_telemetry()
-            for addr in self.controller_addr:
-                self.udp.send(msg, (addr, TARGET_PORT))
-        except Exception as e:
-            xp.log(f"[ERROR] Telemetry send failed: {e}")
+        if self.telemetry_addrs:
+            start = time.perf_counter()
+            try:
+                data = self.read_telemetry()
+                for addr in self.telemetry_addrs:
+                    self.udp.send_bytes(data, addr)
+            except Exception as e:
+                xp.log(f"[ERROR] Telemetry send failed: {e}")
+            elapsed = time.perf_counter() - start
+            self.timing_count += 1
+            self.timing_total += elapsed
+            if elapsed > self.timing_max:
+                self.timing_max = elapsed
+            if TIMING_LOG_INTERVAL and start - self.timing_start >= TIMING_LOG_INTERVAL:
+                self.log_timing(start)
 
         while self.udp.available() > 0:
             try:
@@ -137,6 +177,10 @@ class PythonInterface:
                 if cmd == 'InitComs':
                     if addr[0] not in self.controller_addr:
                         self.controller_addr.append(addr[0])
+                        if MULTICAST_GROUP:
+                            self.telemetry_addrs = [(MULTICAST_GROUP, TARGET_PORT)]
+                        else:
+                            self.telemetry_addrs = [(a, TARGET_PORT) for a in self.controller_addr]
                         xp.log(f"[INFO] Controller added: {addr[0]}")
 
                 elif cmd == 'Run':
@@ -192,9 +236,19 @@ class PythonInterface:
             except Exception as e:
                 xp.log(f"[ERROR] UDP command handling failed: {e}")
 
-        return 0.025
+        return CALLBACK_INTERVAL
 
-    def read_telemetry(self):
+    def log_timing(self, now):
+        elapsed = now - self.timing_start
+        mean = self.timing_total / self.timing_count if self.timing_count else 0.0
+        xp.log(f"[INFO] Telemetry: {self.timing_count / elapsed:.1f} frames/s, "
+               f"{mean * 1e6:.0f} us mean, {self.timing_max * 1e6:.0f} us max per frame")
+        self.timing_count = 0
+        self.timing_total = 0.0
+        self.timing_max = 0.0
+        self.timing_start = now
+
+    def read_icao(self):
         try:
             if self.acf_icao_ref is not None:
                 icao_buf = [0] * 40
@@ -205,24 +259,37 @@ class PythonInterface:
         except Exception as e:
             # xp.log(f"[WARN] Failed to read ICAO: {e}")
             icao = "unknown"
-            
-        data = [xp.getDataf(ref) for ref in self.OutputDataRef]
-        named = transform_refs._make(data)
-        
+        self.icao = icao
+        self.icao_bytes = icao.encode('utf-8')[:8]
+        xp.log(f"[INFO] Aircraft ICAO: {icao}")
+
+    def read_telemetry(self):
+        """ The telemetry message for this frame as bytes, in TELEMETRY_FORMAT. """
+        if self.icao is None:
+            self.read_icao()
+        getDataf = xp.getDataf
+        g_axil, g_side, g_nrml, prad, qrad, rrad, theta, phi = [getDataf(ref) for ref in self.sample_refs]
+
+        if TELEMETRY_FORMAT == "binary":
+            TELEMETRY_PACKET.pack_into(self.packet, 0, TELEMETRY_MAGIC, TELEMETRY_VERSION, 0, time.time(),
+                                       -rrad, -qrad, -prad, g_nrml - 1.0, -g_side, -g_axil,
+                                       radians(phi), -radians(theta), self.icao_bytes)
+            return self.packet
+
         telemetry_dict = {
             "header": "xplane_telemetry",
-            "g_axil":  -named.DR_Rrad,
-            "g_side":  -named.DR_Qrad,
-            "g_nrml":  -named.DR_Prad,
-            "Prad":    named.DR_g_nrml - 1.0,
-            "Qrad":    -named.DR_g_side,
-            "Rrad":    -named.DR_g_axil,
-            "phi":     radians(named.DR_phi),
-            "theta":   -radians(named.DR_theta),
-            "icao":     icao
+            "g_axil":  -rrad,
+            "g_side":  -qrad,
+            "g_nrml":  -prad,
+            "Prad":    g_nrml - 1.0,
+            "Qrad":    -g_side,
+            "Rrad":    -g_axil,
+            "phi":     radians(phi),
+            "theta":   -radians(theta),
+            "icao":     self.icao,
+            "ts":       time.time()   # origin time for end-to-end latency measurement
         }
-        telemetry_json = json.dumps(telemetry_dict)
-        return telemetry_json
+        return json.dumps(telemetry_dict).encode('utf-8')
         
     """
     def read_telemetry(self):
@@ -7,12 +7,14 @@ class AircraftInfo(NamedTuple):
     status: str  # "ok", "warning", "nogo"
     name: str    # ICAO name or "Aircraft"
     
+class ConnectionState(NamedTuple):
+    conn_status: str   # "ok", "warning", "nogo"
+    data_status: str
+    aircraft_info: "AircraftInfo"
+
 class SimUpdate(NamedTuple):
     transform: tuple
     muscle_lengths: tuple
-    conn_status: str
-    data_status: str
-    aircraft_info: "AircraftInfo"
     temperature: float# | None
     processing_percent: int
     jitter_percent: int
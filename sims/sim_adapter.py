@@ -0,0 +1,213 @@
+"""
+ sim_adapter.py
+
+ What the core expects from a sim, and where it finds them.
+
+ SimAdapter is the base class of the sims the core drives (sim_config.AVAILABLE_SIMS). An
+ adapter implements service(), returning the newest normalized transform (surge, sway,
+ heave, roll, pitch, yaw, each about +-1) passed through the washout callback, or None if
+ there is no data; everything else has a working default. Adapters report their connection,
+ data and aircraft (or ride) status with set_connection_state, which notifies the core only
+ when it changes.
+
+ SIM_ADAPTERS maps the sim names used in AVAILABLE_SIMS to "module:class"; the module is
+ imported only when that sim is loaded, so an adapter's dependencies (PyQt5 for TestSim,
+ for example) are not needed to run the others. Names that are not registered fail with
+ the list of adapters that are. Sims that are listed but not supported yet (FS2020) load
+ an UnsupportedSim, which reports that through report_state_cb and never provides data.
+
+ TelemetryFeed is the telemetry layer shared by adapters that receive frames on their own
+ thread: a JitterBuffer resampling the frames onto the control loop clock, loss detection
+ and rate statistics.
+
+ usage:
+    sim_class = load_adapter("nolimits2")
+    sim = sim_class(sleep_func, frame, report_state_cb, sim_ip)
+
+    feed = TelemetryFeed(target_delay=0.02, max_extrapolation=0.05, timeout=0.5)
+    feed.push(transform, timestamp)      # receiving thread
+    transform = feed.sample()            # control loop, None if no frames for timeout seconds
+"""
+
+import time
+import logging
+import threading
+import importlib
+from abc import ABC, abstractmethod
+
+from common.jitter_buffer import JitterBuffer
+from .shared_types import AircraftInfo, ConnectionState
+
+log = logging.getLogger(__name__)
+
+# sim names in sim_config.AVAILABLE_SIMS -> adapter class, imported when first loaded
+SIM_ADAPTERS = {
+    "xplane": "sims.xplane:Sim",
+    "TestSim": "sims.TestSim:Sim",
+    "nolimits2": "sims.nolimits2:Sim",
+    "fs2020": "sims.sim_adapter:Fs2020Sim",   # listed in AVAILABLE_SIMS, no adapter yet
+}
+
+
+def register_adapter(name, target):
+    """ Add or replace an adapter, target is "module:class". """
+    SIM_ADAPTERS[name] = target
+
+
+def load_adapter(name):
+    """ Import and return the adapter class for a sim name, raises ValueError if there is none. """
+    target = SIM_ADAPTERS.get(name)
+    if target is None:
+        raise ValueError(f"No sim adapter for '{name}', available: {', '.join(sorted(SIM_ADAPTERS))}")
+    module_name, class_name = target.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class SimAdapter(ABC):
+    name = "Sim"
+
+    def __init__(self, sleep_func, frame, report_state_cb, sim_ip=None):
+        self.sleep_func = sleep_func
+        self.frame = frame
+        self.report_state_cb = report_state_cb
+        self.sim_ip = sim_ip
+        self.washout_callback = None
+        self.connection_state = ConnectionState("nogo", "nogo", AircraftInfo(status="nogo", name="Aircraft"))
+        self.connection_state_cb = None
+
+    @abstractmethod
+    def service(self, washout_callback=None):
+        """ Newest transform passed through washout_callback (if given), or None; called every frame. """
+
+    def read(self):
+        return self.service(self.washout_callback)
+
+    def connect(self, server_addr=None):
+        pass
+
+    def is_Connected(self):
+        """ The core calls connect() while this is False, progress after that is in the connection state. """
+        return False
+
+    def set_default_address(self, ip_address):
+        self.sim_ip = ip_address
+
+    def fin(self):
+        pass
+
+    # callbacks from the core
+    def set_state_callback(self, callback):
+        self.report_state_cb = callback
+
+    def set_washout_callback(self, callback):
+        self.washout_callback = callback
+
+    def set_connection_state_callback(self, callback):
+        """ callback(ConnectionState) is called when the connection, data or aircraft status changes. """
+        self.connection_state_cb = callback
+
+    # status
+    def get_connection_state(self):
+        return self.connection_state
+
+    def set_connection_state(self, conn_status, data_status, aircraft_info):
+        """ Cache the status, the core is only notified if it changed. """
+        state = ConnectionState(conn_status, data_status, aircraft_info)
+        if state != self.connection_state:
+            self.connection_state = state
+            if self.connection_state_cb:
+                self.connection_state_cb(state)
+
+    def get_frame_origin_time(self):
+        """ time.time() the current frame was sampled in the sim, None if not known. """
+        return None
+
+    def get_washout_config(self):
+        return [0, 0, 0, 0, 0, 0]
+
+    # sim control, adapters override what their sim supports
+    def run(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def set_flight_mode(self, mode):
+        pass
+
+    def set_pilot_assist(self, level):
+        pass
+
+
+class UnsupportedSim(SimAdapter):
+    """ Stands in for a listed sim that has no adapter: reports that and never provides data. """
+    name = "Sim"
+
+    def __init__(self, sleep_func, frame, report_state_cb, sim_ip=None):
+        super().__init__(sleep_func, frame, report_state_cb, sim_ip)
+        log.warning("%s is listed in AVAILABLE_SIMS but not supported", self.name)
+        self.report_state_cb(f"{self.name} not supported")
+        self.set_connection_state("nogo", "nogo", AircraftInfo(status="nogo", name=f"{self.name} not supported"))
+
+    def service(self, washout_callback=None):
+        return None
+
+
+class Fs2020Sim(UnsupportedSim):
+    name = "FS2020"
+
+
+class TelemetryFeed(object):
+    """ Frames pushed from a receiving thread, resampled for the control loop. """
+
+    def __init__(self, target_delay=0.05, max_extrapolation=0.1, timeout=0.5):
+        self.buffer = JitterBuffer(target_delay, max_extrapolation)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.nbr_frames = 0
+        self.last_push = None      # time.time() of the newest frame
+        self.max_gap = 0.0         # longest interval between frames since the last summary
+        self.rate_start = time.time()
+        self.rate_frames = 0
+        self.rate = 0.0            # frames per second over the last summary interval
+
+    def push(self, values, timestamp=None):
+        """ Add a frame taken at timestamp (time.time(), default now), called from the receiving thread. """
+        now = time.time()
+        timestamp = now if timestamp is None else timestamp
+        with self.lock:
+            self.buffer.push(timestamp, values)
+        if self.last_push is not None and now - self.last_push > self.max_gap:
+            self.max_gap = now - self.last_push
+        self.last_push = now
+        self.nbr_frames += 1
+
+    def sample(self, now=None):
+        """ The resampled frame, or None if no frame arrived for timeout seconds. """
+        now = time.time() if now is None else now
+        with self.lock:
+            age = self.buffer.age(now)
+            if age is None or age > self.timeout:
+                return None
+            return self.buffer.sample(now)
+
+    def is_live(self, now=None):
+        now = time.time() if now is None else now
+        return self.last_push is not None and now - self.last_push <= self.timeout
+
+    def clear(self):
+        with self.lock:
+            self.buffer.clear()
+
+    def summary(self):
+        """ dict of the frame rate and longest gap since the last call, and the jitter buffer counts. """
+        now = time.time()
+        frames = self.nbr_frames
+        self.rate = (frames - self.rate_frames) / max(now - self.rate_start, 1e-6)
+        self.rate_start, self.rate_frames = now, frames
+        with self.lock:
+            interpolated, extrapolated, held, dropped = self.buffer.stats()
+        summary = dict(frames=frames, rate=self.rate, max_gap=self.max_gap, interpolated=interpolated,
+                       extrapolated=extrapolated, held=held, dropped=dropped)
+        self.max_gap = 0.0
+        return summary
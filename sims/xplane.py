@@ -11,9 +11,10 @@ from enum import Enum
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from . import xplane_cfg as config
-from .xplane_cfg import TELEMETRY_CMD_PORT, TELEMETRY_EVT_PORT, HEARTBEAT_PORT
+from .xplane_cfg import TELEMETRY_CMD_PORT, TELEMETRY_EVT_PORT, HEARTBEAT_PORT, INITCOMS_MIN_INTERVAL
 from .xplane_state_machine import SimStateMachine, SimState
 from .shared_types import AircraftInfo
+from .sim_adapter import SimAdapter
 from .xplane_beacon import XplaneBeacon
 from .xplane_telemetry import XplaneTelemetry
 from common.heartbeat_client import HeartbeatClient
@@ -21,50 +22,71 @@ from common.heartbeat_client import HeartbeatClient
 log = logging.getLogger(__name__)
 
 
-class Sim:
+class Sim(SimAdapter):
+    name = "X-Plane"
+
     def __init__(self, sleep_func, frame, report_state_cb, sim_ip=None):
-        self.sleep_func = sleep_func
-        self.frame = frame
-        self.report_state_cb = report_state_cb
-        self.name = "X-Plane"
+        super().__init__(sleep_func, frame, report_state_cb, sim_ip)
         self.prev_yaw = None
         self.norm_factors = config.norm_factors
-        self.washout_callback = None
         self.telemetry = XplaneTelemetry((sim_ip, TELEMETRY_EVT_PORT), config.norm_factors)
         self.xplane_ip = sim_ip
         self.xplane_addr = None
+        self.telemetry.on_icao_changed = self.on_icao_changed
         self.aircraft_info = AircraftInfo(status="nogo", name="Aircraft")
-        self.state_machine = SimStateMachine(self)
+        self.icao_supported = False   # status is recomputed only on heartbeat, state and aircraft changes
         self.heartbeat_ok = False
         self.xplane_running = False
-        self.state = SimState.WAITING_HEARTBEAT
         self.HEARTBEAT_INTERVAL = 1.0  # seconds
         heartbeat_addr = (sim_ip, HEARTBEAT_PORT)
         self.heartbeat = HeartbeatClient(heartbeat_addr, target_app="xplane_running", interval=self.HEARTBEAT_INTERVAL)
+        self.telemetry.set_clock(self.heartbeat.to_local_time)
         self.last_initcoms_time = 0
-        self.INITCOMS_INTERVAL = 1.0  # seconds
+        self.initcoms_interval = INITCOMS_MIN_INTERVAL  # doubles with each InitComs until telemetry arrives
+        # reconnect timing: from losing telemetry (or starting) to its first packet, and from that packet
+        # to the first frame returned for motion
+        self.lost_time = time.time()
+        self.time_to_first_frame = None
+        self.time_to_ready = None
         self.beacon = XplaneBeacon()
 
         self.situation_load_started = False
         self.pause_after_startup = True
+        self.state_machine = SimStateMachine(self)
 
     def service(self, washout_callback=None):
+        self.telemetry.keep_hub_alive()
         return self.state_machine.handle(washout_callback)
 
-    def read(self):
-        return self.service(self.washout_callback)
-
     def connect(self, server_addr=None):
         self.service(self.washout_callback)
 
     def set_default_address(self, ip_address):
         pass
 
-    def set_state_callback(self, callback):
-        self.report_state_cb = callback
-
-    def set_washout_callback(self, callback):
-        self.washout_callback = callback
+    def get_frame_origin_time(self):
+        """
+        Time in X-Plane, converted to this PC's time.time() clock, of the most recent
+        (resampled) telemetry frame. None if the plugin or the heartbeat server does not
+        provide timestamps.
+        """
+        return self.telemetry.get_origin_time()
+
+    def telemetry_resumed(self, now):
+        """ Called by the state machine when telemetry is accepted again, records the reconnect timing. """
+        resumed = self.telemetry.resume_time or now
+        self.time_to_first_frame = resumed - self.lost_time
+        self.time_to_ready = now - resumed
+        log.info("X-Plane telemetry: first packet %.2f s after loss or start, motion ready %.3f s after it",
+                 self.time_to_first_frame, self.time_to_ready)
+
+    def telemetry_lost(self, now):
+        log.warning("X-Plane telemetry lost")
+        self.lost_time = now
+
+    def get_reconnect_metrics(self):
+        """ Seconds from the last telemetry loss (or start) to its first packet, and from that packet to motion ready. """
+        return self.time_to_first_frame, self.time_to_ready
 
     def get_washout_config(self):
         return config.washout_time
@@ -72,33 +94,39 @@ class Sim:
     def is_Connected(self):
         return True
 
-    def get_connection_state(self):
-        if not self.heartbeat_ok:
+    def update_connection_state(self):
+        """ Recompute the status after a heartbeat, state or aircraft change, notifies if it changed. """
+        receiving = self.state == SimState.RECEIVING_DATAREFS
+        if receiving:
+            connection_status = "ok"   # telemetry is proof of life, whatever the heartbeat says
+        elif not self.heartbeat_ok:
             connection_status = "nogo"
         elif not self.xplane_running:
             connection_status = "warning"
         else:
             connection_status = "ok"
 
-        if self.state == SimState.RECEIVING_DATAREFS:
+        if receiving:
             data_status = "ok"
         elif self.state == SimState.WAITING_DATAREFS:
             data_status = "warning"
         else:
             data_status = "nogo"
 
-        if self.state != SimState.RECEIVING_DATAREFS:
-            aircraft_info = AircraftInfo(status="nogo", name="Aircraft")
+        if receiving:
+            self.aircraft_info = AircraftInfo(status="ok" if self.icao_supported else "nogo",
+                                              name=self.telemetry.get_icao())
         else:
-            name = self.aircraft_info.name
-            status = "ok" if self.is_icao_supported() else "nogo"
-            aircraft_info = AircraftInfo(status=status, name=name)
+            self.aircraft_info = AircraftInfo(status="nogo", name="Aircraft")
+
+        self.set_connection_state(connection_status, data_status, self.aircraft_info)
 
-        return connection_status, data_status, aircraft_info
+    def on_icao_changed(self, icao):
+        self.icao_supported = icao.startswith("C172")  # Placeholder – replace with config-based check
+        self.update_connection_state()
 
     def is_icao_supported(self):
-        icao = self.telemetry.get_icao()
-        return icao.startswith("C172")  # Placeholder – replace with config-based check
+        return self.icao_supported
 
     def run(self):
         self._send_command('Run')
@@ -154,7 +182,7 @@ class Sim:
         self.beacon.send_bytes(msg, self.xplane_addr)
 
     def fin(self):
-        self.telemetry.close()
+        self.telemetry.close()   # closes and unlinks the telemetry hub if this process created it
         self.beacon.close()
         self.heartbeat.close()
 
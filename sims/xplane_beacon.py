@@ -64,8 +64,8 @@ class XplaneBeacon:
         except Exception as e:
             logging.warning(f"Failed to send beacon bytes message to {addr}: {e}")
 
-    def close():
-        self.beacon.close()
+    def close(self):
+        self.beacon.close_socket()
         
 if __name__ == "__main__":    
     logging.basicConfig(level=logging.INFO)
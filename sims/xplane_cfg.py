@@ -5,5 +5,23 @@ HEARTBEAT_PORT = 10030
 MCAST_GRP = '239.255.1.1'
 MCAST_PORT = 49707
 
+# telemetry jitter buffer: frames are resampled onto the control loop clock TELEMETRY_TARGET_DELAY
+# seconds behind the sender (cover its frame interval plus jitter), gaps are bridged by extrapolating
+# for up to TELEMETRY_MAX_EXTRAPOLATION seconds, no frames for TELEMETRY_TIMEOUT seconds is data loss
+TELEMETRY_TARGET_DELAY = 0.05
+TELEMETRY_MAX_EXTRAPOLATION = 0.1
+TELEMETRY_TIMEOUT = 0.5
+# multicast group the X-Plane plugin sends telemetry to (MULTICAST_GROUP in PI_Mdx_telemetry.py),
+# None when the plugin sends to each console that registered with InitComs
+TELEMETRY_MULTICAST_GROUP = None
+# reconnection: until telemetry arrives InitComs is sent every INITCOMS_MIN_INTERVAL seconds, doubling up to
+# INITCOMS_MAX_INTERVAL. Telemetry is accepted whatever the heartbeat says and is only declared lost
+# TELEMETRY_LOSS_GRACE seconds after the last packet arrived (motion already stops TELEMETRY_TIMEOUT after it)
+INITCOMS_MIN_INTERVAL = 0.05
+INITCOMS_MAX_INTERVAL = 1.0
+TELEMETRY_LOSS_GRACE = 1.0
+# republish received telemetry to local subscribers (recorder, plotting) through shared memory
+TELEMETRY_HUB = True
+
 norm_factors = [1.2, 1.2, 0.5, -3.0, 2.2, -.3] # gain factors for transform, set negative to invert
 washout_time = [12, 12, 12, 0, 0, 0]  #  washout_time is number of seconds to decay below 2%
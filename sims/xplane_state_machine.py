@@ -3,8 +3,7 @@ import logging
 import copy
 from abc import ABC, abstractmethod
 from enum import Enum
-from .xplane_cfg import TELEMETRY_CMD_PORT
-from .shared_types import AircraftInfo
+from .xplane_cfg import TELEMETRY_CMD_PORT, INITCOMS_MIN_INTERVAL, INITCOMS_MAX_INTERVAL, TELEMETRY_LOSS_GRACE
 
 
 class SimState(Enum):
@@ -15,12 +14,15 @@ class SimState(Enum):
 
 
 class BaseState(ABC):
+    status_message = None   # reported once on entering the state
+
     def __init__(self, machine):
         self.machine = machine
         self.sim = machine.sim
 
     def on_enter(self):
-        pass
+        if self.status_message:
+            self.sim.report_state_cb(self.status_message)
 
     def on_exit(self):
         pass
@@ -29,15 +31,43 @@ class BaseState(ABC):
     def handle(self, washout_callback):
         pass
 
+    def query_heartbeat(self, now):
+        hb_ok, app_running = self.sim.heartbeat.query_status(now)
+        if hb_ok != self.sim.heartbeat_ok or app_running != self.sim.xplane_running:
+            if hb_ok and not self.sim.heartbeat_ok:
+                self.sim.initcoms_interval = INITCOMS_MIN_INTERVAL   # sim PC is back, register quickly
+            self.sim.heartbeat_ok = hb_ok
+            self.sim.xplane_running = app_running
+            self.sim.update_connection_state()
+        return hb_ok, app_running
+
     def send_initcoms_if_due(self, now):
-        if now - self.sim.last_initcoms_time > self.sim.INITCOMS_INTERVAL:
+        """ Register with the plugin, retried quickly at first then backing off to INITCOMS_MAX_INTERVAL. """
+        if now - self.sim.last_initcoms_time > self.sim.initcoms_interval:
             try:
                 self.sim.telemetry.send("InitComs")
                 self.sim.last_initcoms_time = now
+                self.sim.initcoms_interval = min(self.sim.initcoms_interval * 2, INITCOMS_MAX_INTERVAL)
                 logging.debug("Sent InitComs to X-Plane")
             except Exception as e:
                 logging.warning(f"[InitComs] Send failed: {e}")
 
+    def wait_for_telemetry(self, washout_callback, now):
+        """
+        Telemetry is proof of life: as soon as frames arrive go to RECEIVING_DATAREFS and
+        return the first frame, whatever the heartbeat state. Returns None while waiting.
+        """
+        self.send_initcoms_if_due(now)
+        if self.sim.telemetry.get_telemetry() is None:
+            return None
+        self.sim.report_state_cb("Telemetry received")
+        if self.sim.situation_load_started:
+            logging.info("Flight mode load completed — pausing sim")
+            self.sim.pause()
+            self.sim.situation_load_started = False
+        self.machine.transition_to(SimState.RECEIVING_DATAREFS)
+        return self.machine.handle(washout_callback)
+
 
 class SimStateMachine:
     def __init__(self, sim):
@@ -57,100 +87,81 @@ class SimStateMachine:
         self.current_state = self.states[state_enum]
         self.sim.state = state_enum
         self.current_state.on_enter()
+        self.sim.update_connection_state()
 
     def handle(self, washout_callback):
         return self.current_state.handle(washout_callback)
 
 
 class WaitingHeartbeatState(BaseState):
-    def handle(self, washout_callback):
-        self.sim.report_state_cb("Waiting for heartbeat...")
+    status_message = "Waiting for heartbeat..."
 
+    def handle(self, washout_callback):
         now = time.time()
-        hb_ok, app_running = self.sim.heartbeat.query_status(now)
-        self.sim.heartbeat_ok = hb_ok
-        self.sim.xplane_running = app_running
-
+        hb_ok, app_running = self.query_heartbeat(now)
         if hb_ok:
             self.machine.transition_to(SimState.WAITING_XPLANE)
-
-        return None
+        return self.wait_for_telemetry(washout_callback, now)
 
 
 class WaitingXplaneState(BaseState):
-    def handle(self, washout_callback):
-        self.sim.report_state_cb("Waiting for X-Plane...")
+    status_message = "Waiting for X-Plane..."
 
+    def handle(self, washout_callback):
         now = time.time()
-        hb_ok, app_running = self.sim.heartbeat.query_status(now)
-        self.sim.heartbeat_ok = hb_ok
-        self.sim.xplane_running = app_running
-
+        hb_ok, app_running = self.query_heartbeat(now)
         if not hb_ok:
             self.machine.transition_to(SimState.WAITING_HEARTBEAT)
         elif app_running:
             self.machine.transition_to(SimState.WAITING_DATAREFS)
-
-        return None
+        return self.wait_for_telemetry(washout_callback, now)
 
 
 class WaitingDatarefsState(BaseState):
-    def handle(self, washout_callback):
-        self.sim.report_state_cb("Waiting for datarefs...")
+    status_message = "Waiting for datarefs..."
 
+    def handle(self, washout_callback):
         now = time.time()
-        hb_ok, app_running = self.sim.heartbeat.query_status(now)
-        self.sim.heartbeat_ok = hb_ok
-        self.sim.xplane_running = app_running
-
-        self.send_initcoms_if_due(now)
-
+        hb_ok, app_running = self.query_heartbeat(now)
         if not hb_ok:
             self.machine.transition_to(SimState.WAITING_HEARTBEAT)
-            return None
-
-        if not app_running:
+        elif not app_running:
             self.machine.transition_to(SimState.WAITING_XPLANE)
-            return None
-
-        xyzrpy = self.sim.telemetry.get_telemetry()
-        if xyzrpy:
-            self.sim.report_state_cb("Telemetry received")
-            if self.sim.situation_load_started:
-                logging.info("Flight mode load completed — pausing sim")
-                self.sim.pause()
-                self.sim.situation_load_started = False
-            self.machine.transition_to(SimState.RECEIVING_DATAREFS)
-
-        return None
+        return self.wait_for_telemetry(washout_callback, now)
 
 
 class ReceivingDatarefsState(BaseState):
+    def on_enter(self):
+        self.last_frame_time = time.time()
+        self.next_heartbeat_poll = self.last_frame_time
+        self.sim.telemetry_resumed(self.last_frame_time)
+
     def handle(self, washout_callback):
+        # status is event driven (heartbeat changes, ICAO changes via the telemetry), nothing is
+        # recomputed per frame; the heartbeat is only polled a few times per ping interval
         try:
             now = time.time()
-            hb_ok, app_running = self.sim.heartbeat.query_status(now)
-            self.sim.heartbeat_ok = hb_ok
-            self.sim.xplane_running = app_running
-
-            if not hb_ok or not app_running:
-                self.machine.transition_to(SimState.WAITING_HEARTBEAT)
-                return None
+            if now >= self.next_heartbeat_poll:
+                self.next_heartbeat_poll = now + self.sim.HEARTBEAT_INTERVAL / 4
+                self.query_heartbeat(now)   # status only, telemetry decides the state
 
             xyzrpy = self.sim.telemetry.get_telemetry()
-            supported = self.sim.is_icao_supported()
-            self.sim.aircraft_info = AircraftInfo(
-                status="ok" if supported else "nogo",
-                name=self.sim.telemetry.get_icao()
-            )
-
             if xyzrpy:
                 if washout_callback:
                     return washout_callback(copy.copy(xyzrpy))
                 return xyzrpy
-            else:
-                self.machine.transition_to(SimState.WAITING_DATAREFS)
-                return None
+            last_arrival = self.sim.telemetry.last_arrival or self.last_frame_time
+            if now - last_arrival > TELEMETRY_LOSS_GRACE:
+                # timed from the last packet, not the last (interpolated) frame get_telemetry returned
+                self.sim.telemetry_lost(now)
+                self.sim.initcoms_interval = INITCOMS_MIN_INTERVAL
+                if not self.sim.heartbeat_ok:
+                    self.machine.transition_to(SimState.WAITING_HEARTBEAT)
+                elif not self.sim.xplane_running:
+                    self.machine.transition_to(SimState.WAITING_XPLANE)
+                else:
+                    self.machine.transition_to(SimState.WAITING_DATAREFS)
+            return None
 
         except Exception as e:
             logging.error("Exception in ReceivingDatarefsState:", exc_info=True)
@@ -1,54 +1,170 @@
 from common.udp_tx_rx import UdpReceive
+from common.jitter_buffer import JitterBuffer
+from common.telemetry_hub import TelemetryHub, TelemetrySubscriber
+from .xplane_cfg import TELEMETRY_TARGET_DELAY, TELEMETRY_MAX_EXTRAPOLATION, TELEMETRY_TIMEOUT, TELEMETRY_HUB
+from .xplane_cfg import TELEMETRY_MULTICAST_GROUP
 import json
+import threading
+import time
+import struct
+import logging
+
+log = logging.getLogger(__name__)
+
+# binary telemetry from PI_Mdx_telemetry.py (TELEMETRY_FORMAT "binary"), must match the plugin:
+# magic, version, flags, ts, g_axil, g_side, g_nrml, Prad, Qrad, Rrad, phi, theta, icao (NUL padded)
+TELEMETRY_MAGIC = b"XT"
+TELEMETRY_VERSION = 1
+TELEMETRY_PACKET = struct.Struct("<2sBBd8f8s")
 
 class XplaneTelemetry:
-    def __init__(self, addr, norm_factors):
+    """
+    Receives telemetry from the X-Plane plugin and resamples it onto the control loop clock.
+
+    Every received frame goes into a jitter buffer, timestamped with its sampling time in
+    X-Plane (converted to this PC's clock) when the plugin sends one and the clock offset
+    is known, otherwise with its arrival time. get_telemetry returns the interpolated
+    frame TELEMETRY_TARGET_DELAY seconds in the past.
+
+    The process that owns the port republishes every packet to the local telemetry hub
+    (common/telemetry_hub.py) if TELEMETRY_HUB is set. With subscribe=True the packets are
+    read from that hub instead, so tools can run alongside the core; commands are not sent.
+
+    Packets are the plugin's binary format or its JSON message, both are accepted.
+    """
+    def __init__(self, addr, norm_factors, subscribe=False):
         self.addr = addr  # (ip, port) tuple
         self.send_addr = (addr[0], addr[1] + 1)
         self.norm_factors = norm_factors
-        self.telemetry = UdpReceive(addr[1])
+        self.hub = None
+        self.hub_lock = threading.Lock()   # close() waits for a publish in progress on the listener thread
+        self.subscribed = subscribe
+        if subscribe:
+            self.telemetry = TelemetrySubscriber.attach(policy="lossless")
+        else:
+            if TELEMETRY_HUB:
+                try:
+                    self.hub = TelemetryHub.create()
+                except Exception as e:
+                    log.warning("Telemetry hub not available, telemetry is not shared: %s", e)
+            # joined to the multicast group if the plugin uses one, unicast telemetry is received as well
+            self.telemetry = UdpReceive(addr[1], encoding=None, multicast_group=TELEMETRY_MULTICAST_GROUP,
+                                        timestamp=True, on_receive=self.publish if self.hub else None)
+        self.buffer = JitterBuffer(TELEMETRY_TARGET_DELAY, TELEMETRY_MAX_EXTRAPOLATION)
+        self.to_local_time = lambda remote_time: None   # set by set_clock, None until the offset is known
+        self.use_origin_time = False   # timebase of the buffered frames
         self.last_xyzrpy = None
         self.last_icao = "Aircraft"
+        self.last_icao_bytes = None   # ICAO field of the last binary packet, decoded only when it changes
+        self.on_icao_changed = None   # called with the new ICAO when the aircraft changes
+        self.last_origin_time = None  # local time of the last frame returned, if origin timestamps are in use
+        self.last_arrival = None      # time.time() the last packet arrived
+        self.resume_time = None       # arrival of the first packet after a gap longer than TELEMETRY_TIMEOUT
         self.save_as_csv = True
 
-    def get_telemetry(self):
-        msg = None
-        xyzrpy = [0] * 6
+    def set_clock(self, to_local_time):
+        """ to_local_time converts sender time.time() values to this PC's clock, returns None if unknown. """
+        self.to_local_time = to_local_time
 
-        while self.telemetry.available() > 0:
-            msg = self.telemetry.get()
+    def publish(self, payload, addr, arrival):
+        """ Listener thread: republish a packet to the local telemetry hub. """
+        with self.hub_lock:
+            if self.hub:
+                self.hub.publish(payload, addr, arrival)
+
+    def keep_hub_alive(self):
+        """ Called every frame, the hub stays in use while no packets arrive. """
+        if self.hub:
+            self.hub.touch()
 
-        if msg:
+    def receive(self):
+        """ Parse all queued messages into the jitter buffer. """
+        while self.telemetry.available() > 0:
+            addr, payload, arrival = self.telemetry.get()
             try:
-                telemetry_data = json.loads(msg[1])
-                nf = self.norm_factors
-                xyzrpy = [
-                    telemetry_data["g_axil"] * nf[0],   # X translation
-                    telemetry_data["g_side"] * nf[1],   # Y translation
-                    telemetry_data["g_nrml"] * nf[2],   # Z translation
-                    # telemetry_data["Prad"] * nf[3],   # Roll rate (angular velocity)
-                    telemetry_data["phi"] * nf[3],      # Rollangle   
-                    # telemetry_data["Qrad"] * nf[4],   # Pitch rate (angular velocity)
-                    telemetry_data["theta"] * nf[4],    # pitch angle 
-                    telemetry_data["Rrad"] * nf[5]      # Yaw rate (angular velocity)
-                ]
-                self.last_xyzrpy = tuple(xyzrpy)
-                self.last_icao = telemetry_data.get("icao", "Aircraft")
-
-                return self.last_xyzrpy
-                
+                xyzrpy, origin = self.parse(payload)
             except Exception as e:
                 print(f"Error parsing telemetry: {e}")
-        return None
+                continue
+
+            if self.last_arrival is None or arrival - self.last_arrival > TELEMETRY_TIMEOUT:
+                self.resume_time = arrival
+            self.last_arrival = arrival
+            timestamp = self.to_local_time(origin) if origin is not None else None
+            if (timestamp is not None) != self.use_origin_time:
+                # timebase changed (clock offset became known or was lost), old frames are not comparable
+                self.use_origin_time = timestamp is not None
+                self.buffer.clear()
+            self.buffer.push(timestamp if self.use_origin_time else arrival, xyzrpy)
+
+    def parse(self, payload):
+        """ Returns the normalized transform and the sender's ts (None if not sent) of a telemetry packet. """
+        nf = self.norm_factors
+        if payload[:2] == TELEMETRY_MAGIC:
+            _, version, _, origin, g_axil, g_side, g_nrml, _, _, rrad, phi, theta, icao = TELEMETRY_PACKET.unpack_from(payload)
+            if version != TELEMETRY_VERSION:
+                raise ValueError(f"unsupported telemetry version {version}")
+            if icao != self.last_icao_bytes:
+                self.last_icao_bytes = icao
+                self.set_icao(icao.rstrip(b"\0").decode("utf-8", "replace") or "Aircraft")
+        else:
+            telemetry_data = json.loads(payload)
+            g_axil, g_side, g_nrml = telemetry_data["g_axil"], telemetry_data["g_side"], telemetry_data["g_nrml"]
+            phi, theta, rrad = telemetry_data["phi"], telemetry_data["theta"], telemetry_data["Rrad"]
+            icao = telemetry_data.get("icao", "Aircraft")
+            if icao != self.last_icao:
+                self.set_icao(icao)
+            origin = telemetry_data.get("ts")
+        xyzrpy = [
+            g_axil * nf[0],   # X translation
+            g_side * nf[1],   # Y translation
+            g_nrml * nf[2],   # Z translation
+            phi * nf[3],      # Roll angle (Prad, the roll rate, is not used)
+            theta * nf[4],    # pitch angle (Qrad, the pitch rate, is not used)
+            rrad * nf[5]      # Yaw rate (angular velocity)
+        ]
+        return xyzrpy, origin
+
+    def set_icao(self, icao):
+        self.last_icao = icao
+        if self.on_icao_changed:
+            self.on_icao_changed(icao)
+
+    def get_telemetry(self):
+        """
+        Returns the resampled transform, or None if no telemetry arrived for TELEMETRY_TIMEOUT seconds.
+        A frame is returned on every call while telemetry is live, last_arrival tells when a new packet came.
+        """
+        self.receive()
+        now = time.time()
+        age = self.buffer.age(now)
+        if age is None or age > TELEMETRY_TIMEOUT:
+            return None
+        self.last_xyzrpy = self.buffer.sample(now)
+        self.last_origin_time = now - self.buffer.target_delay if self.use_origin_time else None
+        return self.last_xyzrpy
 
     def get_icao(self):
         return self.last_icao
 
+    def get_origin_time(self):
+        return self.last_origin_time
+
     def send(self, msg):
+        if self.subscribed:
+            return   # the process that owns the port talks to X-Plane
         try:
             self.telemetry.send(msg, self.send_addr)
         except Exception as e:
             print(f"Failed to send telemetry command: {e}")
 
     def close(self):
-        self.telemetry.close()
+        if self.subscribed:
+            self.telemetry.close()
+            return
+        self.telemetry.on_receive = None
+        self.telemetry.close_socket()
+        with self.hub_lock:
+            if self.hub:
+                self.hub.close()
+                self.hub = None
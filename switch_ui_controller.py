@@ -1,5 +1,6 @@
 import logging
 from PyQt5 import QtCore
+import sim_config
 from common.serial_switch_json_reader import SerialSwitchReader, SwitchIndex
 
 log = logging.getLogger(__name__)
@@ -29,6 +30,10 @@ class SwitchUIController(QtCore.QObject):
             SwitchIndex.ACTIVATE: self.update_activate_state,
         }
 
+        # switches are polled on their own timer, independent of UI refreshes
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.timeout.connect(self.poll)
+
     def begin(self, port):
         log.info(f"SwitchUIController: Searching for switches on {port}")
         if self.status_callback:
@@ -54,6 +59,7 @@ class SwitchUIController(QtCore.QObject):
 
                 log.info("Activate switch is in valid position.")
                 self.validActivateReceived.emit()
+                self.poll_timer.start(sim_config.SWITCH_POLL_INTERVAL_MS)
                 return True
             else:
                 if self.status_callback:
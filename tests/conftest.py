@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import pytest
+
+# modules are imported from the repository root, as the applications do
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sim_config
+import siminterface_core
+from siminterface_core import SimInterfaceCore
+from sims.sim_adapter import SimAdapter
+from sims.shared_types import AircraftInfo
+
+FAKE_TRANSFORM = [0.1, -0.1, 0.2, 0.05, -0.05, 0.02]
+
+
+class FakeSim(SimAdapter):
+    """ Always connected, returns a constant transform sampled 10 ms ago. """
+    name = "Fake"
+
+    def __init__(self, sleep_func, frame, report_state_cb, sim_ip=None):
+        super().__init__(sleep_func, frame, report_state_cb, sim_ip)
+        self.set_connection_state("ok", "ok", AircraftInfo(status="ok", name="Fake"))
+        self.fin_calls = 0
+
+    def service(self, washout_callback=None):
+        transform = list(FAKE_TRANSFORM)
+        return washout_callback(transform) if washout_callback else transform
+
+    def get_frame_origin_time(self):
+        return time.time() - 0.01
+
+    def fin(self):
+        self.fin_calls += 1
+
+
+@pytest.fixture
+def make_core(monkeypatch):
+    """ make_core(output_rate_hz, state) returns a set up core with FakeSim in the given platform state. """
+    monkeypatch.setattr(siminterface_core, "load_adapter", lambda name: FakeSim)
+    monkeypatch.setattr(sim_config, "FESTO_IP", "127.0.0.1")
+    monkeypatch.setattr(sim_config, "ECHO_DESTINATIONS", [("127.0.0.1", 10020)])
+    monkeypatch.setattr(sim_config, "PREDICTOR_LEAD_TIMES", [0.05] * 6)
+    cores = []
+
+    def make(output_rate_hz=0, state="running"):
+        monkeypatch.setattr(sim_config, "OUTPUT_RATE_HZ", output_rate_hz)
+        core = SimInterfaceCore(sleep_func=lambda s: None, data_period_ms=10)
+        cores.append(core)
+        core.setup()
+        assert core.is_started
+        core.update_state("deactivated")
+        if state == "running":
+            core.update_state("enabled")
+            for _ in range(2000):
+                core.data_update()
+                if not core.transition_state:
+                    break
+            core.update_state("running")
+        for _ in range(5):   # the output thread reports latency once it has sent a frame
+            core.data_update()
+            time.sleep(core.data_period)
+        assert core.state == state and not core.transition_state
+        return core
+
+    yield make
+    for core in cores:
+        core.cleanup_on_exit()
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+from output.calibration import MuscleModel, calibrate, table_errors
+from output.festo_emulator import FestoEmulator
+from output.festo_itf import Festo
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def emulator():
+    emulator = FestoEmulator(port=0, host="127.0.0.1", time_constant=0.05).start()
+    yield emulator
+    emulator.stop()
+
+
+def test_emulator_calibration_within_the_compression_error_bound(emulator, tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)   # the PtoD sweeps are named relative to the repository
+    festo = Festo("127.0.0.1", emulator.port)
+    festo.enable_poll_pressure(True)
+    model = MuscleModel(emulator)
+    csv_path = str(tmp_path / "DtoP.csv")
+    loads = (18,)
+
+    up_rows, down_rows = calibrate(festo, model.lengths, loads, model.max_length, 251, csv_path, model.set_load,
+                                   rate=1500, cycles=1, settle=0.2)
+    assert len(up_rows[0]) == len(down_rows[0]) == 251
+    assert np.all(np.diff(up_rows[0]) >= 0) and np.all(np.diff(down_rows[0]) >= 0)
+
+    (up, down), = table_errors(csv_path, model, loads)
+    for err in (up, down):
+        assert np.abs(err).max() < 4.0   # mm
+        assert abs(err.mean()) < 2.0
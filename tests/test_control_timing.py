@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from common.shared_state import SharedState, MAX_STAGES
+from siminterface_control import ControlRunner
+from siminterface_proxy import CoreProxy
+
+
+@pytest.fixture
+def shared():
+    shared = SharedState.create(f"simopconsole_test_{os.getpid()}")
+    yield shared
+    shared.close()
+
+
+def publish_timing(runner):
+    runner.last_timing_publish = 0   # due now
+    runner.publish()
+
+
+def test_stage_names_follow_the_rows(make_core, shared):
+    core = make_core(output_rate_hz=100, state="deactivated")
+    runner = ControlRunner(core, shared)
+    proxy = CoreProxy(SharedState.attach(shared.shm.name))
+    try:
+        publish_timing(runner)
+        timing = proxy.get_stage_timing()
+        assert "out_send" in timing and list(timing) == list(core.get_stage_timing())
+
+        core.muscle_output.suspend_output_thread()   # as a pressure ramp or calibration does
+        core.data_update()
+        publish_timing(runner)
+        expected = core.get_stage_timing()
+        timing = proxy.get_stage_timing()
+        assert "out_send" not in timing and list(timing) == list(expected)
+        assert timing["frame"] == pytest.approx(expected["frame"])
+    finally:
+        proxy.shared.close()
+
+
+def test_stages_past_the_block_are_logged(make_core, shared, monkeypatch, caplog):
+    core = make_core(state="deactivated")
+    runner = ControlRunner(core, shared)
+    stages = {f"rig{i} festo_send": (i, 0, 0, 0, 0) for i in range(MAX_STAGES + 4)}
+    monkeypatch.setattr(core, "get_stage_timing", lambda: stages)
+    publish_timing(runner)
+    publish_timing(runner)
+    state = shared.read()
+    assert state["nbr_stages"] == MAX_STAGES
+    assert state["stage_names"][-1].decode() == f"rig{MAX_STAGES - 1} festo_send"
+    assert sum("only the first" in r.message for r in caplog.records) == 1
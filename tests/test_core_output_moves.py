@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("output_rate_hz", [0, 100])
+def test_pressure_ramp_is_stepped_by_the_frame_loop(make_core, output_rate_hz):
+    core = make_core(output_rate_hz, state="deactivated")
+    out = core.muscle_output
+    out.slow_pressure_move(0, 3000, 100)   # 10 frames of 10 ms
+    assert out.sender is None              # the ramp sends the pressures
+    sent = []
+    for _ in range(20):
+        core.data_update()
+        sent.append(out.sent_pressures[0])
+    assert sent[:10] == sorted(sent[:10]) and sent[9] == 3000
+    assert out.move_kind is None and not out.mover.active
+    assert (out.sender is not None) == bool(output_rate_hz)   # restarted once the ramp is done
+
+
+def test_length_move_owns_the_output_while_running(make_core):
+    core = make_core()
+    out = core.muscle_output
+    target = [950] * 6
+    out.slow_move(core.muscle_lengths, target, 5)
+    core.data_update()
+    assert core.muscle_lengths != target and out.mover.active
+    for _ in range(1000):
+        core.data_update()
+        if not out.mover.active:
+            break
+    assert core.muscle_lengths == target
+    core.data_update()    # the sim drives the platform again
+    assert core.muscle_lengths != target
+
+
+def test_calibration_sweep_owns_the_output(make_core, tmp_path):
+    core = make_core(100, state="deactivated")
+    out = core.muscle_output
+    lengths = lambda: [1000 - out.sent_pressures[0] / 40] * 6
+    assert core.start_calibration(lengths, 13, rate=60000, cycles=1, settle=0.02)   # 0.1 s ramps
+    assert out.sender is None
+    core.update_state("enabled")          # refused until the sweep is done
+    assert core.state == "deactivated"
+    sent = []
+    while out.sweep:
+        core.data_update()
+        sent.append(out.sent_pressures[0])
+    assert max(sent) == 6000 and sent[-1] == 0
+    assert out.sender is not None         # output thread restarted
+    rows = core.write_calibration(str(tmp_path / "cal.csv"))
+    assert len(rows[0]) == 1 and (tmp_path / "cal.csv").read_text().startswith("# weights,13")
+
+
+def test_calibration_refused_while_running(make_core):
+    core = make_core()
+    assert not core.start_calibration(lambda: [1000] * 6, 13)
+    assert core.muscle_output.sweep is None
+
+
+def test_moves_use_the_configured_motion_profile(make_core, monkeypatch):
+    import sim_config
+    monkeypatch.setattr(sim_config, "MOTION_PROFILE", "trapezoid")
+    monkeypatch.setattr(sim_config, "MOTION_MAX_ACCEL", 40)
+    core = make_core(state="deactivated")
+    mover = core.muscle_output.mover
+    assert (mover.kind, mover.max_accel, mover.period) == ("trapezoid", 40, core.data_period)
+    start, end = [800] * 6, [900] * 6
+    core.muscle_output.slow_move(start, end, 5)
+    assert np.array_equal(mover.path, core.transition_motion.plan(start, end, max_velocity=50))
@@ -0,0 +1,18 @@
+def test_cleanup_releases_the_sim(make_core):
+    core = make_core(state="deactivated")
+    core.cleanup_on_exit()
+    assert core.sim.fin_calls == 1
+
+
+def test_unsupported_sim_reports_it(monkeypatch):
+    import sim_config
+    from siminterface_core import SimInterfaceCore
+    index = [sim[1] for sim in sim_config.AVAILABLE_SIMS].index("fs2020")
+    monkeypatch.setattr(sim_config, "DEFAULT_SIM_INDEX", index)
+    core = SimInterfaceCore(sleep_func=lambda s: None, data_period_ms=10)
+    status = []
+    core.simStatusChanged.connect(status.append)
+    core.load_sim()
+    assert core.is_started and "FS2020 not supported" in status
+    assert core.connection_state.conn_status == "nogo"
+    assert core.sim.read() is None
@@ -0,0 +1,21 @@
+import pytest
+
+from siminterface_core import PIPELINE_STAGES
+from conftest import FAKE_TRANSFORM
+
+
+def counts(core):
+    return {stage: summary[0] for stage, summary in core.stage_timers.summary().items()}
+
+
+@pytest.mark.parametrize("output_rate_hz", [0, 100])
+def test_every_stage_is_timed_in_a_running_frame(make_core, output_rate_hz):
+    core = make_core(output_rate_hz)
+    before = counts(core)
+    core.data_update()
+    after = counts(core)
+    # with the output thread the d_to_p conversion is on that thread (see get_stage_timing)
+    expected = [s for s in PIPELINE_STAGES if not (output_rate_hz and s == "d_to_p")]
+    missing = [s for s in expected if after[s] <= before[s]]
+    assert not missing, f"stages without a sample: {missing}"
+    assert core.raw_transform == FAKE_TRANSFORM
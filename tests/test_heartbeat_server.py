@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from sims.heartbeat_server import ProcScanDetector
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc"), reason="ProcScanDetector reads /proc")
+
+SLEEPER = "import time; time.sleep(30)"
+
+
+def wait_for(detector, name, expected, timeout=2.0):
+    end = time.time() + timeout
+    while detector.is_running(name) != expected and time.time() < end:
+        time.sleep(0.02)
+    return detector.is_running(name)
+
+
+def test_program_name_is_detected():
+    name = f"fake_target_{os.getpid()}"
+    detector = ProcScanDetector()
+    target = subprocess.Popen(["/opt/" + name, "-c", SLEEPER], executable=sys.executable)
+    try:
+        assert wait_for(detector, name, True)
+    finally:
+        target.kill()
+        target.wait()
+    assert not detector.is_running(name)
+
+
+def test_name_in_arguments_is_not_detected():
+    name = f"fake_target_{os.getpid()}"
+    decoy = subprocess.Popen([sys.executable, "-c", SLEEPER, f"{name} 12/Log.txt"])
+    try:
+        time.sleep(0.2)
+        assert not ProcScanDetector().is_running(name)
+    finally:
+        decoy.kill()
+        decoy.wait()
+
+
+def test_own_argv_is_not_detected():
+    name = f"fake_target_{os.getpid()}"
+    code = "import sys; from sims.heartbeat_server import ProcScanDetector; print(ProcScanDetector().is_running(sys.argv[1]))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.check_output([sys.executable, "-c", code, name], cwd=root).decode().strip() == "False"
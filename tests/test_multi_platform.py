@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+
+from kinematics import cfg_SuspendedChair, cfg_SuspendedPlatform
+from output.motion_profile import MotionProfileExecutor
+from output.multi_platform import PlatformArray, create_platform
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def chair_config():
+    cfg = cfg_SuspendedChair.PlatformConfig()
+    cfg.MUSCLE_PRESSURE_MAPPING_FILE = "output/DtoP.csv"   # a 200 mm range table, narrower than the platform's
+    return cfg
+
+
+@pytest.fixture
+def make_rigs(monkeypatch):
+    """ make_rigs() returns rigs of different geometry and tables, each call builds an independent set. """
+    monkeypatch.chdir(ROOT)   # the configs name their d_to_p tables relative to the repository
+    rigs = []
+
+    def make():
+        configs = [cfg_SuspendedPlatform.PlatformConfig(), chair_config(), cfg_SuspendedPlatform.PlatformConfig()]
+        made = [create_platform(f"rig{i}", cfg, "127.0.0.1", lambda s: None, 0.05, load_level=i % 3)
+                for i, cfg in enumerate(configs)]
+        made[2].k.set_intensity(0.6)
+        rigs.extend(made)
+        return made
+
+    yield make
+    for rig in rigs:
+        rig.muscle_output.stop_output_thread()
+
+
+def test_batch_matches_each_rig(make_rigs):
+    batch_rigs, single_rigs = make_rigs(), make_rigs()
+    array = PlatformArray(batch_rigs)
+    array.update_conditioning(np.ones(6), 1.0, 100, np.ones(6), 1.0)
+    for rig in single_rigs:
+        rig.conditioner.build(np.ones(6), 1.0, 100, rig.cfg.INVERT_AXIS, np.ones(6), 1.0,
+                              rig.cfg.LIMITS_1DOF_TRANFORM, rig.cfg.SWAP_ROLL_PITCH)
+
+    # a random walk with occasional jumps, so the hysteresis branches switch both ways
+    rng = np.random.default_rng(7)
+    steps = rng.normal(0, 0.08, (300, 6))
+    steps[rng.random(300) < 0.05] *= 8
+    transforms = np.clip(np.cumsum(steps, axis=0), -1, 1)
+    branches = set()
+    for frame, transform in enumerate(transforms):
+        if frame == 150:   # load change part way
+            for rig in batch_rigs + single_rigs:
+                rig.set_load_level((rig.load_level + 1) % 3)
+        requests = array.condition(transform)
+        lengths = array.kinematics(requests)
+        pressures = array.pressures(lengths)
+        for i, rig in enumerate(single_rigs):
+            request = rig.conditioner.apply(transform)
+            assert np.allclose(requests[i], request)
+            expected_lengths = rig.k.muscle_lengths(request)
+            assert lengths[i].tolist() == expected_lengths
+            assert pressures[i].tolist() == rig.DtoP.muscle_length_to_pressure(expected_lengths).tolist()
+            assert np.array_equal(batch_rigs[i].DtoP.active_row, rig.DtoP.active_row)
+            branches.update(rig.DtoP.active_row.tolist())
+    assert branches == {0, 1}
+
+
+def test_send_skips_rigs_in_transition(make_rigs):
+    rigs = make_rigs()
+    array = PlatformArray(rigs, motion_factory=lambda: MotionProfileExecutor(0.05))
+    sent = []
+    for i, rig in enumerate(rigs):
+        rig.muscle_output.set_muscle_lengths = lambda lengths, origin_time, pressures, i=i: sent.append(i)
+    moving = rigs[1]
+    moving.transition.start(moving.cfg.DEACTIVATED_MUSCLE_LENGTHS, [moving.cfg.MUSCLE_MAX_LENGTH - 50] * 6)
+    before = list(moving.muscle_lengths)
+
+    lengths = np.array([[rig.cfg.MUSCLE_MAX_LENGTH - 100] * 6 for rig in rigs])
+    array.send(lengths)
+    assert sorted(sent) == [0, 2]
+    assert moving.muscle_lengths == before
+    assert rigs[2].muscle_lengths == lengths[2].tolist()
+    array.close()
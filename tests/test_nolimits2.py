@@ -0,0 +1,58 @@
+import time
+
+from sims import nolimits2_cfg as config
+from sims.nolimits2 import (MessageParser, NoLimits2Client, encode_message, N_GET_TELEMETRY, N_TELEMETRY,
+                            IN_PLAY_MODE, PAUSED)
+from sims.nolimits2_emulator import NoLimits2Emulator
+from sims.sim_adapter import TelemetryFeed
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_pipelined_client_polls_at_the_control_rate():
+    emulator = NoLimits2Emulator(port=0, host="127.0.0.1", latency=0.02).start()
+    feed = TelemetryFeed(config.TELEMETRY_TARGET_DELAY, config.TELEMETRY_MAX_EXTRAPOLATION, config.TELEMETRY_TIMEOUT)
+    client = NoLimits2Client(("127.0.0.1", emulator.port), feed, config.norm_factors,
+                             config.POLL_HZ, config.PIPELINE_DEPTH).start()
+    try:
+        assert wait_for(lambda: client.connected and client.state_flags & IN_PLAY_MODE)
+        version = client.status_version
+        time.sleep(0.2)
+        frames, start = feed.nbr_frames, time.perf_counter()
+        time.sleep(1.0)
+        rate = (feed.nbr_frames - frames) / (time.perf_counter() - start)
+        # one request per round trip would give 1 / 0.02 s = 50 frames/s
+        assert rate >= 0.9 * config.POLL_HZ
+        assert feed.sample() is not None
+        assert client.status_version == version   # nothing changed while riding
+
+        emulator.paused = True
+        assert wait_for(lambda: client.state_flags & PAUSED)
+        emulator.coaster = 1
+        assert wait_for(lambda: client.coaster == 1)
+        assert client.status_version == version + 2
+    finally:
+        emulator.stop()
+        assert wait_for(lambda: not client.connected)
+        client.stop()
+
+
+def test_parser_resyncs_on_garbage_and_split_frames():
+    payload = bytes(range(76))
+    message = encode_message(N_TELEMETRY, 7, payload)
+    parser = MessageParser()
+    assert parser.feed(b"\x00garbage" + message[:5]) == []
+    assert parser.feed(message[5:20]) == []
+    assert parser.feed(message[20:] + encode_message(N_GET_TELEMETRY, 8)) == [(N_TELEMETRY, 7, payload),
+                                                                                (N_GET_TELEMETRY, 8, b"")]
+    assert parser.nbr_resyncs > 0 and not parser.buffer
+
+    # a start byte without a valid end is dropped and the next message is found
+    resyncs = parser.nbr_resyncs
+    assert parser.feed(b"N\x00\x05\x00\x00\x00\x01\x00\x02xyZ" + message) == [(N_TELEMETRY, 7, payload)]
+    assert parser.nbr_resyncs > resyncs
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from output import output_sender
+from output.d_to_p import DistanceToPressure
+from output.output_sender import OutputSender
+
+
+def make_d_to_p(threshold=5):
+    d_to_p = DistanceToPressure(251, 1000)
+    columns = np.arange(251)
+    d_to_p.d_to_p = np.stack([columns * 20, columns * 20 + 1])   # odd pressures are the down row
+    d_to_p.threshold = threshold
+    return d_to_p
+
+
+def branches(d_to_p, compressions):
+    return [int(d_to_p.muscle_compression_to_pressure([c] * 6)[0] % 2) for c in compressions]
+
+
+def test_hysteresis_branch_does_not_depend_on_the_call_rate():
+    # rise, fall, small wobble inside the band, rise again, as control frames at 20 Hz
+    keyframes = [0, 20, 40, 60, 80, 100, 90, 70, 50, 40, 43, 41, 50, 60, 80, 78, 75]
+    coarse = branches(make_d_to_p(), keyframes)
+    assert coarse == [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 1]
+
+    # the same movement upsampled ten times (as the output sender feeds it), branch at each keyframe
+    upsampled = np.concatenate([np.linspace(a, b, 10, endpoint=False) for a, b in zip(keyframes, keyframes[1:])]
+                               + [[keyframes[-1]]])
+    fine = branches(make_d_to_p(), upsampled.round().astype(int))
+    assert fine[::10] == coarse
+
+
+class Clock(object):
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(output_sender.time, "perf_counter", clock)
+    return clock
+
+
+def lengths(value):
+    return np.full(6, float(value))
+
+
+@pytest.mark.parametrize("interpolation", ["linear", "hermite"])
+def test_segment_end_points(clock, interpolation):
+    period = 0.05
+    sender = OutputSender(None, None, rate_hz=200, interpolation=interpolation)
+    sender.set_target(lengths(800))
+    assert np.array_equal(sender._evaluate(clock.t)[0], lengths(800))   # first target is taken directly
+    clock.t += period
+    sender.set_target(lengths(810))
+    assert np.array_equal(sender._evaluate(clock.t)[0], lengths(800))   # starts where the output is
+    clock.t += period
+    sender.set_target(lengths(830))
+    start = clock.t
+    assert np.allclose(sender._evaluate(start)[0], lengths(810))
+
+    # retargeted half way: the new segment starts from the current position
+    clock.t += period / 2
+    halfway, velocity = sender._evaluate(clock.t)
+    assert np.all(halfway > 810) and np.all(halfway < 830)
+    sender.set_target(lengths(840))
+    assert np.allclose(sender._evaluate(clock.t)[0], halfway)
+    if interpolation == "hermite":
+        assert np.allclose(sender.v0, velocity)   # no corner at the frame boundary
+        end = clock.t + sender.seg_duration * (1 - 1e-9)
+        assert np.allclose(sender._evaluate(end)[1], sender.v1)
+        assert np.allclose(sender.v1, (840 - 830) / sender.control_period)
+    assert np.allclose(sender._evaluate(clock.t + sender.seg_duration)[0], lengths(840))
+
+
+@pytest.mark.parametrize("interpolation", ["linear", "hermite"])
+def test_holds_at_the_last_target_when_the_next_is_late(clock, interpolation):
+    period = 0.05
+    sender = OutputSender(None, None, rate_hz=200, interpolation=interpolation)
+    for value in (800, 810, 820):
+        sender.set_target(lengths(value))
+        clock.t += period
+    for late in (period, 3 * period):
+        position, velocity = sender._evaluate(clock.t + late)
+        assert np.array_equal(position, lengths(820)) and not velocity.any()
+
+    # a gap past MAX_CONTROL_PERIOD is a restart, the output goes straight to the new target
+    clock.t += OutputSender.MAX_CONTROL_PERIOD
+    sender.set_target(lengths(900))
+    assert sender.seg_duration == 0
+    assert np.array_equal(sender._evaluate(clock.t)[0], lengths(900))
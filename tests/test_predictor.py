@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from output.predictor import AlphaBetaPredictor, estimate_lag
+
+DT = 0.02
+
+
+def first_order_platform(commands, latency=0.06, tau=0.1):
+    """ Lengths reached for the commanded lengths: a delay then a first order muscle response. """
+    delay = int(round(latency / DT))
+    delayed = np.vstack([np.repeat(commands[:1], delay, axis=0), commands[:len(commands) - delay]])
+    a = 1 - np.exp(-DT / tau)
+    out = np.empty_like(delayed)
+    out[0] = delayed[0]
+    for i in range(1, len(delayed)):
+        out[i] = out[i - 1] + a * (delayed[i] - out[i - 1])
+    return out
+
+
+def test_estimate_lag_recovers_a_known_shift():
+    t = np.arange(0, 20, 0.01)
+
+    def signal(t):
+        return np.sin(2 * np.pi * 0.7 * t) + 0.5 * np.sin(2 * np.pi * 1.9 * t + 1)
+
+    command = np.column_stack([signal(t), signal(t), np.ones_like(t)])
+    response = np.column_stack([signal(t - 0.137), signal(t - 0.05), np.ones_like(t)])
+    lags = estimate_lag(command, response, 0.01)
+    assert lags[0] == pytest.approx(0.137, abs=0.003)   # between samples, refined by the parabola
+    assert lags[1] == pytest.approx(0.05, abs=0.003)
+    assert np.isnan(lags[2])                             # no variation
+
+
+def test_prediction_cuts_the_lag_on_a_sine():
+    t = np.arange(0, 20, DT)
+    targets = 875 + 50 * np.sin(2 * np.pi * 0.5 * t)[:, None] * np.linspace(0.5, 1, 6)
+    uncompensated = estimate_lag(targets, first_order_platform(targets), DT)
+    assert np.all(uncompensated > 0.13)
+
+    predictor = AlphaBetaPredictor(uncompensated, limits=(750, 1000))
+    commands = np.array([predictor.update(z, i * DT) for i, z in enumerate(targets)])
+    compensated = estimate_lag(targets, first_order_platform(commands), DT)
+    assert np.all(np.abs(compensated) < 0.3 * uncompensated)
+
+
+def test_restart_after_a_gap():
+    predictor = AlphaBetaPredictor(0.1)
+    for i in range(10):
+        predictor.update(np.full(6, 800 + 5.0 * i), i * DT)
+    assert np.all(predictor.v > 0)
+    later = 9 * DT + AlphaBetaPredictor.RESTART_INTERVAL + 0.01
+    z = np.full(6, 900.0)
+    assert np.array_equal(predictor.update(z, later), z)   # no velocity carried over the gap
+    assert not predictor.v.any() and np.array_equal(predictor.x, z)
+
+
+def test_updates_closer_than_min_interval_leave_the_estimate():
+    reference, predictor = AlphaBetaPredictor(0.1), AlphaBetaPredictor(0.1)
+    for i in range(5):
+        for p in (reference, predictor):
+            p.update(np.full(6, 800 + 5.0 * i), i * DT)
+    x, v = predictor.x.copy(), predictor.v.copy()
+    predictor.update(np.full(6, 900.0), 4 * DT + AlphaBetaPredictor.MIN_INTERVAL / 2)
+    assert np.array_equal(predictor.x, x) and np.array_equal(predictor.v, v)
+
+    # the next interval is measured from the previous full update
+    for p in (reference, predictor):
+        p.update(np.full(6, 825.0), 5 * DT)
+    assert np.allclose(predictor.x, reference.x) and np.allclose(predictor.v, reference.v)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from output.pressure_control import PressureController
+
+DT = 0.01
+
+
+def run(controller, setpoints, measured, steps, start=0.0):
+    """ Returns the commands and the time after steps updates at DT. """
+    commands = [controller.update(setpoints, measured, start + i * DT) for i in range(steps)]
+    return np.array(commands), start + steps * DT
+
+
+def test_integral_stops_at_the_correction_limit():
+    controller = PressureController(kp=0.3, ki=2.0, max_correction=600, max_rate=1e9)
+    setpoints, measured = np.full(6, 3000.0), np.full(6, 2000.0)   # regulator 1000 mbar short
+    commands, now = run(controller, setpoints, measured, 500)
+    assert np.all(commands <= setpoints + 600)
+    assert np.allclose(commands[-1], setpoints + 600)
+    # the integral only grew until proportional (300) plus integral reached the limit
+    assert np.all(controller.integral <= 600 - 300 + 2.0 * 1000 * DT)
+
+    # so the correction leaves the limit as soon as the error reverses
+    commands, _ = run(controller, setpoints, np.full(6, 3100.0), 1, now)
+    assert np.all(commands[0] < setpoints + 600 - 300)
+
+
+def test_integral_is_clamped_without_proportional_gain():
+    controller = PressureController(kp=0.0, ki=50.0, max_correction=400, max_rate=1e9)
+    run(controller, np.full(6, 3000.0), np.full(6, 1000.0), 200)
+    assert np.all(np.abs(controller.integral) <= 400)
+    # one step of the integral would cross from one limit past the other, it still unwinds
+    commands, _ = run(controller, np.full(6, 1000.0), np.full(6, 3000.0), 200)
+    assert np.all(np.abs(controller.integral) <= 400) and np.all(controller.integral < 0)
+    assert np.allclose(commands[-1], 1000 - 400)
+
+
+def test_rate_limit_per_update_interval():
+    controller = PressureController(kp=1.0, ki=0.0, max_correction=600, max_rate=20000)
+    run(controller, np.full(6, 1000.0), np.full(6, 1000.0), 3)
+    commands, now = run(controller, np.full(6, 5000.0), np.full(6, 1000.0), 5, 3 * DT)
+    assert np.allclose(np.diff(commands[:, 0]), 20000 * DT)
+    assert np.allclose(commands[0], 1000 + 20000 * DT)
+    # a late update may move at most as far as 0.1 s allows
+    command = controller.update(np.full(6, 5000.0), np.full(6, 1000.0), now + 1.0)
+    assert np.allclose(command, commands[-1] + 20000 * 0.1)
+
+
+def test_setpoints_pass_through_without_measurement():
+    controller = PressureController()
+    setpoints = np.array([1000, 2000, 3000, 4000, 5000, 6000], dtype=float)
+    run(controller, setpoints, setpoints - 500, 50)
+    assert controller.integral.any() and controller.command is not None
+
+    command = controller.update(setpoints, np.zeros(6), 1.0)
+    assert np.array_equal(command, setpoints)
+    assert not controller.integral.any() and controller.command is None and controller.last_time is None
+    # the next measurement starts again without a rate limit from the old command
+    command = controller.update(setpoints, setpoints - 100, 1.01)
+    assert command == pytest.approx(np.minimum(setpoints + 0.3 * 100, 6000))
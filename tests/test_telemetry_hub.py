@@ -0,0 +1,56 @@
+import os
+import time
+
+import pytest
+
+from common import telemetry_hub
+from common.telemetry_hub import TelemetryHub, TelemetrySubscriber
+from sims import xplane_telemetry
+from sims.xplane_telemetry import XplaneTelemetry
+
+HUB_NAME = f"simopconsole_test_hub_{os.getpid()}"
+
+
+def test_live_hub_is_not_replaced(monkeypatch):
+    hub = TelemetryHub.create(HUB_NAME, nbr_slots=8, slot_size=64)
+    try:
+        sub = TelemetrySubscriber.attach(HUB_NAME, policy="lossless")
+        with pytest.raises(FileExistsError):
+            TelemetryHub.create(HUB_NAME, nbr_slots=8, slot_size=64)
+        hub.publish(b"still attached", ("127.0.0.1", 49000))
+        assert sub.get()[1] == b"still attached"
+
+        # idle but touched by its owner every frame
+        monkeypatch.setattr(time, "time", lambda now=time.time(): now + 0.9 * telemetry_hub.HUB_ALIVE_TIMEOUT)
+        hub.touch()
+        monkeypatch.setattr(time, "time", lambda now=time.time(): now + 0.9 * telemetry_hub.HUB_ALIVE_TIMEOUT)
+        with pytest.raises(FileExistsError):
+            TelemetryHub.create(HUB_NAME, nbr_slots=8, slot_size=64)
+        sub.close()
+    finally:
+        hub.close()
+
+
+def test_stale_hub_is_replaced(monkeypatch):
+    stale = TelemetryHub.create(HUB_NAME, nbr_slots=8, slot_size=64)
+    stale.owner = False   # as if its process had crashed
+    stale.close()
+    monkeypatch.setattr(time, "time", lambda now=time.time(): now + 2 * telemetry_hub.HUB_ALIVE_TIMEOUT)
+    hub = TelemetryHub.create(HUB_NAME, nbr_slots=8, slot_size=64)
+    hub.close()
+
+
+def test_publish_after_close_is_dropped(monkeypatch):
+    class TestHub(TelemetryHub):
+        @classmethod
+        def create(cls):
+            return super().create(HUB_NAME, nbr_slots=8, slot_size=64)
+
+    monkeypatch.setattr(xplane_telemetry, "TELEMETRY_HUB", True)
+    monkeypatch.setattr(xplane_telemetry, "TelemetryHub", TestHub)
+    telemetry = XplaneTelemetry(("127.0.0.1", 0), [1] * 6)
+    assert telemetry.hub is not None
+    telemetry.publish(b"packet", ("127.0.0.1", 49000), time.time())
+    telemetry.close()
+    telemetry.publish(b"late packet", ("127.0.0.1", 49000), time.time())   # listener thread after close
+    assert telemetry.hub is None
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+from dummy_xplane.telemetry_rec_play import (TelemetryPlayer, TelemetryRecorder, csv_to_binary,
+                                             binary_to_csv, _load_csv)
+
+DEMO_CSV = os.path.join(os.path.dirname(__file__), "..", "dummy_xplane", "C172_demo.csv")
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    headers = [line for line in lines if line.startswith("#")]
+    rows = [line for line in lines if not line.startswith("#")]
+    return headers, rows[0], np.loadtxt(rows[1:], delimiter=",", ndmin=2)
+
+
+def round_trip(csv_path, tmp_path):
+    bin_path, out_path = tmp_path / "rec.tlm", tmp_path / "out.csv"
+    n = csv_to_binary(str(csv_path), str(bin_path))
+    assert binary_to_csv(str(bin_path), str(out_path)) == n
+    return bin_path, read_csv(csv_path), read_csv(out_path)
+
+
+def test_legacy_csv_round_trip_is_lossless(tmp_path):
+    bin_path, (headers, columns, values), (out_headers, out_columns, out_values) = round_trip(DEMO_CSV, tmp_path)
+    assert out_headers == headers
+    assert out_columns == columns == "x,y,z,roll,pitch,yaw"   # no t column added
+    assert np.array_equal(out_values, values)                 # float64 values bit exact
+
+    player = TelemetryPlayer()
+    player.start_playback(str(bin_path))
+    assert player.synthetic_time
+    assert np.allclose(np.diff(player.frames()["t"]), 0.025)
+    assert player.playback_service() == values[0].tolist()
+
+
+def test_timed_csv_round_trip_is_lossless(tmp_path):
+    t = np.cumsum(np.random.default_rng(1).uniform(0.01, 0.04, 50))
+    dof = np.random.default_rng(2).standard_normal((50, 6))
+    csv_path = tmp_path / "timed.csv"
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write("# interval_ms: 25\n# vehicle: B738\n# record_count: 50\nt,x,y,z,roll,pitch,yaw\n")
+        np.savetxt(f, np.column_stack([t, dof]), delimiter=",", fmt="%.17g")
+
+    _, (headers, columns, values), (out_headers, out_columns, out_values) = round_trip(csv_path, tmp_path)
+    assert out_headers == headers and out_columns == columns
+    assert np.array_equal(out_values, values)
+    frames, _, _, flags = _load_csv(str(csv_path))
+    assert flags == 0 and np.array_equal(frames["t"], t)
+
+
+def test_float32_recording_still_plays(tmp_path):
+    path = tmp_path / "live.tlm"
+    recorder = TelemetryRecorder(block_frames=4)
+    recorder.record_begin(str(path), 25, "C172")
+    for i in range(10):
+        recorder.update([i * 0.5] * 6, timestamp=i * 0.025)
+    recorder.close()
+    assert os.path.getsize(path) == 64 + 10 * 32
+
+    player = TelemetryPlayer()
+    player.start_playback(str(path))
+    assert player.record_count == 10 and not player.synthetic_time
+    player.seek(3)
+    assert player.playback_service() == [1.5] * 6